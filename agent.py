@@ -1,36 +1,232 @@
 import os
 import asyncio
 import logging
+import signal
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
 
-from telethon import TelegramClient
+from telethon import TelegramClient, events
 from telethon.sessions import StringSession
 
+from app import db
+from app.news import parse_message
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
 API_ID = os.getenv("TG_API_ID")
 API_HASH = os.getenv("TG_API_HASH")
-SESSION = os.getenv("TG_SESSION")  # строковая сессия (мы сделаем её следующим шагом)
+SESSION = os.getenv("TG_SESSION")  # строковая сессия
+# каналы через запятую: @username, t.me/... или числовой id
+CHANNELS = [x.strip() for x in os.getenv("AGENT_CHANNELS", "").split(",") if x.strip()]
+
+# агент каналов: новые посты приходят через update-хендлеры, пропущенное
+# догружается с водяного знака (последний обработанный message_id канала).
+# Посты идут через ограниченную очередь (backpressure на хендлеры и догрузку)
+# к нескольким разборщикам, результаты пишутся в SQLite пачками.
+QUEUE_SIZE = int(os.getenv("AGENT_QUEUE_SIZE", "1000"))
+WORKERS = int(os.getenv("AGENT_WORKERS", "4"))
+BATCH_SIZE = int(os.getenv("AGENT_BATCH_SIZE", "200"))
+FLUSH_SECONDS = float(os.getenv("AGENT_FLUSH_SECONDS", "2"))
+BACKFILL_LIMIT = int(os.getenv("AGENT_BACKFILL_LIMIT", "500"))  # для канала без водяного знака
+RETRY_MAX_SECONDS = 60.0  # потолок паузы между повторами записи пачки
+
+# (channel_id, title, message_id, posted_at, text)
+Post = Tuple[int, Optional[str], int, str, str]
+
+class Ingestor:
+    def __init__(self):
+        self.posts: "asyncio.Queue[Post]" = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.parsed: "asyncio.Queue[Tuple[Post, List[tuple]]]" = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.counters = {"posts": 0, "items": 0, "batches": 0}
+        # водяной знак канала двигается только до непрерывно сохранённого префикса:
+        # pending — id, поставленные в очередь, но ещё не записанные; top — старший
+        # записанный id; holds — курсор идущей догрузки (id выше него ещё не прочитаны)
+        self.pending: Dict[int, Set[int]] = {}
+        self.top: Dict[int, int] = {}
+        self.holds: Dict[int, int] = {}
+
+    def hold(self, channel_id: int, message_id: int) -> None:
+        self.holds[channel_id] = message_id
+
+    def release(self, channel_id: int) -> None:
+        self.holds.pop(channel_id, None)
+
+    async def put(self, channel_id: int, title: Optional[str], message: Any) -> None:
+        if not message or not getattr(message, "message", None):
+            return
+        posted = message.date.isoformat() if message.date else ""
+        self.pending.setdefault(channel_id, set()).add(message.id)
+        # очередь ограничена: при отставании записи хендлеры и догрузка ждут здесь
+        await self.posts.put((channel_id, title, message.id, posted, message.message))
+
+    async def parse_worker(self) -> None:
+        while True:
+            post = await self.posts.get()
+            try:
+                channel_id, _, message_id, posted, text = post
+                try:
+                    rows = [(channel_id, message_id, posted, it.kind, it.player, it.team, it.status, it.text)
+                            for it in parse_message(text)]
+                except Exception:
+                    # повтор разбора не поможет: пост считается обработанным без новостей,
+                    # иначе он навсегда задержит водяной знак канала
+                    logging.exception("Failed to parse message %s/%s", post[0], post[2])
+                    rows = []
+                await self.parsed.put((post, rows))
+            finally:
+                self.posts.task_done()
+
+    async def writer(self) -> None:
+        # пачка закрывается по размеру или по таймеру; водяной знак пишется
+        # в той же транзакции, что и новости. Неудачная запись повторяется с
+        # паузой, пачка не выбрасывается (очередь тем временем держит backpressure)
+        while True:
+            post, rows = await self.parsed.get()
+            batch, posts = list(rows), [post]
+            deadline = time.monotonic() + FLUSH_SECONDS
+            while len(batch) < BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    post, rows = await asyncio.wait_for(self.parsed.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch += rows
+                posts.append(post)
+            delay = 1.0
+            while True:
+                try:
+                    await db.run(db.save_news_batch, batch, self._marks(posts))
+                    break
+                except Exception:
+                    logging.exception("Failed to save news batch (%s posts), retry in %.0fs", len(posts), delay)
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, RETRY_MAX_SECONDS)
+            self._saved(posts)
+            self.counters["posts"] += len(posts)
+            self.counters["items"] += len(batch)
+            self.counters["batches"] += 1
+            for _ in posts:
+                self.parsed.task_done()
+
+    def _marks(self, posts: List[Post]) -> Dict[int, Tuple[Optional[str], int]]:
+        # знак = старший записанный id (с учётом этой пачки), но ниже самого младшего
+        # ещё не записанного поста канала и не выше курсора догрузки
+        saved: Dict[int, Set[int]] = {}
+        titles: Dict[int, Optional[str]] = {}
+        for channel_id, title, message_id, _, _ in posts:
+            saved.setdefault(channel_id, set()).add(message_id)
+            titles[channel_id] = titles.get(channel_id) or title
+        marks = {}
+        for channel_id, ids in saved.items():
+            mark = max(self.top.get(channel_id, 0), max(ids))
+            rest = self.pending.get(channel_id, set()) - ids
+            if rest:
+                mark = min(mark, min(rest) - 1)
+            if channel_id in self.holds:
+                mark = min(mark, self.holds[channel_id])
+            marks[channel_id] = (titles[channel_id], mark)
+        return marks
+
+    def _saved(self, posts: List[Post]) -> None:
+        for channel_id, _, message_id, _, _ in posts:
+            self.pending.get(channel_id, set()).discard(message_id)
+            self.top[channel_id] = max(self.top.get(channel_id, 0), message_id)
+
+    async def drain(self) -> None:
+        await self.posts.join()
+        await self.parsed.join()
+
+async def backfill(client: TelegramClient, ingestor: Ingestor, entity: Any, watermark: int) -> None:
+    # от водяного знака вперёд строго по возрастанию id: курсор догрузки (hold)
+    # не даёт знаку уйти выше ещё не прочитанных постов, даже если живые посты
+    # канала уже записаны. Без знака — последние BACKFILL_LIMIT постов, тоже по возрастанию
+    title = getattr(entity, "title", None)
+    if watermark:
+        messages = client.iter_messages(entity, min_id=watermark, reverse=True)
+    else:
+        messages = _ascending(await client.get_messages(entity, limit=BACKFILL_LIMIT))
+    n = 0
+    try:
+        async for message in messages:
+            await ingestor.put(entity.id, title, message)
+            ingestor.hold(entity.id, message.id)
+            n += 1
+    finally:
+        ingestor.release(entity.id)
+    logging.info("Backfill %s: %s messages after #%s", title or entity.id, n, watermark)
+
+async def _ascending(messages: List[Any]):
+    for message in sorted(messages, key=lambda m: m.id):
+        yield message
 
 async def main():
     if not API_ID or not API_HASH or not SESSION:
         logging.error("TG_API_ID / TG_API_HASH / TG_SESSION не заданы. Агент пока не запущен.")
         return
+    if not CHANNELS:
+        logging.error("AGENT_CHANNELS не задан — нечего читать.")
+        return
 
+    db.init_db()
     client = TelegramClient(StringSession(SESSION), int(API_ID), API_HASH)
     await client.connect()
-
     me = await client.get_me()
     logging.info(f"✅ Agent logged in as: {me.id} @{getattr(me, 'username', None)}")
 
-    # просто проверка: покажем первые ~50 диалогов (каналы/чаты)
-    count = 0
-    async for d in client.iter_dialogs(limit=50):
-        if d.is_channel:
-            logging.info(f"CHANNEL: {d.name}")
-            count += 1
+    entities = []
+    for ch in CHANNELS:
+        try:
+            entities.append(await client.get_entity(int(ch) if ch.lstrip("-").isdigit() else ch))
+        except Exception:
+            logging.exception("Cannot resolve channel %s", ch)
+    if not entities:
+        await client.disconnect()
+        return
+    titles = {e.id: getattr(e, "title", None) for e in entities}
+
+    # курсоры догрузки ставятся до подписки на новые посты
+    watermarks = await db.run(db.get_channel_watermarks)
+    ingestor = Ingestor()
+    for e in entities:
+        ingestor.hold(e.id, watermarks.get(e.id, 0))
+    tasks = [asyncio.create_task(ingestor.parse_worker()) for _ in range(max(1, WORKERS))]
+    tasks.append(asyncio.create_task(ingestor.writer()))
+
+    @client.on(events.NewMessage(chats=entities))
+    async def on_message(event):
+        channel_id = getattr(event.message.peer_id, "channel_id", None) or event.chat_id
+        await ingestor.put(channel_id, titles.get(channel_id), event.message)
+
+    # хендлер уже подписан, поэтому посты, вышедшие во время догрузки, не теряются
+    # (дубли отсекает уникальный индекс news_items)
+    await asyncio.gather(*(backfill(client, ingestor, e, watermarks.get(e.id, 0)) for e in entities))
 
-    logging.info(f"✅ Found channels (in first 50 dialogs): {count}")
-    await client.disconnect()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+    logging.info("Listening to %s channels", len(entities))
+    try:
+        await asyncio.wait(
+            [asyncio.ensure_future(stop.wait()), asyncio.ensure_future(client.disconnected)],
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+    finally:
+        await client.disconnect()
+        try:
+            await asyncio.wait_for(ingestor.drain(), 30)
+        except asyncio.TimeoutError:
+            logging.warning("Agent stopped with unsaved posts: %s queued", ingestor.posts.qsize())
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        logging.info("Agent stopped: %s", ingestor.counters)
+        db.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
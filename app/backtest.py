@@ -0,0 +1,119 @@
+import argparse
+import datetime as dt
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import history, scoring
+from .sources import nhl
+
+# офлайн-бэктест: прогоняет nhl.build по архиву data/history.db день за днём,
+# грейдит прогнозы по финальным счетам и считает хит-рейт, калибровку и ROI
+# по корзинам уверенности. Дни раскидываются по процессам.
+BUCKET = 5
+DEFAULT_ODDS = 1.40  # средний коэффициент на двойной шанс; в архиве коэффициентов нет
+
+_conn = None
+
+def _init_worker(path: str, model: scoring.ScoringModel) -> None:
+    global _conn
+    _conn = history.connect(Path(path), readonly=True)
+    scoring.configure(model)
+
+def replay_date(date_iso: str) -> List[Tuple[int, str]]:
+    # -> [(confidence, WIN|LOSE|VOID), ...] для одного дня
+    date = dt.date.fromisoformat(date_iso)
+    schedule = history.get(_conn, "schedule", date_iso)
+    standings = history.get(_conn, "standings", (date - dt.timedelta(days=1)).isoformat())
+    if not schedule or not standings:
+        return []
+    out: List[Tuple[int, str]] = []
+    for s in nhl.build(date, {"schedule": schedule, "standings": standings}):
+        game = history.get(_conn, "gamecenter", s["game_id"])
+        fin = nhl.parse_final(game) if game else None
+        if fin:
+            out.append((int(s["confidence"]), nhl.grade_pick(s["pick"], fin["away_score"], fin["home_score"])))
+    return out
+
+def _replay_chunk(dates: List[str]) -> List[Tuple[int, str]]:
+    out: List[Tuple[int, str]] = []
+    for d in dates:
+        out += replay_date(d)
+    return out
+
+def summarize(results: List[Tuple[int, str]], odds: float = DEFAULT_ODDS) -> Dict[str, Any]:
+    buckets: Dict[int, Dict[str, float]] = {}
+    for conf, status in results:
+        if status not in ("WIN", "LOSE"):
+            continue
+        b = buckets.setdefault(conf // BUCKET * BUCKET, {"n": 0, "win": 0, "conf_sum": 0.0})
+        b["n"] += 1
+        b["win"] += status == "WIN"
+        b["conf_sum"] += conf
+
+    def row(label: Any, b: Dict[str, float]) -> Dict[str, Any]:
+        n, win = int(b["n"]), int(b["win"])
+        return {
+            "bucket": label,
+            "n": n,
+            "hit_rate": round(win / n, 4) if n else None,
+            "predicted": round(b["conf_sum"] / n / 100, 4) if n else None,  # калибровка: ожидание vs факт
+            "roi": round((win * (odds - 1) - (n - win)) / n, 4) if n else None,
+        }
+
+    total = {"n": sum(b["n"] for b in buckets.values()), "win": sum(b["win"] for b in buckets.values()),
+             "conf_sum": sum(b["conf_sum"] for b in buckets.values())}
+    brier = (sum((c / 100 - (s == "WIN")) ** 2 for c, s in results if s in ("WIN", "LOSE")) / total["n"]) if total["n"] else None
+    return {
+        "odds": odds,
+        "total": row("all", total),
+        "brier": round(brier, 4) if brier is not None else None,
+        "buckets": [row(f"{k}-{k + BUCKET - 1}", buckets[k]) for k in sorted(buckets)],
+    }
+
+def run(start: dt.date, end: dt.date, path: Optional[Path] = None, workers: Optional[int] = None,
+        model: Optional[scoring.ScoringModel] = None, odds: float = DEFAULT_ODDS) -> Dict[str, Any]:
+    path = Path(path or history.HISTORY_PATH)
+    days = [d.isoformat() for d in history.dates(start, end)]
+    workers = max(1, workers or os.cpu_count() or 1)
+    # дни пачками: накладные расходы пула меньше, чем работа одного дня
+    size = max(1, len(days) // (workers * 4))
+    chunks = [days[i:i + size] for i in range(0, len(days), size)]
+    results: List[Tuple[int, str]] = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(path.as_posix(), model or scoring.get_model())) as pool:
+        for part in pool.map(_replay_chunk, chunks):
+            results += part
+    report = summarize(results, odds)
+    report.update(start=start.isoformat(), end=end.isoformat(), days=len(days), signals=len(results))
+    return report
+
+def format_report(r: Dict[str, Any]) -> str:
+    lines = [
+        f"Backtest {r['start']}..{r['end']}: {r['days']} days, {r['signals']} graded signals, odds {r['odds']}",
+        f"{'bucket':>8} {'n':>6} {'hit':>7} {'pred':>7} {'roi':>8}",
+    ]
+    for b in r["buckets"] + [r["total"]]:
+        if not b["n"]:
+            continue
+        lines.append(f"{b['bucket']:>8} {b['n']:>6} {b['hit_rate']:>7.3f} {b['predicted']:>7.3f} {b['roi']:>+8.3f}")
+    lines.append(f"Brier: {r['brier']}")
+    return "\n".join(lines)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Офлайн-бэктест сигналов по data/history.db")
+    ap.add_argument("start", type=dt.date.fromisoformat)
+    ap.add_argument("end", type=dt.date.fromisoformat)
+    ap.add_argument("--db", type=Path, default=history.HISTORY_PATH)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--model", default=os.getenv("SCORING_MODEL", ""), help="JSON модели (см. app.scoring)")
+    ap.add_argument("--odds", type=float, default=DEFAULT_ODDS)
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args(argv)
+    report = run(args.start, args.end, args.db, args.workers, scoring.load_model(args.model), args.odds)
+    print(json.dumps(report, ensure_ascii=False, indent=2) if args.json else format_report(report))
+
+if __name__ == "__main__":
+    main()
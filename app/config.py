@@ -1,8 +1,5 @@
 import os
 from dataclasses import dataclass
-from dotenv import load_dotenv
-
-load_dotenv()
 
 @dataclass(frozen=True)
 class AppConfig:
@@ -11,12 +8,78 @@ class AppConfig:
     default_min_confidence: int
     default_daily_time: str
     log_level: str
+    http_timeout: float
+    http_per_host_limit: int
+    http_retries: int
+    http_cache_size: int
+    http_cache_dir: str
+    http_cache_disk_size: int
+    tg_send_workers: int
+    tg_global_rate: float
+    tg_per_chat_rate: float
+    tg_per_chat_burst: float
+    scoring_model: str
+    prefetch_lead_min: int
+    prefetch_interval_min: int
+    metrics_port: int
+    metrics_log_interval_min: int
+    tg_base_url: str
+    webhook_url: str
+    webhook_secret: str
+    webhook_listen: str
+    webhook_port: int
+    webhook_path: str
+    webhook_workers: int
+    tracker_interval_sec: int
+    archive_after_days: int
+    archive_dir: str
+    maintenance_time: str
+    db_path: str
+
+_dotenv_loaded = False
+
+def load_env() -> None:
+    # .env читается один раз при первом get_config(), а не побочным эффектом импорта.
+    # Уже заданные переменные окружения не перезаписываются
+    global _dotenv_loaded
+    if not _dotenv_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _dotenv_loaded = True
 
 def get_config() -> AppConfig:
+    load_env()
     return AppConfig(
         bot_token=os.getenv("BOT_TOKEN", "").strip(),
         timezone=os.getenv("TIMEZONE", "Europe/Amsterdam"),
         default_min_confidence=int(os.getenv("DEFAULT_MIN_CONFIDENCE", "65")),
         default_daily_time=os.getenv("DEFAULT_DAILY_TIME", "10:30"),
         log_level=os.getenv("LOG_LEVEL", "INFO").upper(),
+        http_timeout=float(os.getenv("HTTP_TIMEOUT", "20")),
+        http_per_host_limit=int(os.getenv("HTTP_PER_HOST_LIMIT", "8")),
+        http_retries=int(os.getenv("HTTP_RETRIES", "3")),
+        http_cache_size=int(os.getenv("HTTP_CACHE_SIZE", "256")),
+        http_cache_dir=os.getenv("HTTP_CACHE_DIR", "").strip(),  # напр. data/http_cache
+        http_cache_disk_size=int(os.getenv("HTTP_CACHE_DISK_SIZE", "4096")),  # файлов в HTTP_CACHE_DIR
+        tg_send_workers=int(os.getenv("TG_SEND_WORKERS", "32")),
+        tg_global_rate=float(os.getenv("TG_GLOBAL_RATE", "25")),  # лимит Telegram ~30 msg/s
+        tg_per_chat_rate=float(os.getenv("TG_PER_CHAT_RATE", "1")),
+        tg_per_chat_burst=float(os.getenv("TG_PER_CHAT_BURST", "1")),
+        scoring_model=os.getenv("SCORING_MODEL", "").strip(),  # путь к JSON с весами/порогами
+        prefetch_lead_min=int(os.getenv("PREFETCH_LEAD_MIN", "30")),  # прогрев снимка до первой рассылки
+        prefetch_interval_min=int(os.getenv("PREFETCH_INTERVAL_MIN", "10")),
+        metrics_port=int(os.getenv("METRICS_PORT", "9108")),  # 0 — без /metrics, только сводка в лог
+        metrics_log_interval_min=int(os.getenv("METRICS_LOG_INTERVAL_MIN", "5")),
+        tg_base_url=os.getenv("TG_BASE_URL", "").strip(),  # напр. локальная заглушка Bot API
+        webhook_url=os.getenv("WEBHOOK_URL", "").strip(),  # публичный https-адрес; пусто — setWebhook не вызываем
+        webhook_secret=os.getenv("WEBHOOK_SECRET", "").strip(),
+        webhook_listen=os.getenv("WEBHOOK_LISTEN", "127.0.0.1"),
+        webhook_port=int(os.getenv("WEBHOOK_PORT", "8080")),
+        webhook_path=os.getenv("WEBHOOK_PATH", "/telegram"),
+        webhook_workers=int(os.getenv("WEBHOOK_WORKERS", str(os.cpu_count() or 1))),
+        tracker_interval_sec=int(os.getenv("TRACKER_INTERVAL_SEC", "60")),  # шаг трекера матчей
+        archive_after_days=int(os.getenv("ARCHIVE_AFTER_DAYS", "90")),  # закрытые сигналы старше — в архив
+        archive_dir=os.getenv("ARCHIVE_DIR", "data/archive"),
+        maintenance_time=os.getenv("MAINTENANCE_TIME", "04:30"),  # локальное время (TIMEZONE), вне рассылок
+        db_path=os.getenv("BOT_DB_PATH", "data/bot.db"),
     )
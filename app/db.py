@@ -1,19 +1,157 @@
+import asyncio
+import os
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Callable, Tuple, TypeVar
 import datetime as dt
 
-DB_PATH = Path("data") / "bot.db"
+from . import metrics
+
+DB_PATH = Path(os.getenv("BOT_DB_PATH") or Path("data") / "bot.db")
+
+PRAGMAS = (
+    # до journal_mode: действует только на новую базу, существующую переводит maintenance.compact
+    "PRAGMA auto_vacuum=INCREMENTAL;",
+    "PRAGMA journal_mode=WAL;",
+    "PRAGMA synchronous=NORMAL;",   # в WAL fsync только на checkpoint
+    "PRAGMA cache_size=-32000;",    # ~32 МБ страничного кэша
+    "PRAGMA mmap_size=268435456;",  # 256 МБ
+    "PRAGMA temp_store=MEMORY;",
+    "PRAGMA busy_timeout=5000;",
+)
+# sqlite3 держит кэш подготовленных выражений на соединение (по тексту SQL),
+# поэтому соединения живут долго: одно на запись и по одному на поток для чтения
+STATEMENT_CACHE = 256
+
+_write_lock = threading.Lock()
+_pool_lock = threading.Lock()
+_writer: Optional[sqlite3.Connection] = None
+_readers: List[sqlite3.Connection] = []
+_local = threading.local()
+
+T = TypeVar("T")
 
 def connect() -> sqlite3.Connection:
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH.as_posix())
+    conn = sqlite3.connect(DB_PATH.as_posix(), check_same_thread=False, cached_statements=STATEMENT_CACHE)
     conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL;")
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
     return conn
 
-def init_db() -> None:
-    with connect() as conn:
+@contextmanager
+def writer() -> Iterator[sqlite3.Connection]:
+    global _writer
+    with _write_lock:
+        if _writer is None:
+            _writer = connect()
+        try:
+            yield _writer
+            _writer.commit()
+        except BaseException:
+            _writer.rollback()
+            raise
+
+@contextmanager
+def reader() -> Iterator[sqlite3.Connection]:
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "generation", None) is not _readers:
+        conn = connect()
+        with _pool_lock:
+            _readers.append(conn)
+        _local.conn, _local.generation = conn, _readers
+    yield conn
+
+def close() -> None:
+    # закрывает все соединения пула (например, при смене DB_PATH или на остановке)
+    global _writer, _readers
+    with _write_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
+    with _pool_lock:
+        for conn in _readers:
+            conn.close()
+        _readers = []
+
+async def run(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    # блокирующие вызовы БД выполняются вне event loop; время считается в потоке,
+    # без ожидания свободного воркера
+    return await asyncio.to_thread(_timed_call, fn, *args, **kwargs)
+
+def _timed_call(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    t0 = time.perf_counter()
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        metrics.observe("db_call_seconds", time.perf_counter() - t0, fn=fn.__name__)
+
+def _ensure_column(conn: sqlite3.Connection, table: str, column: str, decl: str) -> None:
+    cols = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in cols:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_signals_status ON signals(status);",
+    "CREATE INDEX IF NOT EXISTS idx_signals_created_at ON signals(created_at);",
+    "CREATE INDEX IF NOT EXISTS idx_signals_game_id ON signals(game_id);",
+    "CREATE INDEX IF NOT EXISTS idx_signals_league_created_at ON signals(league, created_at);",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_signals_canon ON signals(date, league, game_id, pick);",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_deliveries_chat_signal ON deliveries(chat_id, signal_id);",
+    "CREATE INDEX IF NOT EXISTS idx_deliveries_signal ON deliveries(signal_id);",
+    "CREATE INDEX IF NOT EXISTS idx_deliveries_chat_id ON deliveries(chat_id, id);",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_news_items_msg ON news_items(channel_id, message_id, kind, player);",
+    "CREATE INDEX IF NOT EXISTS idx_news_items_posted_at ON news_items(posted_at);",
+    "CREATE INDEX IF NOT EXISTS idx_games_next_poll ON games(next_poll);",
+    "CREATE INDEX IF NOT EXISTS idx_signals_closed_at ON signals(closed_at);",
+)
+
+def _migrate_per_user_signals(conn: sqlite3.Connection) -> None:
+    # старая схема: копия сигнала на каждого получателя (signals.chat_id).
+    # Оставляем одну каноническую строку на (date, league, game_id, pick),
+    # получателей переносим в deliveries (повторы одному чату — одна доставка:
+    # уникальный индекс по deliveries создаётся уже после миграции).
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(signals)")}
+    if "date" in cols:
+        return
+    conn.execute("ALTER TABLE signals ADD COLUMN date TEXT")
+    conn.execute("UPDATE signals SET date=substr(created_at, 1, 10)")
+    conn.execute("""
+    CREATE TEMP TABLE canon AS
+    SELECT id, MIN(id) OVER (PARTITION BY date, league, game_id, pick) AS canon_id
+    FROM signals
+    """)
+    if "chat_id" in cols:
+        conn.execute("""
+        INSERT OR IGNORE INTO deliveries (chat_id, signal_id, message_id, sent_at)
+        SELECT s.chat_id, c.canon_id, NULL, MIN(s.created_at)
+        FROM signals s JOIN temp.canon c ON c.id = s.id
+        WHERE s.chat_id IS NOT NULL
+        GROUP BY s.chat_id, c.canon_id
+        """)
+    conn.execute("DELETE FROM signals WHERE id IN (SELECT id FROM temp.canon WHERE id != canon_id)")
+    conn.execute("DROP TABLE temp.canon")
+    if "chat_id" in cols:
+        conn.execute("DROP INDEX IF EXISTS idx_signals_chat_id_created_at")
+        if sqlite3.sqlite_version_info >= (3, 35, 0):
+            conn.execute("ALTER TABLE signals DROP COLUMN chat_id")
+
+# версия схемы в PRAGMA user_version: при совпадении init_db не гоняет DDL и миграции.
+# Любое изменение таблиц/индексов ниже — повысить на единицу
+SCHEMA_VERSION = 3
+
+def schema_version() -> int:
+    with reader() as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def init_db() -> bool:
+    # True — схема создавалась/обновлялась, False — уже актуальна
+    if schema_version() == SCHEMA_VERSION:
+        return False
+    with writer() as conn:
         conn.execute("""
         CREATE TABLE IF NOT EXISTS users (
             chat_id INTEGER PRIMARY KEY,
@@ -27,8 +165,10 @@ def init_db() -> None:
         CREATE TABLE IF NOT EXISTS signals (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             created_at TEXT NOT NULL,
+            date TEXT NOT NULL,
             league TEXT NOT NULL,
             game_id TEXT,
+            start_utc TEXT,
             match TEXT NOT NULL,
             pick TEXT NOT NULL,
             confidence INTEGER NOT NULL,
@@ -37,73 +177,445 @@ def init_db() -> None:
             sources_json TEXT NOT NULL,
             status TEXT NOT NULL DEFAULT 'PENDING',
             final_score TEXT,
-            closed_at TEXT
+            closed_at TEXT,
+            queued_at TEXT
+        );
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS snapshots (
+            date TEXT NOT NULL,
+            league TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            signals_json TEXT NOT NULL,
+            first_start TEXT,
+            PRIMARY KEY (date, league)
         );
         """)
-        conn.commit()
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS deliveries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id INTEGER NOT NULL,
+            signal_id INTEGER NOT NULL REFERENCES signals(id),
+            message_id INTEGER,
+            sent_at TEXT
+        );
+        """)
+        # агент каналов (agent.py): водяной знак по каждому каналу и разобранные новости
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS channel_state (
+            channel_id INTEGER PRIMARY KEY,
+            title TEXT,
+            last_message_id INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT NOT NULL
+        );
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS news_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            posted_at TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            player TEXT NOT NULL,
+            team TEXT,
+            status TEXT NOT NULL,
+            text TEXT NOT NULL
+        );
+        """)
+        # аренды фоновых задач: при нескольких экземплярах задачи шарда крутит один
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        );
+        """)
+        # трекер матчей: последнее известное состояние и время следующего опроса
+        # (next_poll — unix-время; NULL — матч завершён и больше не опрашивается)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS games (
+            league TEXT NOT NULL,
+            game_id TEXT NOT NULL,
+            start_utc TEXT,
+            state TEXT,
+            next_poll REAL,
+            polls INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT,
+            PRIMARY KEY (league, game_id)
+        );
+        """)
+        # дневные агрегаты по сигналам, ушедшим в архив (maintenance.py): /week считает
+        # горячие строки signals плюс эти суммы. chat_id=0 — канонические сигналы,
+        # иначе — доставки конкретному чату
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS signal_daily (
+            day TEXT NOT NULL,
+            league TEXT NOT NULL,
+            bucket INTEGER NOT NULL,
+            chat_id INTEGER NOT NULL,
+            total INTEGER NOT NULL,
+            win INTEGER NOT NULL,
+            lose INTEGER NOT NULL,
+            PRIMARY KEY (chat_id, day, league, bucket)
+        ) WITHOUT ROWID;
+        """)
+        _ensure_column(conn, "signals", "start_utc", "TEXT")
+        _ensure_column(conn, "signals", "queued_at", "TEXT")
+        _ensure_column(conn, "snapshots", "first_start", "TEXT")
+        _migrate_per_user_signals(conn)
+        for ddl in INDEXES:
+            conn.execute(ddl)
+        conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+    return True
 
 def upsert_user(chat_id: int, created_at_iso: str) -> None:
-    with connect() as conn:
+    with writer() as conn:
         conn.execute("""
         INSERT INTO users (chat_id, created_at, min_confidence, leagues, daily_time)
         VALUES (?, ?, NULL, NULL, NULL)
         ON CONFLICT(chat_id) DO UPDATE SET chat_id=excluded.chat_id;
         """, (chat_id, created_at_iso))
-        conn.commit()
 
-def get_user(chat_id: int) -> Optional[dict]:
-    with connect() as conn:
-        cur = conn.execute("SELECT * FROM users WHERE chat_id=?", (chat_id,))
-        row = cur.fetchone()
-        return dict(row) if row else None
+def list_users(shard: int = 0, shards: int = 1) -> List[tuple]:
+    # (chat_id, min_confidence, leagues_csv, daily_time) — для кэша настроек при старте;
+    # в webhook-режиме только чаты своего шарда (см. app.webhook.shard_of)
+    with reader() as conn:
+        cur = conn.execute(
+            "SELECT chat_id, min_confidence, leagues, daily_time FROM users WHERE abs(chat_id) % ? = ?",
+            (max(1, shards), shard if shards > 1 else 0),
+        )
+        return [tuple(r) for r in cur.fetchall()]
 
-def get_all_chat_ids() -> List[int]:
-    with connect() as conn:
-        cur = conn.execute("SELECT chat_id FROM users")
-        return [r[0] for r in cur.fetchall()]
+def acquire_lease(name: str, holder: str, ttl: float) -> bool:
+    # берёт или продлевает аренду; чужую — только после истечения срока
+    now = time.time()
+    with writer() as conn:
+        conn.execute("""
+        INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?)
+        ON CONFLICT(name) DO UPDATE SET holder=excluded.holder, expires_at=excluded.expires_at
+        WHERE leases.holder=excluded.holder OR leases.expires_at < ?
+        """, (name, holder, now + ttl, now))
+        row = conn.execute("SELECT holder FROM leases WHERE name=?", (name,)).fetchone()
+        return row is not None and row[0] == holder
+
+def release_lease(name: str, holder: str) -> None:
+    with writer() as conn:
+        conn.execute("DELETE FROM leases WHERE name=? AND holder=?", (name, holder))
 
 def set_min_confidence(chat_id: int, value: int) -> None:
-    with connect() as conn:
+    with writer() as conn:
         conn.execute("UPDATE users SET min_confidence=? WHERE chat_id=?", (value, chat_id))
-        conn.commit()
 
 def set_leagues(chat_id: int, leagues_csv: str) -> None:
-    with connect() as conn:
+    with writer() as conn:
         conn.execute("UPDATE users SET leagues=? WHERE chat_id=?", (leagues_csv, chat_id))
-        conn.commit()
 
 def set_daily_time(chat_id: int, hhmm: str) -> None:
-    with connect() as conn:
+    with writer() as conn:
         conn.execute("UPDATE users SET daily_time=? WHERE chat_id=?", (hhmm, chat_id))
-        conn.commit()
 
-def insert_signal(payload: Dict[str, Any]) -> int:
-    with connect() as conn:
+UPSERT_SIGNAL_SQL = """
+INSERT INTO signals (created_at, date, league, game_id, start_utc, match, pick, confidence, why_json, risks_json, sources_json)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(date, league, game_id, pick) DO UPDATE SET
+    start_utc=excluded.start_utc, confidence=excluded.confidence,
+    why_json=excluded.why_json, risks_json=excluded.risks_json, sources_json=excluded.sources_json
+"""
+
+def _signal_params(payload: Dict[str, Any]) -> tuple:
+    return (
+        payload["created_at"], payload["date"], payload["league"], payload.get("game_id"), payload.get("start_utc"),
+        payload["match"], payload["pick"], int(payload["confidence"]),
+        payload["why_json"], payload["risks_json"], payload["sources_json"]
+    )
+
+def upsert_signals(payloads: Iterable[Dict[str, Any]]) -> List[int]:
+    # канонические сигналы: одна строка на (date, league, game_id, pick) для всех подписчиков
+    ids: List[int] = []
+    with writer() as conn:
+        for payload in payloads:
+            conn.execute(UPSERT_SIGNAL_SQL, _signal_params(payload))
+            row = conn.execute(
+                "SELECT id FROM signals WHERE date=? AND league=? AND game_id IS ? AND pick=?",
+                (payload["date"], payload["league"], payload.get("game_id"), payload["pick"]),
+            ).fetchone()
+            ids.append(int(row[0]))
+    return ids
+
+def prune_undelivered_signals(date_iso: str, league: str, keep_ids: List[int]) -> int:
+    # удаляются только сигналы, которые ни одна отправка ещё не взяла в очередь
+    # (queued_at) и которым нет доставок; пустой keep_ids — снимок опустел целиком
+    keep = f"AND id NOT IN ({','.join('?' for _ in keep_ids)})" if keep_ids else ""
+    with writer() as conn:
+        return conn.execute(f"""
+        DELETE FROM signals
+        WHERE date=? AND league=? AND status='PENDING' AND queued_at IS NULL {keep}
+          AND NOT EXISTS (SELECT 1 FROM deliveries d WHERE d.signal_id = signals.id)
+        """, (date_iso, league, *keep_ids)).rowcount
+
+def mark_signals_queued(ids: List[int]) -> List[int]:
+    # отметка «сигнал ушёл в outbox» до постановки в очередь: пересборка снимка
+    # его больше не удалит. Возвращает id, которые ещё есть в базе
+    if not ids:
+        return []
+    marks = ",".join("?" for _ in ids)
+    with writer() as conn:
+        conn.execute(f"UPDATE signals SET queued_at=? WHERE id IN ({marks}) AND queued_at IS NULL",
+                     (dt.datetime.utcnow().isoformat(), *ids))
+        return [r[0] for r in conn.execute(f"SELECT id FROM signals WHERE id IN ({marks})", ids)]
+
+def record_deliveries(rows: Iterable[tuple]) -> int:
+    # rows: (chat_id, signal_id, message_id, sent_at); повторная доставка того же сигнала игнорируется
+    with writer() as conn:
+        return conn.executemany("""
+        INSERT INTO deliveries (chat_id, signal_id, message_id, sent_at) VALUES (?, ?, ?, ?)
+        ON CONFLICT(chat_id, signal_id) DO NOTHING
+        """, rows).rowcount
+
+REPORT_COLUMNS = "d.id AS cursor, s.id, s.league, s.match, s.pick, s.confidence, s.status, s.final_score"
+
+def iter_chat_signals(chat_id: int, cursor: Optional[int] = None, newer: bool = False,
+                      limit: int = 50, batch: int = 20) -> Iterator[sqlite3.Row]:
+    # журнал чата по курсору (deliveries.id): от новых к старым, либо newer=True —
+    # записи новее курсора по возрастанию. Только нужные колонки, строки отдаются
+    # пачками по мере чтения. Генератор нужно дочитывать в том же потоке (reader()).
+    op, order = (">", "ASC") if newer else ("<", "DESC")
+    where, params = "d.chat_id=?", [chat_id]
+    if cursor is not None:
+        where += f" AND d.id {op} ?"
+        params.append(cursor)
+    with reader() as conn:
+        cur = conn.execute(f"""
+        SELECT {REPORT_COLUMNS}
+        FROM deliveries d JOIN signals s ON s.id = d.signal_id
+        WHERE {where}
+        ORDER BY d.id {order} LIMIT ?
+        """, (*params, limit))
+        try:
+            while True:
+                rows = cur.fetchmany(batch)
+                if not rows:
+                    return
+                yield from rows
+        finally:
+            cur.close()
+
+def get_channel_watermarks() -> Dict[int, int]:
+    with reader() as conn:
+        return {r[0]: r[1] for r in conn.execute("SELECT channel_id, last_message_id FROM channel_state")}
+
+def save_news_batch(rows: List[tuple], watermarks: Dict[int, Tuple[Optional[str], int]]) -> int:
+    # rows: (channel_id, message_id, posted_at, kind, player, team, status, text);
+    # watermarks: channel_id -> (title, id, до которого всё записано). Одна транзакция на пачку,
+    # знак только растёт — повторная догрузка истории не откатывает его назад
+    now = dt.datetime.utcnow().isoformat()
+    with writer() as conn:
+        n = conn.executemany("""
+        INSERT INTO news_items (channel_id, message_id, posted_at, kind, player, team, status, text)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(channel_id, message_id, kind, player) DO NOTHING
+        """, rows).rowcount
+        conn.executemany("""
+        INSERT INTO channel_state (channel_id, title, last_message_id, updated_at) VALUES (?, ?, ?, ?)
+        ON CONFLICT(channel_id) DO UPDATE SET
+            title=COALESCE(excluded.title, title),
+            last_message_id=MAX(last_message_id, excluded.last_message_id),
+            updated_at=excluded.updated_at
+        """, [(cid, title, mid, now) for cid, (title, mid) in watermarks.items()])
+        return n
+
+def list_news(since_iso: str, kinds: Iterable[str] = ("goalie", "injury")) -> List[dict]:
+    kinds = list(kinds)
+    with reader() as conn:
+        cur = conn.execute(f"""
+        SELECT kind, player, team, status, posted_at FROM news_items
+        WHERE posted_at >= ? AND kind IN ({",".join("?" for _ in kinds)})
+        ORDER BY posted_at DESC
+        """, (since_iso, *kinds))
+        return [dict(r) for r in cur.fetchall()]
+
+def executemany(sql: str, rows: Iterable[tuple]) -> int:
+    with writer() as conn:
+        return conn.executemany(sql, rows).rowcount
+
+# измерения для агрегатов: ключ -> SQL-выражение (только из этого списка);
+# второе — то же измерение в архивных агрегатах signal_daily
+STATS_DIMENSIONS = {
+    "total": ("'all'", "'all'"),
+    "league": ("s.league", "a.league"),
+    "bucket": ("(s.confidence / 5) * 5", "a.bucket"),
+    "chat": ("d.chat_id", "a.chat_id"),
+}
+
+def signal_stats(since_iso: str, until_iso: Optional[str] = None, by: str = "total",
+                 chat_id: Optional[int] = None) -> List[dict]:
+    # агрегаты считаются в SQL по окну created_at (индексы по created_at / league);
+    # разрез по пользователям идёт через deliveries. Архивная часть окна берётся
+    # из signal_daily с точностью до дня
+    key, akey = STATS_DIMENSIONS[by]
+    source = "signals s"
+    where = ["s.created_at >= ?"]
+    awhere = ["a.day >= ?"]
+    params: List[Any] = [since_iso]
+    aparams: List[Any] = [since_iso[:10]]
+    if until_iso:
+        where.append("s.created_at < ?")
+        params.append(until_iso)
+        awhere.append("a.day < ?")
+        aparams.append(until_iso[:10])
+    if chat_id is not None or by == "chat":
+        source += " JOIN deliveries d ON d.signal_id = s.id"
+    if chat_id is not None:
+        where.append("d.chat_id = ?")
+        params.append(chat_id)
+        awhere.append("a.chat_id = ?")
+        aparams.append(chat_id)
+    else:
+        awhere.append("a.chat_id != 0" if by == "chat" else "a.chat_id = 0")
+    with reader() as conn:
+        cur = conn.execute(f"""
+        SELECT k, SUM(total) AS total, SUM(win) AS win, SUM(lose) AS lose, SUM(pending) AS pending
+        FROM (
+            SELECT {key} AS k,
+                   COUNT(*) AS total,
+                   SUM(s.status='WIN') AS win,
+                   SUM(s.status='LOSE') AS lose,
+                   SUM(s.status='PENDING') AS pending
+            FROM {source}
+            WHERE {' AND '.join(where)}
+            GROUP BY k
+            UNION ALL
+            SELECT {akey} AS k, SUM(a.total), SUM(a.win), SUM(a.lose), 0
+            FROM signal_daily a
+            WHERE {' AND '.join(awhere)}
+            GROUP BY k
+        )
+        GROUP BY k
+        ORDER BY k
+        """, params + aparams)
+        return [dict(r) for r in cur.fetchall()]
+
+# архивация (maintenance.py): закрытые сигналы старше порога уходят пачками
+def list_archivable_signals(cutoff_iso: str, limit: int) -> List[dict]:
+    with reader() as conn:
         cur = conn.execute("""
-        INSERT INTO signals (created_at, league, game_id, match, pick, confidence, why_json, risks_json, sources_json)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            payload["created_at"], payload["league"], payload.get("game_id"),
-            payload["match"], payload["pick"], int(payload["confidence"]),
-            payload["why_json"], payload["risks_json"], payload["sources_json"]
-        ))
-        conn.commit()
-        return int(cur.lastrowid)
-
-def list_recent_signals(limit: int = 20) -> List[dict]:
-    with connect() as conn:
-        cur = conn.execute("SELECT * FROM signals ORDER BY id DESC LIMIT ?", (limit,))
+        SELECT * FROM signals
+        WHERE status != 'PENDING' AND closed_at < ? AND created_at < ?
+        ORDER BY id
+        LIMIT ?
+        """, (cutoff_iso, cutoff_iso, limit))
+        return [dict(r) for r in cur.fetchall()]
+
+def list_signal_deliveries(signal_ids: List[int]) -> List[dict]:
+    marks = ",".join("?" for _ in signal_ids) or "NULL"
+    with reader() as conn:
+        cur = conn.execute(f"SELECT * FROM deliveries WHERE signal_id IN ({marks}) ORDER BY id", signal_ids)
         return [dict(r) for r in cur.fetchall()]
 
-def list_pending_signals() -> List[dict]:
-    with connect() as conn:
-        cur = conn.execute("SELECT * FROM signals WHERE status='PENDING' ORDER BY id DESC")
+def drop_archived_signals(signal_ids: List[int]) -> Tuple[int, int]:
+    # вызывается после записи пачки в архив: агрегаты для /week, затем удаление —
+    # одной транзакцией. Возвращает (signals, deliveries)
+    if not signal_ids:
+        return 0, 0
+    with writer() as conn:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS archive_ids (id INTEGER PRIMARY KEY)")
+        conn.execute("DELETE FROM temp.archive_ids")
+        conn.executemany("INSERT OR IGNORE INTO temp.archive_ids (id) VALUES (?)", ((i,) for i in signal_ids))
+        for chat_col, source in (("0", "signals s"), ("d.chat_id", "signals s JOIN deliveries d ON d.signal_id = s.id")):
+            conn.execute(f"""
+            INSERT INTO signal_daily (day, league, bucket, chat_id, total, win, lose)
+            SELECT substr(s.created_at, 1, 10), s.league, (s.confidence / 5) * 5, {chat_col},
+                   COUNT(*), SUM(s.status='WIN'), SUM(s.status='LOSE')
+            FROM {source}
+            WHERE s.id IN (SELECT id FROM temp.archive_ids)
+            GROUP BY 1, 2, 3, 4
+            ON CONFLICT(chat_id, day, league, bucket) DO UPDATE SET
+                total=total+excluded.total, win=win+excluded.win, lose=lose+excluded.lose
+            """)
+        n_deliveries = conn.execute(
+            "DELETE FROM deliveries WHERE signal_id IN (SELECT id FROM temp.archive_ids)").rowcount
+        n_signals = conn.execute("DELETE FROM signals WHERE id IN (SELECT id FROM temp.archive_ids)").rowcount
+        conn.execute("DELETE FROM temp.archive_ids")
+        return n_signals, n_deliveries
+
+def prune_stale(cutoff_iso: str) -> Dict[str, int]:
+    # производные данные, которые после порога не нужны: кэш снимков дня,
+    # завершённые матчи трекера, разобранные новости каналов
+    with writer() as conn:
+        return {
+            "snapshots": conn.execute("DELETE FROM snapshots WHERE date < ?", (cutoff_iso[:10],)).rowcount,
+            "games": conn.execute("DELETE FROM games WHERE next_poll IS NULL AND updated_at < ?", (cutoff_iso,)).rowcount,
+            "news_items": conn.execute("DELETE FROM news_items WHERE posted_at < ?", (cutoff_iso,)).rowcount,
+        }
+
+def track_pending_games(league: str) -> int:
+    # новые матчи с открытыми сигналами встают в трекер; первый опрос — к началу матча
+    with writer() as conn:
+        cur = conn.execute("""
+        INSERT OR IGNORE INTO games (league, game_id, start_utc, next_poll, updated_at)
+        SELECT league, game_id, MIN(start_utc), COALESCE(CAST(strftime('%s', MIN(start_utc)) AS REAL), 0), ?
+        FROM signals
+        WHERE status='PENDING' AND league=? AND game_id IS NOT NULL
+        GROUP BY league, game_id
+        """, (dt.datetime.utcnow().isoformat(), league))
+        return cur.rowcount
+
+def list_due_games(now_ts: float) -> List[dict]:
+    with reader() as conn:
+        cur = conn.execute("""
+        SELECT league, game_id, start_utc, state, polls FROM games
+        WHERE next_poll IS NOT NULL AND next_poll <= ?
+        ORDER BY next_poll
+        """, (now_ts,))
         return [dict(r) for r in cur.fetchall()]
 
-def close_signal(signal_id: int, status: str, final_score: str) -> None:
-    with connect() as conn:
-        conn.execute(
-            "UPDATE signals SET status=?, final_score=?, closed_at=? WHERE id=?",
-            (status, final_score, dt.datetime.utcnow().isoformat(), signal_id)
+def count_tracked_games() -> int:
+    with reader() as conn:
+        return conn.execute("SELECT COUNT(*) FROM games WHERE next_poll IS NOT NULL").fetchone()[0]
+
+def list_game_picks(league: str, game_id: str) -> List[str]:
+    with reader() as conn:
+        cur = conn.execute(
+            "SELECT DISTINCT pick FROM signals WHERE league=? AND game_id=? AND status='PENDING'",
+            (league, game_id)
         )
-        conn.commit()
+        return [r[0] for r in cur.fetchall()]
+
+def update_games(rows: Iterable[Tuple[str, Optional[str], Optional[float], str, str]]) -> None:
+    # (state, start_utc, next_poll, league, game_id) — итог одного прохода трекера одной транзакцией
+    now = dt.datetime.utcnow().isoformat()
+    with writer() as conn:
+        conn.executemany("""
+        UPDATE games SET state=?, start_utc=COALESCE(?, start_utc), next_poll=?, polls=polls+1, updated_at=?
+        WHERE league=? AND game_id=?
+        """, [(state, start, nxt, now, league, gid) for state, start, nxt, league, gid in rows])
+
+def close_game(league: str, game_id: str, final_score: str, grades: Dict[str, str]) -> int:
+    # все PENDING-записи матча закрываются одним UPDATE, статус выбирается по pick
+    if not grades:
+        return 0
+    case = " ".join("WHEN ? THEN ?" for _ in grades)
+    params: List[Any] = [x for kv in grades.items() for x in kv]
+    params += [final_score, dt.datetime.utcnow().isoformat(), league, game_id]
+    with writer() as conn:
+        cur = conn.execute(f"""
+        UPDATE signals SET status=CASE pick {case} ELSE 'VOID' END, final_score=?, closed_at=?
+        WHERE league=? AND game_id=? AND status='PENDING'
+        """, params)
+        return cur.rowcount
+
+def get_snapshot(date_iso: str, league: str) -> Optional[dict]:
+    with reader() as conn:
+        cur = conn.execute("SELECT * FROM snapshots WHERE date=? AND league=?", (date_iso, league))
+        row = cur.fetchone()
+        return dict(row) if row else None
+
+def save_snapshot(date_iso: str, league: str, signals_json: str, first_start: Optional[str] = None) -> None:
+    # first_start: начало первого матча дня по расписанию ("" — матчей нет, NULL — неизвестно)
+    with writer() as conn:
+        conn.execute("""
+        INSERT INTO snapshots (date, league, created_at, signals_json, first_start)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(date, league) DO UPDATE SET created_at=excluded.created_at, signals_json=excluded.signals_json,
+            first_start=COALESCE(excluded.first_start, first_start);
+        """, (date_iso, league, dt.datetime.utcnow().isoformat(), signals_json, first_start))
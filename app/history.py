@@ -0,0 +1,136 @@
+import argparse
+import asyncio
+import datetime as dt
+import json
+import logging
+import sqlite3
+import zlib
+from pathlib import Path
+from typing import Any, Iterator, List, Optional
+
+from .sources import http, nhl
+
+# локальный архив сырых ответов NHL API для офлайн-бэктеста:
+# отдельный SQLite-файл, тела ответов — zlib-сжатый JSON.
+# kind: schedule (ключ — дата), standings (дата), gamecenter (game_id)
+HISTORY_PATH = Path("data") / "history.db"
+BACKFILL_CONCURRENCY = 6
+
+def connect(path: Optional[Path] = None, readonly: bool = False) -> sqlite3.Connection:
+    path = Path(path or HISTORY_PATH)
+    if readonly:
+        return sqlite3.connect(f"file:{path.as_posix()}?mode=ro", uri=True)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path.as_posix())
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS payloads (
+        kind TEXT NOT NULL,
+        key TEXT NOT NULL,
+        fetched_at TEXT NOT NULL,
+        body BLOB NOT NULL,
+        PRIMARY KEY (kind, key)
+    ) WITHOUT ROWID;
+    """)
+    return conn
+
+def put(conn: sqlite3.Connection, kind: str, key: str, obj: Any) -> None:
+    body = zlib.compress(json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+    conn.execute(
+        "INSERT OR REPLACE INTO payloads (kind, key, fetched_at, body) VALUES (?, ?, ?, ?)",
+        (kind, key, dt.datetime.utcnow().isoformat(), body),
+    )
+
+def get(conn: sqlite3.Connection, kind: str, key: str) -> Optional[Any]:
+    row = conn.execute("SELECT body FROM payloads WHERE kind=? AND key=?", (kind, key)).fetchone()
+    return json.loads(zlib.decompress(row[0])) if row else None
+
+def has(conn: sqlite3.Connection, kind: str, key: str) -> bool:
+    return conn.execute("SELECT 1 FROM payloads WHERE kind=? AND key=?", (kind, key)).fetchone() is not None
+
+def dates(start: dt.date, end: dt.date) -> Iterator[dt.date]:
+    d = start
+    while d <= end:
+        yield d
+        d += dt.timedelta(days=1)
+
+async def backfill(start: dt.date, end: dt.date, path: Optional[Path] = None,
+                   concurrency: int = BACKFILL_CONCURRENCY) -> int:
+    # инкрементально: уже сохранённые ключи не запрашиваются повторно
+    conn = connect(path)
+    sem = asyncio.Semaphore(concurrency)
+    fetched = 0
+
+    async def fetch(url: str) -> Any:
+        nonlocal fetched
+        async with sem:
+            fetched += 1
+            return await http.get_json(url)
+
+    try:
+        # schedule/{date} отдаёт неделю: один запрос на 7 дней от первого отсутствующего дня,
+        # дни храним по отдельности. Неудачный запрос пропускается до следующего запуска
+        d = start
+        while d <= end:
+            if has(conn, "schedule", d.isoformat()):
+                d += dt.timedelta(days=1)
+                continue
+            try:
+                week = await fetch(nhl.SCHEDULE_URL.format(date=d.isoformat()))
+            except Exception as e:
+                logging.warning("Backfill schedule %s failed, skipped: %r", d, e)
+            else:
+                for day in week.get("gameWeek", []):
+                    if day.get("date"):
+                        put(conn, "schedule", day["date"], {"gameWeek": [day]})
+                conn.commit()
+            d += dt.timedelta(days=7)
+
+        async def fill(kind: str, keys: List[str], url: str, keep=lambda data: True) -> None:
+            # ошибка по одному ключу (404, исчерпанные повторы) не прерывает загрузку:
+            # ключ пропускается и запросится при следующем инкрементальном запуске
+            need = [k for k in dict.fromkeys(keys) if not has(conn, kind, k)]
+            failed = 0
+            for i in range(0, len(need), 100):
+                chunk = need[i:i + 100]
+                payloads = await asyncio.gather(*(fetch(url.format(date=k, game_id=k)) for k in chunk),
+                                                return_exceptions=True)
+                for k, data in zip(chunk, payloads):
+                    if isinstance(data, Exception):
+                        failed += 1
+                        logging.warning("Backfill %s %s failed, skipped: %r", kind, k, data)
+                    elif keep(data):
+                        put(conn, kind, k, data)
+                conn.commit()
+                logging.info("Backfill %s: %s/%s", kind, min(i + 100, len(need)), len(need))
+            if failed:
+                logging.warning("Backfill %s: %s keys failed, will retry on next run", kind, failed)
+
+        # для дня D бэктест берёт таблицу на D-1 (без заглядывания в результаты дня)
+        await fill("standings", [x.isoformat() for x in dates(start - dt.timedelta(days=1), end)], nhl.STANDINGS_URL)
+
+        game_ids: List[str] = []
+        for x in dates(start, end):
+            sched = get(conn, "schedule", x.isoformat()) or {}
+            game_ids += [m.game_id for m in nhl.parse_matches(sched, x)]
+        # незавершённые матчи не сохраняем — дозагрузятся при следующем запуске
+        await fill("gamecenter", game_ids, nhl.GAMECENTER_URL, keep=lambda data: nhl.parse_final(data) is not None)
+    finally:
+        conn.commit()
+        conn.close()
+        await http.aclose()
+    return fetched
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Загрузка истории NHL API в data/history.db")
+    ap.add_argument("start", type=dt.date.fromisoformat)
+    ap.add_argument("end", type=dt.date.fromisoformat)
+    ap.add_argument("--db", type=Path, default=HISTORY_PATH)
+    ap.add_argument("--concurrency", type=int, default=BACKFILL_CONCURRENCY)
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    n = asyncio.run(backfill(args.start, args.end, args.db, args.concurrency))
+    logging.info("Backfill done: %s upstream requests", n)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import argparse
+import datetime as dt
+import json
+import logging
+import sqlite3
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from . import db, metrics
+
+# обслуживание горячей базы: закрытые сигналы старше N дней переезжают в
+# помесячные архивные SQLite-файлы (JSON-поля — zlib, как в history.py),
+# для /week остаются дневные агрегаты (db.signal_daily). После архивации —
+# incremental_vacuum и checkpoint WAL, чтобы файл базы реально уменьшился.
+ARCHIVE_DIR = Path("data") / "archive"
+ARCHIVE_BATCH = 2000       # сигналов за транзакцию: писатель не блокируется надолго
+VACUUM_PAGES = 20000       # страниц за шаг incremental_vacuum (~80 МБ при 4 КБ)
+
+SIGNAL_COLUMNS = ("id", "created_at", "date", "league", "game_id", "start_utc", "match", "pick",
+                  "confidence", "status", "final_score", "closed_at")
+
+def archive_path(month: str, archive_dir: Optional[Path] = None) -> Path:
+    return Path(archive_dir or ARCHIVE_DIR) / f"signals-{month}.db"
+
+def connect_archive(month: str, archive_dir: Optional[Path] = None) -> sqlite3.Connection:
+    path = archive_path(month, archive_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path.as_posix())
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS signals (
+        {", ".join(SIGNAL_COLUMNS)},
+        body BLOB NOT NULL,
+        PRIMARY KEY (id)
+    );
+    """)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS deliveries (
+        id INTEGER PRIMARY KEY,
+        chat_id INTEGER NOT NULL,
+        signal_id INTEGER NOT NULL,
+        message_id INTEGER,
+        sent_at TEXT
+    );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_deliveries_chat_id ON deliveries(chat_id, id);")
+    return conn
+
+def _body(row: Dict[str, Any]) -> bytes:
+    # why/risks/sources одним сжатым JSON: в горячей базе это основная часть строки
+    parts = [json.loads(row[k] or "[]") for k in ("why_json", "risks_json", "sources_json")]
+    return zlib.compress(json.dumps(parts, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+
+def _write_archive(rows: List[Dict[str, Any]], deliveries: List[Dict[str, Any]],
+                   archive_dir: Optional[Path]) -> None:
+    # архив пишется и коммитится до удаления из горячей базы; повтор после сбоя
+    # перезапишет те же id (INSERT OR REPLACE)
+    months: Dict[str, List[Dict[str, Any]]] = {}
+    for r in rows:
+        months.setdefault(r["created_at"][:7], []).append(r)
+    month_of = {r["id"]: r["created_at"][:7] for r in rows}
+    for month, part in months.items():
+        conn = connect_archive(month, archive_dir)
+        try:
+            with conn:
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO signals ({', '.join(SIGNAL_COLUMNS)}, body) "
+                    f"VALUES ({', '.join('?' for _ in SIGNAL_COLUMNS)}, ?)",
+                    [tuple(r[c] for c in SIGNAL_COLUMNS) + (_body(r),) for r in part],
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO deliveries (id, chat_id, signal_id, message_id, sent_at) VALUES (?, ?, ?, ?, ?)",
+                    [(d["id"], d["chat_id"], d["signal_id"], d["message_id"], d["sent_at"])
+                     for d in deliveries if month_of.get(d["signal_id"]) == month],
+                )
+        finally:
+            conn.close()
+
+def archive_signals(days: int, archive_dir: Optional[Path] = None, batch: int = ARCHIVE_BATCH) -> Dict[str, int]:
+    cutoff = (dt.datetime.utcnow() - dt.timedelta(days=days)).isoformat()
+    out = {"signals": 0, "deliveries": 0}
+    while True:
+        rows = db.list_archivable_signals(cutoff, batch)
+        if not rows:
+            break
+        ids = [r["id"] for r in rows]
+        _write_archive(rows, db.list_signal_deliveries(ids), archive_dir)
+        n_signals, n_deliveries = db.drop_archived_signals(ids)
+        out["signals"] += n_signals
+        out["deliveries"] += n_deliveries
+        if len(rows) < batch:
+            break
+    out.update(db.prune_stale(cutoff))
+    return out
+
+def db_bytes() -> int:
+    return sum(p.stat().st_size for p in (db.DB_PATH, Path(f"{db.DB_PATH}-wal")) if p.exists())
+
+def compact(pages: int = VACUUM_PAGES) -> Dict[str, int]:
+    # свободные страницы возвращаются ФС шагами incremental_vacuum; база, созданная
+    # без auto_vacuum, переводится в INCREMENTAL одним полным VACUUM (только один раз)
+    with db.writer() as conn:
+        mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    out = {"free_pages": free, "full_vacuum": 0}
+    if mode != 2:
+        with db.writer() as conn:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.commit()
+            conn.execute("VACUUM")
+        out["full_vacuum"] = 1
+    else:
+        while free:
+            with db.writer() as conn:
+                conn.execute(f"PRAGMA incremental_vacuum({pages})").fetchall()
+                left = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if left >= free:
+                break
+            free = left
+    with db.writer() as conn:
+        busy, wal_pages, _ = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    out.update(checkpoint_busy=busy, wal_pages=wal_pages)
+    return out
+
+def run(days: int, archive_dir: Optional[Path] = None) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    before = db_bytes()
+    report: Dict[str, Any] = {"archived": archive_signals(days, archive_dir), "compact": compact()}
+    after = db_bytes()
+    report.update(bytes_before=before, bytes_after=after, reclaimed_bytes=before - after,
+                  seconds=round(time.perf_counter() - t0, 2))
+    metrics.set_gauge("db_bytes", after)
+    metrics.inc("maintenance_reclaimed_bytes_total", max(0, before - after))
+    logging.info("Maintenance: %s", report)
+    return report
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Архивация старых сигналов и сжатие базы")
+    ap.add_argument("--days", type=int, default=90, help="архивировать закрытые сигналы старше N дней")
+    ap.add_argument("--archive-dir", type=Path, default=ARCHIVE_DIR)
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    db.init_db()
+    try:
+        print(json.dumps(run(args.days, args.archive_dir), ensure_ascii=False, indent=2))
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
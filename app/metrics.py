@@ -0,0 +1,193 @@
+import bisect
+import functools
+import inspect
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# метрики процесса: счётчики, gauge и гистограммы длительностей в памяти.
+# Пишутся из event loop и из потоков db.run, поэтому под одной блокировкой.
+# Отдаются в текстовом формате Prometheus на локальном /metrics и сводкой в лог.
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, v: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, v)] += 1
+        self.sum += v
+        self.count += 1
+        if v > self.max:
+            self.max = v
+
+    def quantile(self, q: float) -> float:
+        # оценка по границам корзин (верхняя граница корзины с q-м наблюдением),
+        # но не выше наблюдённого максимума
+        rank, seen = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank and c:
+                return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+        return self.max
+
+_lock = threading.Lock()
+_counters: Dict[str, Dict[Labels, float]] = {}
+_gauges: Dict[str, Dict[Labels, float]] = {}
+_histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+_collectors: List[Callable[[], None]] = []
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def add_collector(fn: Callable[[], None]) -> None:
+    # fn() обновляет gauge перед каждой выдачей (/metrics, сводка в лог)
+    _collectors.append(fn)
+
+def _collect() -> None:
+    for fn in list(_collectors):
+        try:
+            fn()
+        except Exception:
+            logging.exception("Metrics collector %r failed", fn)
+
+def inc(name: str, value: float = 1.0, **labels: Any) -> None:
+    key = _labels(labels)
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0.0) + value
+
+def set_gauge(name: str, value: float, **labels: Any) -> None:
+    with _lock:
+        _gauges.setdefault(name, {})[_labels(labels)] = float(value)
+
+def observe(name: str, seconds: float, **labels: Any) -> None:
+    key = _labels(labels)
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        h = series.get(key)
+        if h is None:
+            h = series[key] = _Histogram()
+        h.observe(seconds)
+
+class timed:
+    # длительность в гистограмму name: контекстный менеджер (with/async with)
+    # или декоратор для обычных и async-функций
+    def __init__(self, name: str, **labels: Any):
+        self.name = name
+        self.labels = labels
+        self._started: List[float] = []
+
+    def __enter__(self) -> "timed":
+        self._started.append(time.perf_counter())
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        observe(self.name, time.perf_counter() - self._started.pop(), **self.labels)
+
+    async def __aenter__(self) -> "timed":
+        return self.__enter__()
+
+    async def __aexit__(self, *exc: Any) -> None:
+        self.__exit__(*exc)
+
+    def __call__(self, fn: Callable) -> Callable:
+        name, labels = self.name, self.labels
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                t0 = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    observe(name, time.perf_counter() - t0, **labels)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - t0, **labels)
+        return wrapper
+
+def _fmt_labels(key: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+def render() -> str:
+    _collect()
+    lines: List[str] = []
+    with _lock:
+        for kind, store in (("counter", _counters), ("gauge", _gauges)):
+            for name in sorted(store):
+                lines.append(f"# TYPE {name} {kind}")
+                lines += [f"{name}{_fmt_labels(k)} {v:g}" for k, v in sorted(store[name].items())]
+        for name in sorted(_histograms):
+            lines.append(f"# TYPE {name} histogram")
+            for k, h in sorted(_histograms[name].items()):
+                acc = 0
+                for le, c in zip(BUCKETS + (float("inf"),), h.counts):
+                    acc += c
+                    lines.append(f"{name}_bucket{_fmt_labels(k, ('le', '+Inf' if le == float('inf') else f'{le:g}'))} {acc}")
+                lines.append(f"{name}_sum{_fmt_labels(k)} {h.sum:.6f}")
+                lines.append(f"{name}_count{_fmt_labels(k)} {h.count}")
+    return "\n".join(lines) + "\n"
+
+def summary() -> Dict[str, Any]:
+    # компактная сводка для лога: счётчики, gauge и по гистограммам count/avg/p95/max
+    def key(name: str, k: Labels) -> str:
+        return name + (("[" + ",".join(v for _, v in k) + "]") if k else "")
+
+    _collect()
+    with _lock:
+        out: Dict[str, Any] = {key(n, k): v for n, s in _counters.items() for k, v in s.items()}
+        out.update({key(n, k): v for n, s in _gauges.items() for k, v in s.items()})
+        out.update({
+            key(n, k): {"n": h.count, "avg": round(h.sum / h.count, 4), "p95": h.quantile(0.95), "max": round(h.max, 4)}
+            for n, s in _histograms.items() for k, h in s.items() if h.count
+        })
+    return out
+
+def reset() -> None:
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+    _collectors.clear()
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt: str, *args: Any) -> None:
+        pass
+
+def serve(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    # /metrics в отдельном потоке, event loop бота не блокируется
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logging.info("Metrics on http://%s:%s/metrics", host, server.server_address[1])
+    return server
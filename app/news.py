@@ -0,0 +1,98 @@
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+# разбор постов новостных/стартовых каналов: подтверждения вратарей и травмы.
+# Только регулярки по тексту — без сети, чтобы агент разбирал поток быстро.
+# Команда хранится коротким именем (Bruins), его ищем в названии матча.
+NHL_TEAMS = (
+    "Ducks", "Bruins", "Sabres", "Flames", "Hurricanes", "Blackhawks", "Avalanche", "Blue Jackets",
+    "Stars", "Red Wings", "Oilers", "Panthers", "Kings", "Wild", "Canadiens", "Predators", "Devils",
+    "Islanders", "Rangers", "Senators", "Flyers", "Penguins", "Sharks", "Kraken", "Blues", "Lightning",
+    "Maple Leafs", "Utah", "Canucks", "Golden Knights", "Capitals", "Jets",
+)
+_TEAM_RX = re.compile(r"\b(" + "|".join(re.escape(t) for t in sorted(NHL_TEAMS, key=len, reverse=True)) + r")\b")
+_PLAYER = r"(?P<player>[A-ZА-ЯЁ][\w'’-]+(?:\s+[A-ZА-ЯЁ][\w'’-]+){0,2})"
+_NOTE = r"(?:\s*\([^)]*\))?"  # «Matthews (upper body) is out»
+# команда после «vs/at/против» — соперник, а не команда игрока
+_OPPONENT_RX = re.compile(r"(?:\b(?:vs|v|against|at)\.?|@|\b(?i:против))\s*$", re.IGNORECASE)
+# команда вплотную к имени: «Maple Leafs' Matthews», «Bruins: Swayman», «Matthews (Maple Leafs)»
+_BEFORE_RX = re.compile(r"['’]?s?\s*[:—–-]?\s*")
+_AFTER_RX = re.compile(r"\s*[(,—–-]?\s*")
+_POSSESSIVE_RX = re.compile(r"^\S*['’]s?\s+")  # «Leafs' Auston Matthews» -> «Auston Matthews»
+
+GOALIE_PATTERNS = [
+    re.compile(_PLAYER + _NOTE + r"\s+(?i:will start|starts|is starting|gets the (?:start|nod)|(?:is )?(?:confirmed|projected) "
+               r"(?:starter|to start)|will be in (?:goal|net)|in (?:goal|net) (?:for|tonight))"),
+    re.compile(r"(?i:will start|starting goalie|starting|in goal)[:\s]+" + _PLAYER),
+    re.compile(r"(?i:в воротах|стартовый вратарь|вратарь)[:\s—-]+" + _PLAYER),
+    re.compile(_PLAYER + r"\s+(?i:выйдет в старте|начнёт матч в воротах|сыграет в воротах)"),
+]
+INJURY_PATTERNS = [
+    (re.compile(_PLAYER + _NOTE + r"\s+(?i:(?:is |will be )?(?:out|sidelined))\b"), "out"),
+    (re.compile(_PLAYER + _NOTE + r"\s+(?i:(?:is |remains )?(?:day-to-day|questionable|a game-time decision))"), "questionable"),
+    (re.compile(r"(?i:placed)\s+" + _PLAYER + r"\s+(?i:on (?:LTIR|IR|injured reserve))"), "ir"),
+    (re.compile(_PLAYER + _NOTE + r"\s+(?i:(?:placed on|to) (?:LTIR|IR|injured reserve))"), "ir"),
+    (re.compile(_PLAYER + _NOTE + r"\s+(?i:не сыграет|пропустит|выбыл|травмирован)"), "out"),
+    (re.compile(_PLAYER + _NOTE + r"\s+(?i:под вопросом)"), "questionable"),
+]
+_NOT_PLAYERS = {"The", "Tonight", "Today", "Update", "Injury", "Lineup", "Сегодня", "Травма"}
+
+@dataclass
+class NewsItem:
+    kind: str                # goalie | injury
+    player: str
+    team: Optional[str]      # короткое имя из NHL_TEAMS, если упомянута
+    status: str              # goalie: confirmed; injury: out | questionable | ir
+    text: str                # строка поста, из которой извлечено
+
+def find_team(text: str) -> Optional[str]:
+    # команда поста — только если он называет ровно одну
+    teams = set(_TEAM_RX.findall(text))
+    return teams.pop() if len(teams) == 1 else None
+
+def team_near(line: str, start: int, end: int, default: Optional[str] = None) -> Optional[str]:
+    # команда игрока: одна команда в строке — она, если это не соперник («out vs Bruins»);
+    # несколько команд — только стоящая вплотную к имени, иначе не угадываем.
+    # Строка без команд наследует команду поста
+    mentions = list(_TEAM_RX.finditer(line))
+    if not mentions:
+        return default
+    if len({m.group(1) for m in mentions}) == 1:
+        own = [m for m in mentions if not _OPPONENT_RX.search(line, 0, m.start())]
+        return own[0].group(1) if own else None
+    for m in mentions:
+        if m.end() <= start and _BEFORE_RX.fullmatch(line, m.end(), start):
+            return m.group(1)
+        if m.start() >= end and _AFTER_RX.fullmatch(line, end, m.start()):
+            return m.group(1)
+    return None
+
+def _player(m: "re.Match[str]") -> Optional[str]:
+    name = _POSSESSIVE_RX.sub("", m.group("player").strip(" ."))
+    first = name.split()[0]
+    if first in _NOT_PLAYERS or name in NHL_TEAMS:
+        return None
+    return name
+
+def parse_message(text: str) -> List[NewsItem]:
+    # пост разбирается по строкам: в сводках «состав на вечер» на строку по матчу
+    items: List[NewsItem] = []
+    seen = set()
+    default_team = find_team(text or "")
+    for line in filter(None, (x.strip() for x in (text or "").splitlines())):
+        for rx in GOALIE_PATTERNS:
+            for m in rx.finditer(line):
+                player = _player(m)
+                if player and ("goalie", player) not in seen:
+                    seen.add(("goalie", player))
+                    team = team_near(line, line.find(player, m.start("player")), m.end("player"), default_team)
+                    items.append(NewsItem("goalie", player, team, "confirmed", line[:500]))
+        for rx, status in INJURY_PATTERNS:
+            for m in rx.finditer(line):
+                player = _player(m)
+                if player and ("injury", player) not in seen:
+                    seen.add(("injury", player))
+                    team = team_near(line, line.find(player, m.start("player")), m.end("player"), default_team)
+                    items.append(NewsItem("injury", player, team, status, line[:500]))
+    return items
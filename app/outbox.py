@@ -0,0 +1,204 @@
+import asyncio
+import datetime as dt
+import itertools
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+from . import metrics
+
+# очередь исходящих сообщений Telegram: глобальный и per-chat token bucket,
+# обработка RetryAfter/сетевых ошибок с повтором, несколько воркеров.
+# Сообщения одного submit() уходят в чат строго по порядку одним воркером.
+# Две полосы: ответы на команды (urgent) воркеры берут раньше массовой рассылки,
+# иначе /now ждал бы за всей утренней очередью.
+GLOBAL_RATE = 30.0     # msg/s на бота
+PER_CHAT_RATE = 1.0    # msg/s на чат
+PER_CHAT_BURST = 1.0
+WORKERS = 32    # воркер ждёт per-chat лимит, поэтому их больше, чем msg/s
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+LATENCY_WINDOW = 1000
+LANE_URGENT, LANE_BULK = 0, 1
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        # резервирует токен и возвращает, сколько секунд подождать до отправки
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1.0
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def idle(self) -> bool:
+        return self.tokens + (time.monotonic() - self.updated) * self.rate >= self.burst
+
+@dataclass
+class OutMessage:
+    text: str
+    parse_mode: Optional[str] = None
+    disable_web_page_preview: bool = True
+    reply_markup: Any = None
+    ref: Any = None  # ключ для on_sent (например, id сигнала)
+
+@dataclass
+class _Item:
+    chat_id: int
+    messages: List[OutMessage]
+    urgent: bool = False
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+# (chat_id, ref, message_id, sent_at_iso) по каждому доставленному сообщению с ref
+SentRow = Tuple[int, Any, int, str]
+
+def _retry_after_seconds(e: RetryAfter) -> float:
+    v = e.retry_after
+    return v.total_seconds() if isinstance(v, dt.timedelta) else float(v)
+
+class Outbox:
+    def __init__(self, bot: Any, workers: int = WORKERS, global_rate: float = GLOBAL_RATE,
+                 per_chat_rate: float = PER_CHAT_RATE, per_chat_burst: float = PER_CHAT_BURST,
+                 max_retries: int = MAX_RETRIES,
+                 on_sent: Optional[Callable[[List[SentRow]], Awaitable[None]]] = None):
+        self.bot = bot
+        self.on_sent = on_sent
+        self.workers = max(1, int(workers))
+        self.max_retries = max_retries
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self._global = TokenBucket(global_rate, burst=global_rate)
+        self._chats: Dict[int, TokenBucket] = {}
+        self._paused_until = 0.0
+        # (полоса, порядковый номер, элемент): внутри полосы — FIFO
+        self._queue: "asyncio.PriorityQueue[Tuple[int, int, _Item]]" = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self._tasks: List[asyncio.Task] = []
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._urgent_latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.counters = {"submitted": 0, "sent": 0, "failed": 0, "retried": 0, "flood_waits": 0}
+
+    async def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker(i), name=f"outbox-{i}") for i in range(self.workers)]
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning("Outbox stopped with %s items undelivered", self._queue.qsize())
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, chat_id: int, messages: List[OutMessage], urgent: bool = False) -> None:
+        if not messages:
+            return
+        self.counters["submitted"] += len(messages)
+        lane = LANE_URGENT if urgent else LANE_BULK
+        self._queue.put_nowait((lane, next(self._seq), _Item(chat_id, list(messages), urgent)))
+
+    async def join(self) -> None:
+        await self._queue.join()
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> Dict[str, Any]:
+        def pct(xs: List[float], q: float) -> Optional[float]:
+            return round(xs[min(len(xs) - 1, int(q * len(xs)))], 3) if xs else None
+        lat, urgent = sorted(self._latencies), sorted(self._urgent_latencies)
+        return dict(self.counters, depth=self.depth(), latency_p50=pct(lat, 0.5), latency_p95=pct(lat, 0.95),
+                    latency_p99=pct(lat, 0.99), latency_max=round(lat[-1], 3) if lat else None,
+                    urgent_p50=pct(urgent, 0.5), urgent_p95=pct(urgent, 0.95), urgent_p99=pct(urgent, 0.99))
+
+    async def _wait_turn(self, chat_id: int) -> None:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+        delay = max(bucket.reserve(), self._paused_until - time.monotonic())
+        if delay > 0:
+            await asyncio.sleep(delay)
+        delay = self._global.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _deliver(self, chat_id: int, m: OutMessage) -> Any:
+        attempt = 0
+        while True:
+            await self._wait_turn(chat_id)
+            t0 = time.perf_counter()
+            try:
+                msg = await self.bot.send_message(
+                    chat_id=chat_id, text=m.text, parse_mode=m.parse_mode,
+                    disable_web_page_preview=m.disable_web_page_preview, reply_markup=m.reply_markup,
+                )
+                metrics.observe("tg_send_seconds", time.perf_counter() - t0)
+                return msg
+            except RetryAfter as e:
+                metrics.inc("tg_send_errors_total", error="RetryAfter")
+                # flood control: притормаживаем всю очередь, сообщение не теряем
+                wait = _retry_after_seconds(e)
+                self.counters["flood_waits"] += 1
+                self._paused_until = max(self._paused_until, time.monotonic() + wait)
+                logging.warning("Flood control for chat %s: retry after %.1fs", chat_id, wait)
+                continue
+            except BadRequest as e:
+                metrics.inc("tg_send_errors_total", error="BadRequest")
+                # некорректное сообщение — повтор не поможет
+                logging.warning("Drop message to %s: %s", chat_id, e)
+                return None
+            except NetworkError as e:
+                metrics.inc("tg_send_errors_total", error=type(e).__name__)
+                attempt += 1
+                if attempt > self.max_retries:
+                    logging.error("Give up message to %s after %s retries: %s", chat_id, self.max_retries, e)
+                    return None
+                self.counters["retried"] += 1
+                await asyncio.sleep(min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1)))
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            _, _, item = await self._queue.get()
+            sent: List[SentRow] = []
+            try:
+                for i, m in enumerate(item.messages):
+                    try:
+                        msg = await self._deliver(item.chat_id, m)
+                    except Forbidden as e:
+                        metrics.inc("tg_send_errors_total", error="Forbidden")
+                        # бот заблокирован в чате — остальные сообщения пачки тоже не дойдут
+                        logging.warning("Chat %s unavailable: %s", item.chat_id, e)
+                        self.counters["failed"] += len(item.messages) - i
+                        break
+                    if msg is None:
+                        self.counters["failed"] += 1
+                        continue
+                    self.counters["sent"] += 1
+                    latency = time.monotonic() - item.enqueued_at
+                    (self._urgent_latencies if item.urgent else self._latencies).append(latency)
+                    metrics.observe("tg_delivery_seconds", latency, lane="urgent" if item.urgent else "bulk")
+                    if m.ref is not None:
+                        sent.append((item.chat_id, m.ref, getattr(msg, "message_id", None),
+                                     dt.datetime.utcnow().isoformat()))
+                if sent and self.on_sent is not None:
+                    # одна запись на пачку сообщений чата, а не на каждое сообщение
+                    await self.on_sent(sent)
+            except Exception:
+                logging.exception("Outbox worker %s failed on chat %s", n, item.chat_id)
+                self.counters["failed"] += 1
+            finally:
+                self._queue.task_done()
+                if len(self._chats) > 10000:
+                    self._chats = {k: b for k, b in self._chats.items() if not b.idle()}
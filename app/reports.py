@@ -1,29 +1,81 @@
+import datetime as dt
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
 from . import db
 
-def summarize_last(limit: int = 15) -> str:
-    rows = db.list_recent_signals(limit=limit)
-    if not rows:
-        return "Пока нет записей."
-    lines = ["📊 <b>Последние сигналы</b>"]
-    for r in rows:
-        status = r["status"]
-        st = "⏳" if status == "PENDING" else ("✅" if status == "WIN" else ("❌" if status == "LOSE" else "⚪️"))
-        score = f" — {r['final_score']}" if r.get("final_score") else ""
-        lines.append(f"{st} <b>#{r['id']}</b> {r['league']} • {r['match']} • {r['pick']} • {r['confidence']}%{score}")
-    return "\n".join(lines)
+REPORT_PAGE_SIZE = 15
+REPORT_MAX_LEN = 4096  # лимит длины сообщения Telegram
+
+@dataclass
+class ReportPage:
+    text: str
+    older: Optional[int] = None  # курсор для «старее» (None — дальше записей нет)
+    newer: Optional[int] = None  # курсор для «новее»
+
+def _status_icon(status: str) -> str:
+    return "⏳" if status == "PENDING" else ("✅" if status == "WIN" else ("❌" if status == "LOSE" else "⚪️"))
+
+def _report_line(r) -> str:
+    score = f" — {r['final_score']}" if r["final_score"] else ""
+    return f"{_status_icon(r['status'])} <b>#{r['id']}</b> {r['league']} • {r['match']} • {r['pick']} • {r['confidence']}%{score}"
 
-def week_stats() -> str:
-    rows = db.list_recent_signals(limit=200)
-    if not rows:
+def report_page(chat_id: int, cursor: Optional[int] = None, newer: bool = False,
+                page_size: int = REPORT_PAGE_SIZE, max_len: int = REPORT_MAX_LEN) -> ReportPage:
+    # одна страница журнала чата: строки читаются генератором до заполнения
+    # страницы (по числу записей или длине сообщения) плюс одна — чтобы знать,
+    # есть ли что-то дальше. Объём работы не зависит от длины истории.
+    header = "📊 <b>Последние сигналы</b>"
+    size = len(header)
+    page: List[Tuple[int, str]] = []
+    more = False
+    rows = db.iter_chat_signals(chat_id, cursor, newer, limit=page_size + 1)
+    try:
+        for r in rows:
+            line = _report_line(r)
+            if len(page) >= page_size or size + 1 + len(line) > max_len:
+                more = True
+                break
+            page.append((r["cursor"], line))
+            size += 1 + len(line)
+    finally:
+        rows.close()
+    if not page:
+        return ReportPage("Пока нет записей." if cursor is None else "Больше записей нет.")
+    if newer:
+        page.reverse()
+    # курсор пришёл со страницы, значит в обратную сторону записи есть
+    has_older, has_newer = (cursor is not None, more) if newer else (more, cursor is not None)
+    return ReportPage(
+        "\n".join([header] + [line for _, line in page]),
+        older=page[-1][0] if has_older else None,
+        newer=page[0][0] if has_newer else None,
+    )
+
+def _hit_rate(r: dict) -> str:
+    win, lose = r["win"] or 0, r["lose"] or 0
+    return f"{100 * win / (win + lose):.0f}%" if win + lose else "—"
+
+def _stats_line(label: str, r: dict) -> str:
+    return f"{label}: {r['total']} • ✅ {r['win'] or 0} • ❌ {r['lose'] or 0} • ⏳ {r['pending'] or 0} • хит-рейт {_hit_rate(r)}"
+
+def period_stats(since: dt.datetime, until: Optional[dt.datetime] = None, chat_id: Optional[int] = None) -> Dict[str, List[dict]]:
+    since_iso = since.isoformat()
+    until_iso = until.isoformat() if until else None
+    out = {by: db.signal_stats(since_iso, until_iso, by=by) for by in ("total", "league", "bucket")}
+    if chat_id is not None:
+        out["chat"] = db.signal_stats(since_iso, until_iso, chat_id=chat_id)
+    return out
+
+def week_stats(days: int = 7, chat_id: Optional[int] = None) -> str:
+    since = dt.datetime.utcnow() - dt.timedelta(days=days)
+    st = period_stats(since, chat_id=chat_id)
+    if not st["total"]:
         return "Пока нет статистики."
-    win = sum(1 for r in rows if r["status"] == "WIN")
-    lose = sum(1 for r in rows if r["status"] == "LOSE")
-    pend = sum(1 for r in rows if r["status"] == "PENDING")
-    total = win + lose + pend
-    return "\n".join([
-        "📈 <b>Сводка (последние записи)</b>",
-        f"Всего: {total}",
-        f"Зашло: {win}",
-        f"Не зашло: {lose}",
-        f"Ожидают: {pend}",
-    ])
+    lines = [f"📈 <b>Сводка за {days} дн.</b>", _stats_line("Всего", st["total"][0])]
+    if st.get("chat"):
+        lines.append(_stats_line("Ваши", st["chat"][0]))
+    if len(st["league"]) > 1:
+        lines += ["", "<b>По лигам:</b>"] + [_stats_line(r["k"], r) for r in st["league"]]
+    lines += ["", "<b>По уверенности:</b>"] + [_stats_line(f"{r['k']}–{r['k'] + 4}%", r) for r in st["bucket"]]
+    return "\n".join(lines)
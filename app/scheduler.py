@@ -0,0 +1,65 @@
+import datetime as dt
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+# ежедневная рассылка по «корзинам» минут: одна задача job_queue на каждое
+# занятое время HH:MM, пользователи внутри корзины — множество chat_id в памяти.
+# /settime перекладывает чат между корзинами без рестарта и без сканов таблицы.
+
+class DeliveryScheduler:
+    def __init__(self, job_queue: Any, callback: Callable, timezone: str, default_time: str):
+        self.job_queue = job_queue
+        self.callback = callback
+        self.tz = ZoneInfo(timezone)
+        self.default_time = default_time
+        self.buckets: Dict[str, Set[int]] = {}
+        self.by_chat: Dict[int, str] = {}
+        self.jobs: Dict[str, Any] = {}
+
+    def load(self, rows: Iterable[Tuple[int, Optional[str]]]) -> None:
+        for chat_id, hhmm in rows:
+            self.set(chat_id, hhmm)
+        logging.info("Delivery buckets: %s chats in %s buckets", len(self.by_chat), len(self.buckets))
+
+    def set(self, chat_id: int, hhmm: Optional[str] = None) -> None:
+        hhmm = hhmm or self.default_time
+        old = self.by_chat.get(chat_id)
+        if old == hhmm:
+            return
+        if old is not None:
+            self._discard(chat_id, old)
+        self.by_chat[chat_id] = hhmm
+        bucket = self.buckets.get(hhmm)
+        if bucket is None:
+            bucket = self.buckets[hhmm] = set()
+            self._schedule(hhmm)
+        bucket.add(chat_id)
+
+    def remove(self, chat_id: int) -> None:
+        old = self.by_chat.pop(chat_id, None)
+        if old is not None:
+            self._discard(chat_id, old)
+
+    def chats(self, hhmm: str) -> List[int]:
+        return list(self.buckets.get(hhmm, ()))
+
+    def earliest(self) -> Optional[str]:
+        return min(self.buckets) if self.buckets else None
+
+    def _discard(self, chat_id: int, hhmm: str) -> None:
+        bucket = self.buckets.get(hhmm)
+        if bucket is None:
+            return
+        bucket.discard(chat_id)
+        if not bucket:
+            del self.buckets[hhmm]
+            job = self.jobs.pop(hhmm, None)
+            if job is not None:
+                job.schedule_removal()
+
+    def _schedule(self, hhmm: str) -> None:
+        hh, mm = [int(x) for x in hhmm.split(":")]
+        self.jobs[hhmm] = self.job_queue.run_daily(
+            self.callback, time=dt.time(hh, mm, tzinfo=self.tz), name=f"daily_{hhmm}", data=hhmm
+        )
@@ -0,0 +1,133 @@
+import json
+import math
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# движок оценки: признаки всех матчей дня собираются в одну матрицу
+# (хозяева минус гости), уверенность считается одной операцией по модели.
+# Константы модели (веса, пороги) живут в конфиге, а не в модулях источников.
+
+FEATURES = ("points_pct", "goal_diff_pg", "venue_points_pct", "l10_points_pct")
+FEATURE_LABELS = {
+    "points_pct": "% очков",
+    "goal_diff_pg": "разница шайб/игра",
+    "venue_points_pct": "% очков дома/в гостях",
+    "l10_points_pct": "форма (10 игр)",
+}
+LOGISTIC_MIN_EDGE = 0.1   # |p - 0.5|, если в JSON модели min_edge не задан
+EXPLAIN_TOP = 2           # признаков в объяснении сигнала
+
+@dataclass(frozen=True)
+class ScoringModel:
+    kind: str = "linear"                      # linear | logistic
+    weights: Dict[str, float] = field(default_factory=lambda: {"points_pct": 125.0})
+    intercept: float = 0.0                    # сдвиг в пользу хозяев (в единицах score)
+    base: float = 55.0                        # linear: уверенность при нулевом перевесе
+    min_edge: float = 10.0                    # linear: |score| в п.п.; logistic: |p - 0.5|
+    conf_min: int = 50
+    conf_max: int = 80
+
+    def weight_vector(self) -> np.ndarray:
+        unknown = set(self.weights) - set(FEATURES)
+        if unknown:
+            raise ValueError(f"Unknown features in model: {sorted(unknown)}")
+        return np.array([float(self.weights.get(f, 0.0)) for f in FEATURES])
+
+DEFAULT_MODEL = ScoringModel()
+_model = DEFAULT_MODEL
+
+def load_model(path: Optional[str]) -> ScoringModel:
+    if not path:
+        return DEFAULT_MODEL
+    cfg = json.loads(Path(path).read_text(encoding="utf-8"))
+    # умолчание min_edge (10 п.п.) — для linear; logistic сравнивает |p - 0.5|
+    if cfg.get("kind") == "logistic":
+        cfg.setdefault("min_edge", LOGISTIC_MIN_EDGE)
+    model = ScoringModel(**cfg)
+    if model.kind not in ("linear", "logistic"):
+        raise ValueError(f"Unknown model kind: {model.kind}")
+    if model.kind == "logistic" and not 0.0 <= model.min_edge < 0.5:
+        raise ValueError(f"Logistic min_edge must be in [0, 0.5): {model.min_edge}")
+    model.weight_vector()
+    return model
+
+def configure(model: ScoringModel) -> None:
+    global _model
+    _model = model
+
+def get_model() -> ScoringModel:
+    return _model
+
+def _ratio(num: Any, den: Any, scale: float = 1.0) -> float:
+    try:
+        den = float(den)
+        return float(num) / (den * scale) if den else math.nan
+    except (TypeError, ValueError):
+        return math.nan
+
+def _num(v: Any) -> float:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return math.nan
+
+def team_features(row: Dict[str, Any], venue: str) -> List[float]:
+    # строка standings api-web.nhle.com; venue: "home" | "road"
+    return [
+        _num(row.get("pointPctg")),
+        _ratio(row.get("goalDifferential"), row.get("gamesPlayed")),
+        _ratio(row.get(f"{venue}Points"), row.get(f"{venue}GamesPlayed"), 2.0),
+        _ratio(row.get("l10Points"), row.get("l10GamesPlayed"), 2.0),
+    ]
+
+def feature_matrix(pairs: Sequence[tuple]) -> np.ndarray:
+    # pairs: [(home_row, away_row), ...] -> X[n, k] = признаки хозяев - признаки гостей
+    if not pairs:
+        return np.zeros((0, len(FEATURES)))
+    home = np.array([team_features(h, "home") for h, _ in pairs], dtype=float)
+    away = np.array([team_features(a, "road") for _, a in pairs], dtype=float)
+    return home - away
+
+@dataclass
+class Scores:
+    x: np.ndarray           # матрица признаков (после заполнения пропусков)
+    home: np.ndarray        # bool: прогноз на хозяев (1X), иначе на гостей (X2)
+    confidence: np.ndarray  # int
+    emit: np.ndarray        # bool: перевес достаточный для сигнала
+
+def score(x: np.ndarray, model: Optional[ScoringModel] = None) -> Scores:
+    model = model or _model
+    w = model.weight_vector()
+    # без % очков матч не оцениваем; прочие пропуски дают нулевой вклад
+    valid = ~np.isnan(x[:, 0]) if len(x) else np.zeros(0, dtype=bool)
+    x = np.nan_to_num(x, nan=0.0)
+    z = x @ w + model.intercept
+    if model.kind == "logistic":
+        p = 1.0 / (1.0 + np.exp(-z))
+        home = p >= 0.5
+        raw = np.where(home, p, 1.0 - p) * 100.0
+        emit = np.abs(p - 0.5) >= model.min_edge
+    else:
+        home = z >= 0
+        raw = model.base + np.abs(z)
+        emit = np.abs(z) >= model.min_edge
+    conf = np.clip(raw, model.conf_min, model.conf_max).astype(int)
+    return Scores(x=x, home=home, confidence=conf, emit=emit & valid)
+
+def contributions(x_row: np.ndarray, home: bool, model: Optional[ScoringModel] = None) -> List[Tuple[str, float, float]]:
+    # признаки в пользу выбранной стороны: (признак, разница с её стороны, вклад в score),
+    # по убыванию вклада; признаки против неё не попадают
+    model = model or _model
+    sign = 1.0 if home else -1.0
+    out = [(f, sign * v, sign * v * model.weights[f]) for f, v in zip(FEATURES, x_row) if model.weights.get(f)]
+    return sorted((c for c in out if c[2] > 0), key=lambda c: c[2], reverse=True)
+
+def explain(x_row: np.ndarray, home: bool, model: Optional[ScoringModel] = None) -> str:
+    side = "хозяев" if home else "гостей"
+    top = contributions(x_row, home, model)[:EXPLAIN_TOP]
+    if not top:
+        return f"По признакам команды близки, перевес {side} дал сдвиг модели"
+    return f"Перевес {side} по признакам: " + ", ".join(f"{FEATURE_LABELS[f]} {v:+.3f}" for f, v, _ in top)
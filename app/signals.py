@@ -1,22 +1,162 @@
+import asyncio
 import datetime as dt
 import json
-from typing import List, Dict, Any
+import logging
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Set, Tuple
 
-from .sources import nhl, khl, vhl
+from . import db, metrics
+from .sources import REGISTRY, get as get_source
+from .sources.base import timeout_of
 
-SUPPORTED = {"NHL": nhl, "KHL": khl, "VHL": vhl}
+SUPPORTED = tuple(REGISTRY)  # модули источников грузятся при первой сборке лиги
 
-def collect_signals(date: dt.date, leagues: List[str]) -> List[Dict[str, Any]]:
+TELEGRAM_MAX_LEN = 4096
+DEFAULT_LOCALE = "ru"
+LABELS = {
+    "ru": {
+        "pick": "Рассмотреть", "conf": "Оценка", "why": "Почему", "risks": "Риски",
+        "sources": "Источники", "source": "Источник", "id": "ID записи",
+    },
+}
+
+@dataclass
+class Snapshot:
+    date: dt.date
+    leagues: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    # лиги, которые не удалось собрать (ошибка/таймаут источника): результат частичный
+    degraded: List[str] = field(default_factory=list)
+
+async def _build_league(src: Any, date: dt.date) -> Tuple[List[Dict[str, Any]], str]:
+    # -> (сигналы, начало первого матча дня); источник без расписания — по самим сигналам
+    with metrics.timed("collect_fetch_seconds", league=src.LEAGUE):
+        data = await asyncio.wait_for(src.fetch(date), timeout_of(src))
+    with metrics.timed("collect_build_seconds", league=src.LEAGUE):
+        sigs = render_all(src.build(date, data))
+    starts = getattr(src, "first_start", None)
+    if starts is not None:
+        return sigs, starts(date, data)
+    starts = [(_parse_utc(s.get("start_utc")), str(s.get("start_utc"))) for s in sigs]
+    return sigs, min((x for x in starts if x[0] is not None), default=(None, ""))[1]
+
+def _parse_utc(s: Optional[str]) -> Optional[dt.datetime]:
+    try:
+        return dt.datetime.fromisoformat(str(s).replace("Z", "+00:00")) if s else None
+    except ValueError:
+        return None
+
+# снимки текущего дня в памяти процесса: /now и рассылка не ходят ни в сеть, ни в БД
+_memo: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+
+# начало первого матча (дата, лига) по расписанию: "" — матчей нет; ключа нет —
+# лига ещё не собиралась успешно
+_starts: Dict[Tuple[str, str], str] = {}
+
+# id сигналов, уже отмеченных в БД как взятые в очередь отправки (этим процессом)
+_queued: Set[int] = set()
+
+def _remember(date: dt.date, league: str, sigs: List[Dict[str, Any]], start: Optional[str] = None) -> None:
+    day = date.isoformat()
+    for memo in (_memo, _starts):
+        for key in [k for k in memo if k[0] < day]:
+            del memo[key]
+    _memo[(day, league)] = sigs
+    if start is not None:
+        _starts[(day, league)] = start
+
+@metrics.timed("snapshot_seconds", mode="build")
+async def build_snapshot(date: dt.date, leagues: List[str]) -> Snapshot:
+    # сигналы на день считаются один раз на (дата, лига) и сохраняются в БД,
+    # дальше всем подписчикам отдаётся только фильтр этого снимка
+    snap = Snapshot(date)
+    missing: List[str] = []
+    for lg in dict.fromkeys(x.upper() for x in leagues):
+        if lg not in SUPPORTED:
+            continue
+        sigs = _memo.get((date.isoformat(), lg))
+        if sigs is not None:
+            snap.leagues[lg] = sigs
+            continue
+        row = await db.run(db.get_snapshot, date.isoformat(), lg)
+        if not row:
+            missing.append(lg)
+            continue
+        sigs = render_all(json.loads(row["signals_json"]))
+        if any("id" not in s for s in sigs):
+            await _persist(date, lg, sigs)
+        _remember(date, lg, sigs, row.get("first_start"))
+        snap.leagues[lg] = sigs
+    await _build_leagues(snap, missing)
+    return snap
+
+@metrics.timed("snapshot_seconds", mode="refresh")
+async def refresh_snapshot(date: dt.date, leagues: List[str]) -> Snapshot:
+    # принудительная пересборка (прогрев перед рассылкой); если источник упал,
+    # в памяти и в БД остаётся прежний снимок, а лига помечается degraded
+    snap = Snapshot(date)
+    await _build_leagues(snap, [lg for lg in dict.fromkeys(x.upper() for x in leagues) if lg in SUPPORTED], prune=True)
+    return snap
+
+async def _build_leagues(snap: Snapshot, leagues: List[str], prune: bool = False) -> None:
+    # лиги собираются параллельно; упавший или медленный источник
+    # не валит остальные, а помечается как degraded и не сохраняется
+    results = await asyncio.gather(*(_build_league(get_source(lg), snap.date) for lg in leagues), return_exceptions=True)
+    for lg, res in zip(leagues, results):
+        if isinstance(res, BaseException):
+            logging.warning("League %s failed for %s: %r", lg, snap.date, res)
+            metrics.inc("collect_failures_total", league=lg, error=type(res).__name__)
+            snap.degraded.append(lg)
+            continue
+        sigs, start = res
+        await _persist(snap.date, lg, sigs, prune, start)
+        snap.leagues[lg] = sigs
+
+async def _persist(date: dt.date, league: str, sigs: List[Dict[str, Any]], prune: bool = False,
+                   start: Optional[str] = None) -> None:
+    # канонические строки signals создаются один раз на снимок, их id
+    # сохраняются в самом снимке и попадают в сообщения всех подписчиков
+    ids = await db.run(db.upsert_signals, [to_db_payload(s, date) for s in sigs])
+    for s, sid in zip(sigs, ids):
+        s["id"] = sid
+    if prune:
+        # при пересборке убираем прогнозы, которые пропали из снимка и ещё никому не ушли
+        await db.run(db.prune_undelivered_signals, date.isoformat(), league, ids)
+    await db.run(db.save_snapshot, date.isoformat(), league, json.dumps(sigs, ensure_ascii=False), start)
+    _remember(date, league, sigs, start)
+
+def refresh_due(date: dt.date, league: str, now: dt.datetime) -> bool:
+    # снимок пересобирается до первого вбрасывания дня по расписанию, есть по этому
+    # матчу сигнал или нет; расписание неизвестно (лига не собралась) — собираем
+    start = _starts.get((date.isoformat(), league))
+    if start is None:
+        return True
+    first = _parse_utc(start)
+    return first is not None and first > now
+
+async def claim_for_send(sigs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # перед постановкой в outbox: новые для процесса id отмечаются в БД одной записью
+    # (дальше — только проверка по множеству). Сигнал, который параллельная пересборка
+    # уже удалила, не отправляется: доставка ссылалась бы на несуществующую строку
+    fresh = [s["id"] for s in sigs if s.get("id") is not None and s["id"] not in _queued]
+    if not fresh:
+        return sigs
+    alive = set(await db.run(db.mark_signals_queued, fresh))
+    _queued.update(alive)
+    return [s for s in sigs if s.get("id") is None or s["id"] in _queued]
+
+def filter_snapshot(snap: Snapshot, leagues: List[str], min_confidence: int = 0) -> List[Dict[str, Any]]:
     out: List[Dict[str, Any]] = []
     for lg in leagues:
-        mod = SUPPORTED.get(lg.upper())
-        if not mod:
-            continue
-        out.extend(mod.build_signals(date))
+        out.extend(s for s in snap.leagues.get(lg.upper(), []) if int(s.get("confidence", 0)) >= min_confidence)
     out.sort(key=lambda x: x.get("confidence", 0), reverse=True)
     return out
 
-def format_signal_message(s: Dict[str, Any]) -> str:
+def degraded_for(snap: Snapshot, leagues: List[str]) -> List[str]:
+    wanted = {lg.upper() for lg in leagues}
+    return [lg for lg in snap.degraded if lg in wanted]
+
+def format_signal_message(s: Dict[str, Any], locale: str = DEFAULT_LOCALE) -> str:
+    t = LABELS.get(locale, LABELS[DEFAULT_LOCALE])
     league = s["league"]
     match = s["match"]
     pick = s["pick"]
@@ -29,24 +169,65 @@ def format_signal_message(s: Dict[str, Any]) -> str:
         f"🏒 <b>{league}</b>",
         f"<b>{match}</b>",
         "",
-        f"<b>Рассмотреть:</b> {pick}",
-        f"<b>Оценка:</b> {conf}%",
+        f"<b>{t['pick']}:</b> {pick}",
+        f"<b>{t['conf']}:</b> {conf}%",
     ]
     if why:
-        lines += ["", "<b>Почему:</b>"] + [f"• {w}" for w in why[:6]]
+        lines += ["", f"<b>{t['why']}:</b>"] + [f"• {w}" for w in why[:6]]
     if risks:
-        lines += ["", "<b>Риски:</b>"] + [f"• {r}" for r in risks[:4]]
+        lines += ["", f"<b>{t['risks']}:</b>"] + [f"• {r}" for r in risks[:4]]
     if sources:
-        lines += ["", "<b>Источники:</b>"] + [
-            f"• {src.get('name','Источник')}: {src.get('url','')}" for src in sources[:5]
+        lines += ["", f"<b>{t['sources']}:</b>"] + [
+            f"• {src.get('name', t['source'])}: {src.get('url','')}" for src in sources[:5]
         ]
     return "\n".join(lines)
 
-def to_db_payload(s: Dict[str, Any]) -> Dict[str, Any]:
+def render_all(sigs: List[Dict[str, Any]], locales=tuple(LABELS)) -> List[Dict[str, Any]]:
+    # текст сигнала рендерится один раз на (сигнал, локаль) при сборке снимка
+    # и хранится вместе с ним; при рассылке остаётся только подставить ID
+    for s in sigs:
+        rendered = s.setdefault("rendered", {})
+        for loc in locales:
+            if loc not in rendered:
+                rendered[loc] = format_signal_message(s, loc)
+    return sigs
+
+def render_for_chat(s: Dict[str, Any], locale: str = DEFAULT_LOCALE,
+                    chunk_size: Optional[int] = TELEGRAM_MAX_LEN) -> List[str]:
+    t = LABELS.get(locale, LABELS[DEFAULT_LOCALE])
+    body = s.get("rendered", {}).get(locale) or format_signal_message(s, locale)
+    text = f"{body}\n\n<b>{t['id']}:</b> #{s['id']}"
+    return split_message(text, chunk_size) if chunk_size else [text]
+
+def split_message(text: str, limit: int = TELEGRAM_MAX_LEN) -> List[str]:
+    # режем по строкам (HTML-теги у нас не переходят через перевод строки)
+    if len(text) <= limit:
+        return [text]
+    chunks: List[str] = []
+    cur = ""
+    for line in text.split("\n"):
+        while len(line) > limit:
+            if cur:
+                chunks.append(cur)
+                cur = ""
+            chunks.append(line[:limit])
+            line = line[limit:]
+        if cur and len(cur) + 1 + len(line) > limit:
+            chunks.append(cur)
+            cur = line
+        else:
+            cur = f"{cur}\n{line}" if cur else line
+    if cur:
+        chunks.append(cur)
+    return chunks
+
+def to_db_payload(s: Dict[str, Any], date: dt.date) -> Dict[str, Any]:
     return {
         "created_at": dt.datetime.utcnow().isoformat(),
+        "date": date.isoformat(),
         "league": s["league"],
         "game_id": s.get("game_id"),
+        "start_utc": s.get("start_utc"),
         "match": s["match"],
         "pick": s["pick"],
         "confidence": int(s["confidence"]),
@@ -0,0 +1,19 @@
+import importlib
+from typing import Any, Dict
+
+from .base import check_source
+
+# реестр источников лиг: модуль импортируется при первом обращении к лиге,
+# поэтому старт бота и разовые команды не тянут numpy/модели лишних лиг
+REGISTRY = {
+    "NHL": "app.sources.nhl",
+    "KHL": "app.sources.khl",
+    "VHL": "app.sources.vhl",
+}
+_loaded: Dict[str, Any] = {}
+
+def get(league: str) -> Any:
+    src = _loaded.get(league)
+    if src is None:
+        src = _loaded[league] = check_source(importlib.import_module(REGISTRY[league]))
+    return src
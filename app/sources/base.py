@@ -0,0 +1,26 @@
+import datetime as dt
+from typing import Any, Dict, List, Protocol, runtime_checkable
+
+# интерфейс источника лиги: модуль (или объект) с LEAGUE, async fetch() и чистым build().
+# fetch — только сеть, build — только расчёт по уже загруженным данным,
+# поэтому лиги собираются параллельно, а build можно гонять офлайн.
+# Необязательный first_start(date, data) -> str — начало первого матча дня по расписанию
+# (ISO UTC, "" — матчей нет): до него снимок пересобирается прогревом.
+DEFAULT_TIMEOUT = 15.0
+
+@runtime_checkable
+class LeagueSource(Protocol):
+    LEAGUE: str
+
+    async def fetch(self, date: dt.date) -> Dict[str, Any]: ...
+
+    def build(self, date: dt.date, data: Dict[str, Any]) -> List[Dict[str, Any]]: ...
+
+def check_source(src: Any) -> Any:
+    for attr in ("LEAGUE", "fetch", "build"):
+        if not hasattr(src, attr):
+            raise TypeError(f"League source {src!r} has no {attr}")
+    return src
+
+def timeout_of(src: Any) -> float:
+    return float(getattr(src, "TIMEOUT", DEFAULT_TIMEOUT))
@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+# кэш ответов источников: LRU в памяти + опциональный слой на диске (data/...),
+# TTL задаёт вызывающий по классу эндпоинта, ETag/Last-Modified — для условных запросов.
+# Дисковый слой тоже ограничен (LRU по числу файлов, при старте — порядок по mtime),
+# чтение, запись и удаление файлов идут в отдельном потоке, а не в event loop
+DISK_MAX_ENTRIES = 4096
+
+@dataclass
+class CacheEntry:
+    url: str
+    body: Any
+    fetched_at: float
+    ttl: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        return (now or time.time()) - self.fetched_at < self.ttl
+
+    def validators(self) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 256, disk_dir: Optional[Path] = None,
+                 disk_max_entries: int = DISK_MAX_ENTRIES):
+        self.max_entries = max(1, int(max_entries))
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_entries = max(1, int(disk_max_entries))
+        self._mem: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._disk: "OrderedDict[str, None]" = OrderedDict()  # имена файлов, от старых к новым
+        self._io: Optional[ThreadPoolExecutor] = None
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "evictions": 0, "disk_hits": 0, "coalesced": 0,
+                      "disk_evictions": 0}
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._scan_disk()
+            # один поток: записи одного URL ложатся на диск в порядке put()
+            self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="http-cache")
+
+    def __len__(self) -> int:
+        return len(self._mem)
+
+    def _disk_path(self, url: str) -> Path:
+        return self.disk_dir / (hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _scan_disk(self) -> None:
+        for tmp in self.disk_dir.glob("*.tmp"):
+            tmp.unlink(missing_ok=True)
+        files = sorted(self.disk_dir.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        for p in files[:max(0, len(files) - self.disk_max_entries)]:
+            p.unlink(missing_ok=True)
+            self.stats["disk_evictions"] += 1
+        for p in files[-self.disk_max_entries:]:
+            self._disk[p.name] = None
+
+    async def get(self, url: str) -> Optional[CacheEntry]:
+        entry = self._mem.get(url)
+        if entry is not None:
+            self._mem.move_to_end(url)
+            return entry
+        if self._io is None:
+            return None
+        p = self._disk_path(url)
+        # чтение идёт через тот же поток, что и запись: event loop не ждёт диск,
+        # а отложенная запись этого URL успевает лечь на диск раньше чтения
+        entry, broken = await asyncio.get_running_loop().run_in_executor(self._io, self._read, p)
+        if broken:
+            self._disk.pop(p.name, None)
+        if entry is None:
+            return None
+        newer = self._mem.get(url)
+        if newer is not None:
+            # пока читали диск, put() успел положить свежий ответ
+            return newer
+        self.stats["disk_hits"] += 1
+        if p.name in self._disk:
+            self._disk.move_to_end(p.name)
+        self._remember(url, entry)
+        return entry
+
+    @staticmethod
+    def _read(p: Path) -> Tuple[Optional[CacheEntry], bool]:
+        # -> (запись, файл битый и удалён)
+        try:
+            return CacheEntry(**json.loads(p.read_text(encoding="utf-8"))), False
+        except FileNotFoundError:
+            return None, False
+        except Exception:
+            logging.warning("Broken cache file %s, dropping", p)
+            p.unlink(missing_ok=True)
+            return None, True
+
+    def put(self, entry: CacheEntry) -> None:
+        self._remember(entry.url, entry)
+        if self._io is None:
+            return
+        p = self._disk_path(entry.url)
+        self._disk[p.name] = None
+        self._disk.move_to_end(p.name)
+        evicted = []
+        while len(self._disk) > self.disk_max_entries:
+            evicted.append(self.disk_dir / self._disk.popitem(last=False)[0])
+            self.stats["disk_evictions"] += 1
+        # поля копируются сейчас (touch меняет fetched_at), тело не мутируется —
+        # сериализуется уже в потоке записи
+        fields = (entry.url, entry.body, entry.fetched_at, entry.ttl, entry.etag, entry.last_modified)
+        self._io.submit(self._write, p, fields, evicted)
+
+    @staticmethod
+    def _write(p: Path, fields: Tuple[Any, ...], evicted: list) -> None:
+        try:
+            tmp = p.with_suffix(".tmp")
+            tmp.write_text(json.dumps(asdict(CacheEntry(*fields)), ensure_ascii=False), encoding="utf-8")
+            tmp.replace(p)
+            for old in evicted:
+                old.unlink(missing_ok=True)
+        except Exception:
+            logging.exception("Cache write failed for %s", p)
+
+    def touch(self, entry: CacheEntry) -> None:
+        # 304 Not Modified: тело то же, продлеваем свежесть
+        entry.fetched_at = time.time()
+        self.put(entry)
+
+    def _remember(self, url: str, entry: CacheEntry) -> None:
+        self._mem[url] = entry
+        self._mem.move_to_end(url)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        self._mem.clear()
+
+    def flush(self) -> None:
+        # дожидается отложенных записей на диск
+        if self._io is not None:
+            self._io.submit(lambda: None).result()
+
+    def close(self) -> None:
+        if self._io is not None:
+            self._io.shutdown(wait=True)
+            self._io = None
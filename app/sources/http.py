@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import re
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional
+from urllib.parse import urlsplit
+
+from .. import metrics
+from .cache import DISK_MAX_ENTRIES, CacheEntry, ResponseCache
+
+# httpx (~0.15 с на импорт) подгружается при первом запросе
+if TYPE_CHECKING:
+    import httpx
+
+# общий async-клиент для всех источников: один keep-alive пул,
+# ограничение параллельных запросов на хост, таймауты и ретраи с backoff
+DEFAULT_TIMEOUT = 20.0
+PER_HOST_LIMIT = 8
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_settings = {
+    "timeout": DEFAULT_TIMEOUT,
+    "per_host_limit": PER_HOST_LIMIT,
+    "retries": MAX_RETRIES,
+}
+_client: Optional[httpx.AsyncClient] = None
+_host_limits: Dict[str, asyncio.Semaphore] = {}
+_inflight: Dict[str, "asyncio.Future[Any]"] = {}
+_cache = ResponseCache()
+
+def configure(timeout: float = DEFAULT_TIMEOUT, per_host_limit: int = PER_HOST_LIMIT, retries: int = MAX_RETRIES) -> None:
+    _settings.update(timeout=float(timeout), per_host_limit=max(1, int(per_host_limit)), retries=max(0, int(retries)))
+    _host_limits.clear()
+
+def _get_client() -> httpx.AsyncClient:
+    import httpx
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=_settings["timeout"],
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=16, keepalive_expiry=60),
+            headers={"User-Agent": "hockey-bot/1.0", "Accept": "application/json"},
+            follow_redirects=True,
+        )
+    return _client
+
+def _endpoint(url: str) -> str:
+    # метка метрик: путь без дат и id, чтобы не плодить серии на каждый URL
+    parts = urlsplit(url)
+    return parts.netloc + re.sub(r"/\d[\d-]*(?=/|$)", "/:id", parts.path)
+
+def _host_limit(url: str) -> asyncio.Semaphore:
+    host = urlsplit(url).netloc
+    sem = _host_limits.get(host)
+    if sem is None:
+        sem = _host_limits[host] = asyncio.Semaphore(_settings["per_host_limit"])
+    return sem
+
+def _backoff(attempt: int, retry_after: Optional[str] = None) -> float:
+    if retry_after:
+        try:
+            return min(BACKOFF_MAX, float(retry_after))
+        except ValueError:
+            pass
+    return min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)) * (0.5 + random.random() / 2)
+
+async def _request(url: str, timeout: Optional[float], headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+    import httpx
+    client = _get_client()
+    attempts = _settings["retries"] + 1
+    endpoint = _endpoint(url)
+    for attempt in range(attempts):
+        retry_after = None
+        try:
+            async with _host_limit(url):
+                with metrics.timed("http_request_seconds", endpoint=endpoint):
+                    r = await client.get(url, timeout=timeout or _settings["timeout"], headers=headers)
+            metrics.inc("http_requests_total", endpoint=endpoint, status=r.status_code)
+            if r.status_code == 304:
+                return r
+            if r.status_code not in RETRY_STATUSES or attempt == attempts - 1:
+                r.raise_for_status()
+                return r
+            retry_after = r.headers.get("Retry-After")
+            logging.warning("HTTP %s from %s, retry %s/%s", r.status_code, url, attempt + 1, attempts - 1)
+        except httpx.TransportError as e:
+            metrics.inc("http_requests_total", endpoint=endpoint, status=type(e).__name__)
+            if attempt == attempts - 1:
+                raise
+            logging.warning("HTTP error %r from %s, retry %s/%s", e, url, attempt + 1, attempts - 1)
+        await asyncio.sleep(_backoff(attempt, retry_after))
+    raise RuntimeError(f"unreachable: {url}")
+
+async def _refresh(url: str, entry: Optional[CacheEntry], ttl: float, timeout: Optional[float]) -> Any:
+    try:
+        r = await _request(url, timeout, entry.validators() if entry else None)
+    except Exception:
+        if entry is None:
+            raise
+        # апстрим недоступен — лучше отдать устаревший ответ, чем ничего
+        logging.warning("Serving stale cache for %s", url, exc_info=True)
+        return entry.body
+    if r.status_code == 304 and entry is not None:
+        _cache.stats["revalidated"] += 1
+        _cache.touch(entry)
+        return entry.body
+    _cache.stats["misses"] += 1
+    body = r.json()
+    _cache.put(CacheEntry(
+        url=url, body=body, fetched_at=time.time(), ttl=ttl,
+        etag=r.headers.get("ETag"), last_modified=r.headers.get("Last-Modified"),
+    ))
+    return body
+
+async def get_json(url: str, timeout: Optional[float] = None, ttl: Optional[float] = None) -> Any:
+    if not ttl:
+        return (await _request(url, timeout)).json()
+    entry = await _cache.get(url)
+    if entry is not None and entry.is_fresh():
+        _cache.stats["hits"] += 1
+        return entry.body
+    # одновременные запросы одного URL ждут один вызов апстрима
+    task = _inflight.get(url)
+    if task is None:
+        task = asyncio.ensure_future(_refresh(url, entry, ttl, timeout))
+        _inflight[url] = task
+        task.add_done_callback(lambda _: _inflight.pop(url, None))
+    else:
+        _cache.stats["coalesced"] += 1
+    return await asyncio.shield(task)
+
+def configure_cache(max_entries: int = 256, disk_dir: Optional[str] = None,
+                    disk_max_entries: int = DISK_MAX_ENTRIES) -> None:
+    global _cache
+    _cache.close()
+    _cache = ResponseCache(max_entries, Path(disk_dir) if disk_dir else None, disk_max_entries)
+
+def cache_stats() -> Dict[str, int]:
+    return dict(_cache.stats, size=len(_cache))
+
+async def aclose() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _host_limits.clear()
+    _inflight.clear()
+    await asyncio.to_thread(_cache.flush)
@@ -1,5 +1,10 @@
 import datetime as dt
 from typing import List, Dict, Any
 
-def build_signals(date: dt.date) -> List[Dict[str, Any]]:
+LEAGUE = "KHL"
+
+async def fetch(date: dt.date) -> Dict[str, Any]:
+    return {}
+
+def build(date: dt.date, data: Dict[str, Any]) -> List[Dict[str, Any]]:
     return []
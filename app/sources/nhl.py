@@ -1,16 +1,34 @@
+import asyncio
 import datetime as dt
+import os
 from dataclasses import dataclass
-from typing import List, Dict, Any, Optional
-import requests
+from typing import List, Dict, Any, Optional, Tuple
 
-SCHEDULE_URL = "https://api-web.nhle.com/v1/schedule/{date}"
-STANDINGS_URL = "https://api-web.nhle.com/v1/standings/{date}"
-GAMECENTER_URL = "https://api-web.nhle.com/v1/gamecenter/{game_id}/landing"
+import numpy as np
 
-def _get_json(url: str, timeout: int = 20) -> Dict[str, Any]:
-    r = requests.get(url, timeout=timeout)
-    r.raise_for_status()
-    return r.json()
+from .. import db, scoring
+from . import http
+
+# NHL_API_BASE позволяет направить источник на локальный stub-сервер
+API_BASE = os.getenv("NHL_API_BASE", "https://api-web.nhle.com").rstrip("/")
+SCHEDULE_URL = API_BASE + "/v1/schedule/{date}"
+STANDINGS_URL = API_BASE + "/v1/standings/{date}"
+GAMECENTER_URL = API_BASE + "/v1/gamecenter/{game_id}/landing"
+
+# TTL кэша по классу эндпоинта (сек): таблица за дату почти не меняется,
+# расписание — изредка, gamecenter живой во время матча
+SCHEDULE_TTL = 10 * 60
+STANDINGS_TTL = 60 * 60
+GAMECENTER_TTL = 30  # меньше шага трекера: опрос матча всегда идёт в апстрим (с ETag)
+
+LEAGUE = "NHL"
+TIMEOUT = 15.0
+# новости каналов (agent.py -> news_items) за последние N часов идут в пояснения
+NEWS_LOOKBACK_HOURS = 36
+INJURY_STATUS = {"out": "не сыграет", "questionable": "под вопросом", "ir": "в лазарете (IR)"}
+
+async def _get_json(url: str, ttl: Optional[float] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+    return await http.get_json(url, timeout=timeout, ttl=ttl)
 
 @dataclass
 class Match:
@@ -19,10 +37,12 @@ class Match:
     home: str
     away: str
 
-def fetch_today_matches(date: dt.date) -> List[Match]:
-    data = _get_json(SCHEDULE_URL.format(date=date.isoformat()))
+def parse_matches(data: Dict[str, Any], date: Optional[dt.date] = None) -> List[Match]:
+    # schedule/{date} отдаёт целую неделю; с date берём только игры этого дня
     out: List[Match] = []
     for day in data.get("gameWeek", []):
+        if date is not None and day.get("date") not in (None, date.isoformat()):
+            continue
         for game in day.get("games", []):
             home = game.get("homeTeam", {}).get("name", {}).get("default") or game.get("homeTeam", {}).get("placeName", {}).get("default")
             away = game.get("awayTeam", {}).get("name", {}).get("default") or game.get("awayTeam", {}).get("placeName", {}).get("default")
@@ -36,8 +56,7 @@ def fetch_today_matches(date: dt.date) -> List[Match]:
             ))
     return out
 
-def fetch_standings_map(date: dt.date) -> Dict[str, Dict[str, Any]]:
-    data = _get_json(STANDINGS_URL.format(date=date.isoformat()))
+def parse_standings(data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
     mp: Dict[str, Dict[str, Any]] = {}
     for row in data.get("standings", []):
         name = row.get("teamName", {}).get("default")
@@ -45,71 +64,107 @@ def fetch_standings_map(date: dt.date) -> Dict[str, Dict[str, Any]]:
             mp[name] = row
     return mp
 
-def _point_pct(row: Dict[str, Any]) -> Optional[float]:
-    v = row.get("pointPctg")
-    try:
-        return float(v)
-    except Exception:
-        return None
-
-def build_signals(date: dt.date) -> List[Dict[str, Any]]:
-    matches = fetch_today_matches(date)
-    standings = fetch_standings_map(date)
-    signals: List[Dict[str, Any]] = []
+def first_start(date: dt.date, data: Dict[str, Any]) -> str:
+    # начало первого матча дня по расписанию (UTC), даже если сигнала по нему нет;
+    # "" — матчей в этот день нет
+    starts = [(parse_utc(m.start_utc), m.start_utc) for m in parse_matches(data["schedule"], date)]
+    starts = [x for x in starts if x[0] is not None]
+    return min(starts)[1] if starts else ""
 
-    for m in matches:
-        h = standings.get(m.home)
-        a = standings.get(m.away)
-        if not h or not a:
-            continue
-        hp = _point_pct(h)
-        ap = _point_pct(a)
-        if hp is None or ap is None:
-            continue
+async def fetch(date: dt.date) -> Dict[str, Any]:
+    since = (dt.datetime.now(dt.timezone.utc) - dt.timedelta(hours=NEWS_LOOKBACK_HOURS)).isoformat()
+    schedule, standings, news = await asyncio.gather(
+        _get_json(SCHEDULE_URL.format(date=date.isoformat()), SCHEDULE_TTL),
+        _get_json(STANDINGS_URL.format(date=date.isoformat()), STANDINGS_TTL),
+        db.run(db.list_news, since),  # локальная таблица, без сети
+    )
+    return {"schedule": schedule, "standings": standings, "news": news}
 
-        diff = hp - ap
-        # MVP: берем только явный перекос
-        if abs(diff) < 0.08:
-            continue
+def _match_news(news: List[Dict[str, Any]], m: Match) -> List[Dict[str, Any]]:
+    # команда в новости — короткое имя (Bruins), в расписании — полное или город
+    return [n for n in news if n.get("team") and (n["team"] in m.home or n["team"] in m.away)]
 
-        conf = max(50, min(80, int(55 + diff * 125)))
-        if diff >= 0.08:
-            pick = "1X (хозяева не проиграют)"
-            stronger = m.home
+def _news_notes(items: List[Dict[str, Any]], m: Match, home: bool) -> Tuple[List[str], List[str]]:
+    # -> (доводы, риски) с учётом стороны прогноза: травма у своей команды и вратарь
+    # соперника — риски, травма у соперника и свой подтверждённый вратарь — доводы
+    ours = m.home if home else m.away
+    why: List[str] = []
+    risks: List[str] = []
+    for n in items:
+        own = n["team"] in ours
+        if n["kind"] == "goalie":
+            (why if own else risks).append(f"Вратарь подтверждён: {n['player']} ({n['team']})"
+                                           + ("" if own else " — у соперника"))
         else:
-            pick = "X2 (гости не проиграют)"
-            stronger = m.away
+            status = INJURY_STATUS.get(n["status"], n["status"])
+            (risks if own else why).append(f"Травма: {n['player']} ({n['team']}) — {status}"
+                                           + ("" if own else ", у соперника"))
+    return why, risks
+
+def _reason(m: Match, h: Dict[str, Any], a: Dict[str, Any], x_row: Any, home: bool) -> str:
+    # главный довод — признак с наибольшим вкладом в пользу выбранной стороны
+    stronger = m.home if home else m.away
+    top = scoring.contributions(x_row, home)
+    if not top:
+        return f"По таблице команды близки, {stronger} — с небольшим перевесом по модели"
+    k = scoring.FEATURES.index(top[0][0])
+    hv, av = scoring.team_features(h, "home")[k], scoring.team_features(a, "road")[k]
+    return f"По таблице {stronger} сильнее: {scoring.FEATURE_LABELS[top[0][0]]} — {m.home} {hv:.3f} vs {m.away} {av:.3f}"
+
+def build(date: dt.date, data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    matches = parse_matches(data["schedule"], date)
+    standings = parse_standings(data["standings"])
+    games = [(m, standings[m.home], standings[m.away]) for m in matches if m.home in standings and m.away in standings]
+    if not games:
+        return []
 
+    # все матчи дня оцениваются одной матричной операцией (app.scoring)
+    sc = scoring.score(scoring.feature_matrix([(h, a) for _, h, a in games]))
+    sources = [
+        {"name":"NHL schedule API", "url": SCHEDULE_URL.format(date=date.isoformat())},
+        {"name":"NHL standings API", "url": STANDINGS_URL.format(date=date.isoformat())},
+    ]
+    risks = [
+        "Ранний гол/удаления могут сломать сценарий.",
+        "Хоккей вариативен — это не гарантия."
+    ]
+    signals: List[Dict[str, Any]] = []
+    news = data.get("news") or []
+
+    for i in np.flatnonzero(sc.emit):
+        m, h, a = games[i]
+        home = bool(sc.home[i])
+        pick = "1X (хозяева не проиграют)" if home else "X2 (гости не проиграют)"
         why = [
-            f"По таблице {stronger} заметно сильнее по % очков: {m.home} {hp:.3f} vs {m.away} {ap:.3f}",
-            "База (MVP): без учёта вратарей/травм/формы. Подключим источники следующим шагом."
-        ]
-        risks = [
-            "Ранний гол/удаления могут сломать сценарий.",
-            "Хоккей вариативен — это не гарантия."
-        ]
-        sources = [
-            {"name":"NHL schedule API", "url": SCHEDULE_URL.format(date=date.isoformat())},
-            {"name":"NHL standings API", "url": STANDINGS_URL.format(date=date.isoformat())},
+            _reason(m, h, a, sc.x[i], home),
+            scoring.explain(sc.x[i], home),
         ]
+        items = _match_news(news, m)
+        news_why, extra_risks = _news_notes(items, m, home)
+        why += news_why
+        if not items:
+            why.append("Без учёта вратарей/травм — только таблица и форма.")
 
         signals.append({
             "league": "NHL",
             "game_id": m.game_id,
+            "start_utc": m.start_utc,
             "match": f"{m.away} — {m.home}",
             "pick": pick,
-            "confidence": conf,
+            "confidence": int(sc.confidence[i]),
             "why": why,
-            "risks": risks,
+            "risks": extra_risks + risks,
             "sources": sources,
         })
 
     signals.sort(key=lambda x: x.get("confidence", 0), reverse=True)
     return signals
 
-def fetch_final_score(game_id: str) -> Optional[Dict[str, Any]]:
-    data = _get_json(GAMECENTER_URL.format(game_id=game_id))
-    if data.get("gameState") != "FINAL":
+FINAL_STATES = ("FINAL", "OFF")
+
+def parse_final(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    # OFF — матч завершён и закрыт лигой (так выглядят все прошедшие игры)
+    if data.get("gameState") not in FINAL_STATES:
         return None
     home = data.get("homeTeam", {}).get("name", {}).get("default")
     away = data.get("awayTeam", {}).get("name", {}).get("default")
@@ -119,6 +174,56 @@ def fetch_final_score(game_id: str) -> Optional[Dict[str, Any]]:
         return {"score": f"{away} {as_} — {home} {hs}", "away_score": int(as_), "home_score": int(hs)}
     return None
 
+async def fetch_game(game_id: str) -> Dict[str, Any]:
+    return await _get_json(GAMECENTER_URL.format(game_id=game_id), GAMECENTER_TTL)
+
+# трекер матчей: интервал следующего опроса gamecenter по состоянию игры (сек).
+# До начала не опрашиваем вовсе, в 1-2 периоде спим не дольше оставшегося
+# игрового времени основного (быстрее часов матч не закончится), в концовке
+# и овертайме — раз в минуту, после FINAL/OFF — больше не опрашиваем
+PERIOD_SECONDS = 20 * 60
+POLL_MIN = 60
+POLL_MAX = 15 * 60
+POLL_PREGAME = 2 * 60       # время начала прошло, а матч ещё не начался
+POLL_POSTPONED = 3 * 60 * 60
+POSTPONED_STATES = ("PPD", "SUSP")
+
+def parse_utc(s: Optional[str]) -> Optional[dt.datetime]:
+    if not s:
+        return None
+    try:
+        return dt.datetime.fromisoformat(s.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+def parse_game_state(data: Dict[str, Any]) -> Dict[str, Any]:
+    clock = data.get("clock") or {}
+    return {
+        "state": data.get("gameState") or "",
+        "start_utc": data.get("startTimeUTC"),
+        "period": int((data.get("periodDescriptor") or {}).get("number") or 0),
+        # в перерыве secondsRemaining — остаток перерыва
+        "remaining": clock.get("secondsRemaining"),
+        "intermission": bool(clock.get("inIntermission")),
+    }
+
+def poll_delay(game: Dict[str, Any], now: dt.datetime) -> Optional[float]:
+    state = game.get("state") or ""
+    if state in FINAL_STATES:
+        return None
+    if state in POSTPONED_STATES:
+        return POLL_POSTPONED
+    if state in ("", "FUT", "PRE"):
+        start = parse_utc(game.get("start_utc"))
+        if start is not None and start > now:
+            return max(POLL_MIN, (start - now).total_seconds())
+        return POLL_PREGAME
+    period = game.get("period") or 0
+    if state == "CRIT" or period > 3:
+        return POLL_MIN
+    left = max(0, 3 - period) * PERIOD_SECONDS + (game.get("remaining") or 0)
+    return float(min(POLL_MAX, max(POLL_MIN, left)))
+
 def grade_pick(pick: str, away_score: int, home_score: int) -> str:
     if "1X" in pick:
         return "WIN" if home_score >= away_score else "LOSE"
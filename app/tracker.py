@@ -0,0 +1,57 @@
+import asyncio
+import datetime as dt
+import logging
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+from . import db, metrics, sources
+from .webhook import shard_of
+
+# трекер матчей: каждую минуту опрашиваются только матчи, у которых подошёл
+# next_poll (интервал выбирает nhl.poll_delay по состоянию игры), завершённые
+# сразу рассчитываются. Без Telegram — годится и для разовой команды `bot.py settle`
+TRACK_CONCURRENCY = 8
+LEAGUE = "NHL"
+
+async def track_game(g: Dict[str, Any], now: dt.datetime,
+                     limit: asyncio.Semaphore) -> Tuple[str, Optional[str], Optional[float], str, str]:
+    # один опрос матча: состояние из gamecenter, при FINAL/OFF — расчёт сигналов.
+    # Возвращает строку для db.update_games
+    nhl = sources.get(LEAGUE)
+    game_id = g["game_id"]
+    try:
+        async with limit:
+            data = await nhl.fetch_game(game_id)
+        game = nhl.parse_game_state(data)
+        metrics.inc("tracker_polls_total", state=game["state"] or "?")
+        delay = nhl.poll_delay(game, now)
+        if delay is None:
+            fin = nhl.parse_final(data)
+            if fin is None:
+                # счёт ещё не проставлен — заглянем позже
+                delay = nhl.POLL_PREGAME
+            else:
+                picks = await db.run(db.list_game_picks, g["league"], game_id)
+                grades = {p: nhl.grade_pick(p, fin["away_score"], fin["home_score"]) for p in picks}
+                n = await db.run(db.close_game, g["league"], game_id, fin["score"], grades)
+                logging.info("Settled game %s: %s rows after %s polls", game_id, n, g["polls"] + 1)
+        next_poll = now.timestamp() + delay if delay is not None else None
+        return game["state"], game["start_utc"], next_poll, g["league"], game_id
+    except Exception:
+        logging.exception("Failed to track game %s", game_id)
+        return g["state"], None, now.timestamp() + nhl.POLL_PREGAME, g["league"], game_id
+
+@metrics.timed("track_job_seconds")
+async def run_once(shard: int = 0, shards: int = 1) -> int:
+    now = dt.datetime.now(dt.timezone.utc)
+    await db.run(db.track_pending_games, LEAGUE)
+    # матчи делятся между шардами, каждый ведёт свою часть
+    due = [g for g in await db.run(db.list_due_games, now.timestamp())
+           if shard_of(zlib.crc32(str(g["game_id"]).encode()), shards) == shard]
+    metrics.set_gauge("tracked_games", await db.run(db.count_tracked_games))
+    metrics.set_gauge("tracker_due_games", len(due))
+    if due:
+        limit = asyncio.Semaphore(TRACK_CONCURRENCY)
+        rows = await asyncio.gather(*(track_game(g, now, limit) for g in due))
+        await db.run(db.update_games, rows)
+    return len(due)
@@ -0,0 +1,92 @@
+import datetime as dt
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import db
+
+# кэш настроек пользователей на весь процесс: таблица users читается один раз
+# при старте, команды /setmin, /setleagues, /settime пишут в БД и сразу в кэш.
+DEFAULT_LEAGUES = ("NHL",)
+
+def parse_leagues_csv(csv: Optional[str]) -> Tuple[str, ...]:
+    return tuple(dict.fromkeys(x.strip().upper() for x in (csv or "").split(",") if x.strip()))
+
+class UserRecord:
+    __slots__ = ("chat_id", "min_confidence", "leagues", "daily_time")
+
+    def __init__(self, chat_id: int, min_confidence: int, leagues: Tuple[str, ...], daily_time: str):
+        self.chat_id = chat_id
+        self.min_confidence = min_confidence
+        self.leagues = leagues
+        self.daily_time = daily_time
+
+    def __repr__(self) -> str:
+        return f"UserRecord({self.chat_id}, {self.min_confidence}, {','.join(self.leagues)}, {self.daily_time})"
+
+class UserCache:
+    def __init__(self, default_min_confidence: int, default_daily_time: str):
+        self.default_min_confidence = default_min_confidence
+        self.default_daily_time = default_daily_time
+        self.users: Dict[int, UserRecord] = {}
+
+    def _record(self, chat_id: int, min_confidence: Optional[int] = None,
+                leagues_csv: Optional[str] = None, daily_time: Optional[str] = None) -> UserRecord:
+        return UserRecord(
+            chat_id,
+            self.default_min_confidence if min_confidence is None else int(min_confidence),
+            parse_leagues_csv(leagues_csv) or DEFAULT_LEAGUES,
+            daily_time or self.default_daily_time,
+        )
+
+    def load(self, rows: Iterable[tuple]) -> None:
+        # rows: (chat_id, min_confidence, leagues_csv, daily_time), см. db.list_users
+        for row in rows:
+            rec = self._record(*row)
+            self.users[rec.chat_id] = rec
+        logging.info("User cache: %s users", len(self.users))
+
+    def get(self, chat_id: int) -> Optional[UserRecord]:
+        return self.users.get(chat_id)
+
+    def settings(self, chat_id: int) -> UserRecord:
+        # настройки по умолчанию для чатов без /start (как раньше в get_user_settings)
+        return self.users.get(chat_id) or self._record(chat_id)
+
+    def leagues_of(self, chat_ids: Iterable[int]) -> List[str]:
+        wanted: Dict[str, None] = {}
+        for chat_id in chat_ids:
+            wanted.update(dict.fromkeys(self.settings(chat_id).leagues))
+        return list(wanted)
+
+    def __iter__(self) -> Iterator[UserRecord]:
+        return iter(list(self.users.values()))
+
+    def __len__(self) -> int:
+        return len(self.users)
+
+    # запись: сначала БД, затем кэш — при ошибке БД кэш не расходится с таблицей
+
+    async def add(self, chat_id: int) -> UserRecord:
+        await db.run(db.upsert_user, chat_id, dt.datetime.utcnow().isoformat())
+        rec = self.users.get(chat_id)
+        if rec is None:
+            rec = self.users[chat_id] = self._record(chat_id)
+        return rec
+
+    async def set_min_confidence(self, chat_id: int, value: int) -> None:
+        await db.run(db.set_min_confidence, chat_id, value)
+        rec = self.users.get(chat_id)
+        if rec is not None:
+            rec.min_confidence = value
+
+    async def set_leagues(self, chat_id: int, leagues: List[str]) -> None:
+        await db.run(db.set_leagues, chat_id, ",".join(leagues))
+        rec = self.users.get(chat_id)
+        if rec is not None:
+            rec.leagues = parse_leagues_csv(",".join(leagues)) or DEFAULT_LEAGUES
+
+    async def set_daily_time(self, chat_id: int, hhmm: str) -> None:
+        await db.run(db.set_daily_time, chat_id, hhmm)
+        rec = self.users.get(chat_id)
+        if rec is not None:
+            rec.daily_time = hhmm
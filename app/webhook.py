@@ -0,0 +1,175 @@
+import json
+import logging
+import multiprocessing as mp
+import signal
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+# webhook-режим: фронт принимает апдейты Telegram по HTTP и раскладывает их
+# по воркер-процессам по chat_id (шардирование). Каждый воркер — отдельное
+# Application со своими чатами, рассылкой и очередью отправки, поэтому утренняя
+# рассылка и расчёт результатов используют несколько ядер.
+CHAT_KEYS = ("message", "edited_message", "channel_post", "edited_channel_post", "my_chat_member",
+             "chat_member", "chat_join_request")
+QUEUE_SIZE = 10000
+WATCHDOG_SECONDS = 2.0
+RESTART_LIMIT = 5          # перезапусков одного шарда за RESTART_WINDOW, дальше фронт падает целиком
+RESTART_WINDOW = 300.0
+
+def shard_of(chat_id: int, shards: int) -> int:
+    # abs(): у групп отрицательные id, а % в SQLite и Python для них расходится
+    return abs(int(chat_id)) % shards if shards > 1 else 0
+
+def update_chat_id(data: Dict[str, Any]) -> int:
+    for key in CHAT_KEYS:
+        chat = (data.get(key) or {}).get("chat")
+        if chat:
+            return int(chat.get("id") or 0)
+    cq = data.get("callback_query") or {}
+    chat = (cq.get("message") or {}).get("chat")
+    if chat:
+        return int(chat.get("id") or 0)
+    # inline-запросы и прочее без чата — по отправителю
+    for v in data.values():
+        if isinstance(v, dict) and isinstance(v.get("from"), dict):
+            return int(v["from"].get("id") or 0)
+    return 0
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def _reply(self, status: int, body: bytes = b"") -> None:
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        front: "WebhookFront" = self.server.front
+        if self.path.split("?")[0] != front.path:
+            self._reply(404)
+            return
+        if front.secret and self.headers.get("X-Telegram-Bot-Api-Secret-Token") != front.secret:
+            self._reply(403)
+            return
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            self._reply(400)
+            return
+        # Telegram ждёт быстрый 200; при переполненной очереди шарда отвечаем 503 —
+        # апдейт будет прислан повторно
+        self._reply(200 if front.dispatch(data) else 503)
+
+    def log_message(self, fmt: str, *args: Any) -> None:
+        pass
+
+class WebhookFront:
+    def __init__(self, worker: Callable[[int, int, Any], None], shards: int, listen: str, port: int,
+                 path: str = "/telegram", secret: str = ""):
+        self.worker = worker
+        self.shards = max(1, int(shards))
+        self.listen, self.port = listen, port
+        self.path = path
+        self.secret = secret
+        self.ctx = mp.get_context("spawn")
+        self.queues = [self.ctx.Queue(QUEUE_SIZE) for _ in range(self.shards)]
+        self.procs: List[Any] = [self._spawn(i) for i in range(self.shards)]
+        self.restarts: List[List[float]] = [[] for _ in range(self.shards)]
+        self.server: Optional[ThreadingHTTPServer] = None
+        self.counters = [0] * self.shards
+        self.stopping = threading.Event()
+        self.failed = False
+
+    def _spawn(self, shard: int) -> Any:
+        return self.ctx.Process(target=self.worker, args=(shard, self.shards, self.queues[shard]),
+                                name=f"shard-{shard}")
+
+    def dispatch(self, data: Dict[str, Any]) -> bool:
+        shard = shard_of(update_chat_id(data), self.shards)
+        # мёртвому шарду не копим очередь: 503, Telegram пришлёт апдейт повторно,
+        # когда watchdog поднимет воркер
+        if not self.procs[shard].is_alive():
+            return False
+        try:
+            self.queues[shard].put(data, timeout=1.0)
+        except Exception:
+            logging.warning("Shard %s queue is full, update %s rejected", shard, data.get("update_id"))
+            return False
+        self.counters[shard] += 1
+        return True
+
+    def watchdog(self) -> None:
+        # упавший воркер поднимается с новой очередью: старая могла остаться
+        # с захваченной блокировкой чтения, апдейты в ней теряются (о них пишем в лог).
+        # Шард, падающий чаще RESTART_LIMIT раз за окно, останавливает фронт целиком —
+        # пусть перезапускает менеджер сервисов
+        while not self.stopping.wait(WATCHDOG_SECONDS):
+            for shard, p in enumerate(self.procs):
+                if p.is_alive() or self.stopping.is_set():
+                    continue
+                now = time.monotonic()
+                recent = [t for t in self.restarts[shard] if now - t < RESTART_WINDOW] + [now]
+                self.restarts[shard] = recent
+                if len(recent) > RESTART_LIMIT:
+                    logging.critical("Shard %s keeps dying (exit code %s), stopping webhook front",
+                                     shard, p.exitcode)
+                    self.failed = True
+                    self.shutdown()
+                    return
+                old = self.queues[shard]
+                try:
+                    lost = old.qsize()
+                except NotImplementedError:
+                    lost = -1
+                logging.error("Shard %s died (exit code %s), restarting; %s queued updates lost",
+                              shard, p.exitcode, lost)
+                old.cancel_join_thread()
+                self.queues[shard] = self.ctx.Queue(QUEUE_SIZE)
+                self.procs[shard] = self._spawn(shard)
+                self.procs[shard].start()
+
+    def shutdown(self) -> None:
+        self.stopping.set()
+        if self.server is not None:
+            threading.Thread(target=self.server.shutdown).start()
+
+    def serve(self, on_ready: Optional[Callable[[], None]] = None) -> None:
+        for p in self.procs:
+            p.start()
+        self.server = ThreadingHTTPServer((self.listen, self.port), _Handler)
+        self.server.daemon_threads = True
+        self.server.front = self
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: self.shutdown())
+        threading.Thread(target=self.watchdog, name="shard-watchdog", daemon=True).start()
+        logging.info("Webhook front on http://%s:%s%s, %s shards", self.listen, self.server.server_address[1],
+                     self.path, self.shards)
+        if on_ready is not None:
+            on_ready()
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            self.stop()
+        if self.failed:
+            raise SystemExit(1)
+
+    def stop(self, timeout: float = 60.0) -> None:
+        # воркерам — маркер конца: дорабатывают очередь и отправку, затем выходят
+        self.stopping.set()
+        for q, p in zip(self.queues, self.procs):
+            if p.is_alive():
+                try:
+                    q.put(None, timeout=1.0)
+                except Exception:
+                    logging.warning("Shard %s queue is full, worker will be terminated", p.name)
+        for p in self.procs:
+            p.join(timeout)
+            if p.is_alive():
+                p.terminate()
+        logging.info("Webhook front stopped, updates per shard: %s", self.counters)
@@ -0,0 +1,100 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .stubs import Stubs
+
+# нагрузка на webhook-режим: поднимает заглушки, запускает `bot.py webhook`
+# и шлёт ему синтетические апдейты от N чатов, как это делал бы Telegram.
+# Меряет приём апдейтов фронтом и время, пока все ответы не дойдут до заглушки.
+ROOT = Path(__file__).resolve().parent.parent
+TOKEN = "0:bench"
+SECRET = "bench-secret"
+COMMANDS = ("/start", "/now", "/status", "/setmin 60", "/report")
+
+def update(update_id: int, chat_id: int, text: str) -> Dict[str, Any]:
+    cmd = text.split()[0]
+    return {"update_id": update_id, "message": {
+        "message_id": update_id, "date": int(time.time()), "text": text,
+        "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": f"u{chat_id}"},
+        "entities": [{"type": "bot_command", "offset": 0, "length": len(cmd)}],
+    }}
+
+def post(url: str, data: Dict[str, Any]) -> int:
+    req = urllib.request.Request(url, json.dumps(data).encode("utf-8"),
+                                 {"Content-Type": "application/json", "X-Telegram-Bot-Api-Secret-Token": SECRET})
+    # 503 (очередь шарда полна или шард лежит) — отказ, а не падение прогона
+    try:
+        with urllib.request.urlopen(req) as r:
+            return r.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+def wait_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, b"{}")
+        except urllib.error.HTTPError:
+            return  # фронт отвечает (403 без секрета)
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("webhook front did not start")
+
+def wait_settled(stubs: Stubs, expected: int, timeout: float = 120.0) -> Dict[str, int]:
+    # ответы досчитываются, пока заглушка Telegram получает новые сообщения
+    deadline = time.monotonic() + timeout
+    stats: Dict[str, int] = {}
+    while time.monotonic() < deadline:
+        stats = Stubs.fetch_stats(stubs.stats_url)
+        if stats.get("sendMessage", 0) >= expected:
+            break
+        time.sleep(0.1)
+    return stats
+
+def run(chats: int, workers: int, port: int) -> Dict[str, Any]:
+    with Stubs() as stubs, tempfile.TemporaryDirectory(prefix="hockey-feed-") as tmp:
+        env = dict(os.environ, BOT_TOKEN=TOKEN, TG_BASE_URL=stubs.telegram_base, NHL_API_BASE=stubs.nhl_base,
+                   BOT_DB_PATH=str(Path(tmp) / "bot.db"), WEBHOOK_SECRET=SECRET, WEBHOOK_URL="",
+                   METRICS_PORT="0", TG_GLOBAL_RATE="1000000", TG_PER_CHAT_RATE="1000", TG_PER_CHAT_BURST="10")
+        proc = subprocess.Popen([sys.executable, str(ROOT / "bot.py"), "webhook", "--workers", str(workers),
+                                 "--port", str(port)], cwd=tmp, env=env)
+        url = f"http://127.0.0.1:{port}/telegram"
+        try:
+            wait_ready(url)
+            sent0 = Stubs.fetch_stats(stubs.stats_url).get("sendMessage", 0)
+            updates: List[Dict[str, Any]] = []
+            for text in COMMANDS:
+                updates += [update(len(updates) + 1, 1000 + i, text) for i in range(chats)]
+            t0 = time.perf_counter()
+            rejected = sum(post(url, u) != 200 for u in updates)
+            accept_s = time.perf_counter() - t0
+            stats = wait_settled(stubs, sent0 + len(updates))
+            total_s = time.perf_counter() - t0
+        finally:
+            proc.terminate()
+            proc.wait(60)
+        replies = stats.get("sendMessage", 0) - sent0
+        return {"chats": chats, "workers": workers, "updates": len(updates), "rejected": rejected,
+                "accept_per_s": round(len(updates) / accept_s, 1), "replies": replies,
+                "seconds": round(total_s, 2), "updates_per_s": round(replies / total_s, 1)}
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Нагрузка на webhook-режим бота через заглушки")
+    ap.add_argument("--chats", type=int, default=200)
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--port", type=int, default=18080)
+    args = ap.parse_args(argv)
+    print(json.dumps(run(args.chats, args.workers, args.port), ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
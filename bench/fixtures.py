@@ -0,0 +1,128 @@
+import argparse
+import asyncio
+import datetime as dt
+import json
+import random
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# ответы NHL API для бенчмарка: записанные JSON из bench/fixtures/ (если есть),
+# иначе детерминированная синтетика той же формы. Сид фиксирован, поэтому
+# прогоны на разных машинах считают одно и то же.
+FIXTURES_DIR = Path(__file__).with_name("fixtures")
+SEED = 20241004
+TEAMS = [
+    "Anaheim Ducks", "Boston Bruins", "Buffalo Sabres", "Calgary Flames", "Carolina Hurricanes",
+    "Chicago Blackhawks", "Colorado Avalanche", "Columbus Blue Jackets", "Dallas Stars", "Detroit Red Wings",
+    "Edmonton Oilers", "Florida Panthers", "Los Angeles Kings", "Minnesota Wild", "Montréal Canadiens",
+    "Nashville Predators", "New Jersey Devils", "New York Islanders", "New York Rangers", "Ottawa Senators",
+    "Philadelphia Flyers", "Pittsburgh Penguins", "San Jose Sharks", "Seattle Kraken", "St. Louis Blues",
+    "Tampa Bay Lightning", "Toronto Maple Leafs", "Utah Hockey Club", "Vancouver Canucks", "Vegas Golden Knights",
+    "Washington Capitals", "Winnipeg Jets",
+]
+GAMES_PER_DAY = 12
+
+def _rng(*key: Any) -> random.Random:
+    return random.Random(zlib.crc32(repr((SEED,) + key).encode("utf-8")))
+
+def _team(name: str) -> Dict[str, Any]:
+    return {"name": {"default": name}, "placeName": {"default": name.rsplit(" ", 1)[0]}}
+
+def game_id(date: dt.date, n: int) -> int:
+    return 2024_000_000 + date.toordinal() % 100_000 * 100 + n
+
+def day_games(date: dt.date) -> List[Dict[str, Any]]:
+    rng = _rng("day", date.toordinal())
+    teams = rng.sample(TEAMS, GAMES_PER_DAY * 2)
+    start = dt.datetime.combine(date, dt.time(23, 0))
+    return [{
+        "id": game_id(date, n),
+        "startTimeUTC": (start + dt.timedelta(minutes=30 * (n % 4))).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "awayTeam": _team(teams[2 * n]),
+        "homeTeam": _team(teams[2 * n + 1]),
+    } for n in range(GAMES_PER_DAY)]
+
+def schedule(date: dt.date) -> Dict[str, Any]:
+    # как api-web: schedule/{date} отдаёт неделю начиная с date
+    days = [date + dt.timedelta(days=i) for i in range(7)]
+    return {"gameWeek": [{"date": d.isoformat(), "games": day_games(d)} for d in days]}
+
+def standings(date: dt.date) -> Dict[str, Any]:
+    rng = _rng("standings", date.toordinal())
+    rows = []
+    for name in TEAMS:
+        gp = rng.randint(20, 60)
+        pts = rng.randint(int(gp * 0.6), int(gp * 1.5))
+        home_gp = gp // 2
+        rows.append({
+            "teamName": {"default": name},
+            "gamesPlayed": gp,
+            "points": pts,
+            "pointPctg": round(pts / (2 * gp), 6),
+            "goalDifferential": rng.randint(-40, 40),
+            "homeGamesPlayed": home_gp,
+            "homePoints": rng.randint(int(home_gp * 0.5), int(home_gp * 1.6)),
+            "roadGamesPlayed": gp - home_gp,
+            "roadPoints": rng.randint(int((gp - home_gp) * 0.4), int((gp - home_gp) * 1.5)),
+            "l10GamesPlayed": 10,
+            "l10Points": rng.randint(4, 17),
+        })
+    return {"standings": rows}
+
+def gamecenter(gid: int) -> Dict[str, Any]:
+    rng = _rng("game", gid)
+    home, away = rng.sample(TEAMS, 2)
+    return {
+        "id": gid,
+        "gameState": "OFF",
+        "homeTeam": dict(_team(home), score=rng.randint(0, 6)),
+        "awayTeam": dict(_team(away), score=rng.randint(0, 6)),
+    }
+
+def _recorded(kind: str, key: str) -> Optional[bytes]:
+    p = FIXTURES_DIR / kind / f"{key}.json"
+    return p.read_bytes() if p.exists() else None
+
+def payload(kind: str, key: str) -> bytes:
+    body = _recorded(kind, key)
+    if body is not None:
+        return body
+    if kind == "schedule":
+        obj = schedule(dt.date.fromisoformat(key))
+    elif kind == "standings":
+        obj = standings(dt.date.today() if key == "now" else dt.date.fromisoformat(key))
+    elif kind == "gamecenter":
+        obj = gamecenter(int(key))
+    else:
+        raise KeyError(kind)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+async def record(date: dt.date, games: int = 20) -> None:
+    # снимает настоящие ответы api-web.nhle.com в bench/fixtures/ (нужна сеть)
+    from app.sources import http, nhl
+
+    async def save(kind: str, key: str, url: str) -> Any:
+        data = await http.get_json(url)
+        p = FIXTURES_DIR / kind / f"{key}.json"
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        return data
+
+    try:
+        week = await save("schedule", date.isoformat(), nhl.SCHEDULE_URL.format(date=date.isoformat()))
+        await save("standings", date.isoformat(), nhl.STANDINGS_URL.format(date=date.isoformat()))
+        ids = [m.game_id for m in nhl.parse_matches(week)][:games]
+        await asyncio.gather(*(save("gamecenter", gid, nhl.GAMECENTER_URL.format(game_id=gid)) for gid in ids))
+    finally:
+        await http.aclose()
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Запись ответов NHL API в bench/fixtures/")
+    ap.add_argument("date", type=dt.date.fromisoformat)
+    ap.add_argument("--games", type=int, default=20)
+    args = ap.parse_args(argv)
+    asyncio.run(record(args.date, args.games))
+
+if __name__ == "__main__":
+    main()
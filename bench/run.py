@@ -0,0 +1,305 @@
+import argparse
+import asyncio
+import datetime as dt
+import json
+import multiprocessing as mp
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+from .stubs import Stubs
+
+# офлайн-бенчмарк бота: заглушки NHL API и Telegram Bot API, синтетическая база
+# на N чатов и тысячи открытых сигналов. Прогоняет daily_job, /now, /report и
+# track_job из bot.py, меряет пропускную способность, перцентили задержек,
+# пиковый RSS и размер БД. Каждый размер — в отдельном процессе (честный RSS).
+#
+#   python -m bench.run                       # 1k и 10k чатов, сравнение с bench/baseline.json
+#   python -m bench.run --chats 100000
+#   python -m bench.run --save-baseline       # обновить baseline на этой машине
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+TOKEN = "123456:BENCH"
+DAILY_TIMES = ("08:00", "09:30", "10:30", "12:00", "18:00")
+SAMPLE = 1000          # вызовов /now и /report на замер
+NOW_DURING_DAILY = 50  # /now посреди рассылки: время до доставки ответа
+NOW_INTERVAL = 0.05
+STARTUP_RUNS = 5       # холодных запусков на замер старта (берётся медиана)
+TOLERANCE = 0.25       # допустимое ухудшение относительно baseline
+MS_SLACK = 1.0         # для *_ms разница меньше миллисекунды — шум, а не регрессия
+# направление метрик: 1 — больше лучше, -1 — меньше лучше
+DIRECTIONS = {
+    "daily_msgs_per_s": 1, "daily_seconds": -1, "daily_p95_s": -1,
+    "now_cold_ms": -1, "now_p50_ms": -1, "now_p95_ms": -1, "now_p99_ms": -1,
+    "now_delivery_p50_ms": -1, "now_delivery_p95_ms": -1, "now_delivery_p99_ms": -1,
+    "report_p50_ms": -1, "report_p95_ms": -1, "report_p99_ms": -1,
+    "settle_seconds": -1, "settle_games_per_s": 1,
+    "import_bot_ms": -1, "cli_settle_ms": -1,
+    "peak_rss_mb": -1, "db_mb": -1,
+}
+
+def _pct(xs: List[float], q: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))] if xs else 0.0
+
+def populate(db: Any, chats: int, pending: int, history: int, today: dt.date) -> None:
+    from . import fixtures
+    rng = random.Random(fixtures.SEED + chats)
+    now = dt.datetime.utcnow().isoformat()
+    db.executemany(
+        "INSERT INTO users (chat_id, created_at, min_confidence, leagues, daily_time) VALUES (?, ?, ?, ?, ?)",
+        [(10_000_000 + i, now, rng.choice((None, 50, 55, 60, 65, 70)),
+          rng.choice((None, "NHL", "NHL", "NHL,KHL", "NHL,KHL,VHL")), rng.choice(DAILY_TIMES))
+         for i in range(chats)],
+    )
+    # открытые сигналы по прошедшим матчам — работа для трекера матчей и история для /report
+    payloads: List[Dict[str, Any]] = []
+    d = today
+    while len(payloads) < pending:
+        d -= dt.timedelta(days=1)
+        for g in fixtures.day_games(d):
+            payloads.append({
+                "created_at": now, "date": d.isoformat(), "league": "NHL", "game_id": str(g["id"]),
+                "start_utc": g["startTimeUTC"], "match": f"{g['awayTeam']['name']['default']} — {g['homeTeam']['name']['default']}",
+                "pick": rng.choice(("1X (хозяева не проиграют)", "X2 (гости не проиграют)")),
+                "confidence": rng.randint(55, 80), "why_json": "[]", "risks_json": "[]", "sources_json": "[]",
+            })
+    ids = db.upsert_signals(payloads[:pending])
+    rows = ((10_000_000 + i, sid, None, now) for i in range(chats) for sid in rng.sample(ids, min(history, len(ids))))
+    db.executemany("INSERT OR IGNORE INTO deliveries (chat_id, signal_id, message_id, sent_at) VALUES (?, ?, ?, ?)", rows)
+
+def _settled(db: Any) -> tuple:
+    # (матчей, доведённых трекером до финала, закрытых сигналов)
+    with db.reader() as conn:
+        games = conn.execute("SELECT COUNT(*) FROM games WHERE next_poll IS NULL").fetchone()[0]
+        closed = conn.execute("SELECT COUNT(*) FROM signals WHERE status != 'PENDING'").fetchone()[0]
+    return games, closed
+
+class _Message:
+    def __init__(self, bot: Any, chat_id: int):
+        self.bot, self.chat_id = bot, chat_id
+
+    async def reply_text(self, text: str, **kwargs: Any) -> Any:
+        return await self.bot.send_message(self.chat_id, text, **kwargs)
+
+def _update(app: Any, chat_id: int) -> Any:
+    return SimpleNamespace(effective_chat=SimpleNamespace(id=chat_id), message=_Message(app.bot, chat_id))
+
+async def _tier(chats: int, pending: int, history: int, stubs: Dict[str, Any], workdir: Path) -> Dict[str, Any]:
+    import bot
+    from app import db, metrics, signals, sources
+    from app.config import get_config
+    from app.scheduler import DeliveryScheduler
+    from app.sources import http
+    from app.users import UserCache
+    from telegram.ext import Application
+
+    db.DB_PATH = workdir / "bot.db"
+    db.init_db()
+    cfg = get_config()
+    today = bot.today_in(cfg)
+    t0 = time.perf_counter()
+    populate(db, chats, pending, history, today)
+    populate_s = time.perf_counter() - t0
+
+    http.configure(cfg.http_timeout, cfg.http_per_host_limit, cfg.http_retries)
+    http.configure_cache(cfg.http_cache_size)
+    app = Application.builder().token(TOKEN).base_url(stubs["telegram_base"]).connection_pool_size(512).build()
+    app.bot_data["cfg"] = cfg
+    users = UserCache(cfg.default_min_confidence, cfg.default_daily_time)
+    users.load(db.list_users())
+    app.bot_data["users"] = users
+    scheduler = DeliveryScheduler(app.job_queue, bot.daily_job, cfg.timezone, cfg.default_daily_time)
+    scheduler.load((u.chat_id, u.daily_time) for u in users)
+    app.bot_data["scheduler"] = scheduler
+    await app.initialize()
+    await bot.on_startup(app)
+    outbox = app.bot_data["outbox"]
+    sample = random.Random(chats).sample(sorted(users.users), min(SAMPLE, chats))
+    out: Dict[str, Any] = {"chats": chats, "pending": pending, "populate_seconds": round(populate_s, 2)}
+
+    try:
+        # /now на холодную: снимок собирается из заглушки NHL. Модули источников
+        # грузятся заранее — импорт меряется отдельно (import_bot_ms / cli_settle_ms)
+        for lg in signals.SUPPORTED:
+            sources.get(lg)
+        t0 = time.perf_counter()
+        await bot.cmd_now(_update(app, sample[0]), SimpleNamespace(application=app, args=[]))
+        out["now_cold_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        await outbox.join()
+        snap = await signals.build_snapshot(today, list(signals.SUPPORTED))
+        out["signals_today"] = sum(len(v) for v in snap.leagues.values())
+
+        # ежедневная рассылка по всем корзинам: от первого daily_job до пустой очереди
+        sent0 = outbox.counters["sent"]
+        t0 = time.perf_counter()
+        for hhmm in sorted(scheduler.buckets):
+            await bot.daily_job(SimpleNamespace(application=app, job=SimpleNamespace(data=hhmm)))
+        # /now посреди рассылки: ответ идёт полосой urgent, меряется время до доставки
+        # (outbox latency), а не до постановки в очередь, как now_p*_ms ниже
+        submitted0 = outbox.counters["submitted"]
+        for chat_id in sample[:NOW_DURING_DAILY]:
+            await bot.cmd_now(_update(app, chat_id), SimpleNamespace(application=app, args=[]))
+            await asyncio.sleep(NOW_INTERVAL)
+        now_msgs = outbox.counters["submitted"] - submitted0
+        await outbox.join()
+        daily_s = time.perf_counter() - t0
+        st = outbox.stats()
+        sent = st["sent"] - sent0 - now_msgs
+        out.update({f"now_delivery_p{q}_ms": round(st[f"urgent_p{q}"] * 1000, 1) for q in (50, 95, 99)
+                    if st[f"urgent_p{q}"] is not None})
+        out.update(daily_seconds=round(daily_s, 2), daily_messages=sent,
+                   daily_msgs_per_s=round(sent / daily_s, 1) if daily_s else 0.0,
+                   daily_p50_s=st["latency_p50"], daily_p95_s=st["latency_p95"], daily_failed=st["failed"])
+
+        # /now на прогретом снимке: время обработчика до постановки в очередь
+        lat = []
+        for chat_id in sample:
+            t0 = time.perf_counter()
+            await bot.cmd_now(_update(app, chat_id), SimpleNamespace(application=app, args=[]))
+            lat.append(time.perf_counter() - t0)
+        await outbox.join()
+        out.update({f"now_p{q}_ms": round(_pct(lat, q / 100) * 1000, 3) for q in (50, 95, 99)})
+
+        # /report: страница журнала + ответ через Telegram API
+        lat = []
+        for chat_id in sample:
+            t0 = time.perf_counter()
+            await bot.cmd_report(_update(app, chat_id), SimpleNamespace(application=app, args=[]))
+            lat.append(time.perf_counter() - t0)
+        out.update({f"report_p{q}_ms": round(_pct(lat, q / 100) * 1000, 3) for q in (50, 95, 99)})
+
+        # трекер матчей: завершённые игры считаются по таблице games, как в проде,
+        # закрытые сигналы — для сверки
+        games0, closed0 = _settled(db)
+        t0 = time.perf_counter()
+        await bot.track_job(SimpleNamespace(application=app, job=None))
+        settle_s = time.perf_counter() - t0
+        games1, closed1 = _settled(db)
+        out.update(settle_seconds=round(settle_s, 2), settle_games=games1 - games0, settle_signals=closed1 - closed0,
+                   settle_games_per_s=round((games1 - games0) / settle_s, 1) if settle_s else 0.0)
+    finally:
+        await outbox.stop()
+        await app.shutdown()
+        await http.aclose()
+        db.close()
+
+    out.update(await asyncio.to_thread(startup, workdir))
+    out["telegram"] = await asyncio.to_thread(Stubs.fetch_stats, stubs["telegram_stats"])
+    out["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    out["db_mb"] = round(sum(p.stat().st_size for p in workdir.glob("bot.db*")) / 2 ** 20, 2)
+    out["metrics"] = metrics.summary()
+    return out
+
+def startup(workdir: Path) -> Dict[str, float]:
+    # холодный старт в отдельном интерпретаторе: импорт bot.py и разовая команда
+    # `bot.py settle` на базе этого прогона (все матчи уже рассчитаны — чистый старт)
+    env = dict(os.environ, BOT_DB_PATH=str(workdir / "bot.db"), PYTHONPATH=str(ROOT))
+
+    def wall(*cmd: str) -> float:
+        runs = []
+        for _ in range(STARTUP_RUNS):
+            t0 = time.perf_counter()
+            subprocess.run([sys.executable, *cmd], env=env, cwd=workdir, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            runs.append(time.perf_counter() - t0)
+        return round(statistics.median(runs) * 1000, 1)
+
+    return {"import_bot_ms": wall("-c", "import bot"), "cli_settle_ms": wall(str(ROOT / "bot.py"), "settle")}
+
+def _child(chats: int, pending: int, history: int, stubs: Dict[str, Any], conn: Any) -> None:
+    # отдельный процесс на размер: окружение задаётся до импорта bot/app
+    os.environ.update({
+        "NHL_API_BASE": stubs["nhl_base"], "BOT_TOKEN": TOKEN, "METRICS_PORT": "0",
+        # лимиты Telegram сняты: меряем собственную пропускную способность бота
+        "TG_GLOBAL_RATE": "1000000", "TG_PER_CHAT_RATE": "1000", "TG_PER_CHAT_BURST": "10",
+    })
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    with tempfile.TemporaryDirectory(prefix="hockey-bench-") as tmp:
+        try:
+            conn.send(asyncio.run(_tier(chats, pending, history, stubs, Path(tmp))))
+        except BaseException as e:
+            conn.send({"chats": chats, "error": repr(e)})
+            raise
+
+def run_tier(chats: int, pending: int, history: int, stubs: Stubs) -> Dict[str, Any]:
+    ctx = mp.get_context("spawn")
+    parent, child = ctx.Pipe()
+    info = {"nhl_base": stubs.nhl_base, "telegram_base": stubs.telegram_base, "telegram_stats": stubs.stats_url}
+    p = ctx.Process(target=_child, args=(chats, pending, history, info, child))
+    p.start()
+    result = parent.recv()
+    p.join()
+    return result
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    for r in results:
+        base = baseline.get(str(r["chats"]))
+        if not base:
+            continue
+        for key, sign in DIRECTIONS.items():
+            new, old = r.get(key), base.get(key)
+            if not isinstance(new, (int, float)) or not isinstance(old, (int, float)) or not old:
+                continue
+            if key.endswith("_ms") and abs(new - old) < MS_SLACK:
+                continue
+            change = (new - old) / old * sign  # < 0 — хуже
+            if change < -tolerance:
+                regressions.append(f"{r['chats']} chats: {key} {old} -> {new} ({change:+.0%})")
+    return regressions
+
+def format_table(results: List[Dict[str, Any]]) -> str:
+    keys = (["populate_seconds", "signals_today", "daily_messages"] + list(DIRECTIONS)
+            + ["settle_games", "settle_signals", "daily_failed"])
+    lines = [f"{'metric':<20}" + "".join(f"{r['chats']:>12}" for r in results)]
+    for k in keys:
+        lines.append(f"{k:<20}" + "".join(f"{str(r.get(k, '-')):>12}" for r in results))
+    return "\n".join(lines)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="Офлайн-бенчмарк бота на заглушках NHL и Telegram")
+    ap.add_argument("--chats", default="1000,10000", help="размеры популяции через запятую")
+    ap.add_argument("--pending", type=int, default=3000, help="открытых сигналов по прошедшим матчам")
+    ap.add_argument("--history", type=int, default=20, help="доставок в журнале на чат")
+    ap.add_argument("--tg-latency-ms", type=float, default=0.0, help="задержка ответа заглушки Telegram")
+    ap.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--tolerance", type=float, default=TOLERANCE)
+    ap.add_argument("--out", type=Path, help="полный результат в JSON")
+    args = ap.parse_args(argv)
+
+    results = []
+    with Stubs(args.tg_latency_ms) as stubs:
+        for n in (int(x) for x in args.chats.split(",") if x.strip()):
+            r = run_tier(n, args.pending, args.history, stubs)
+            if "error" in r:
+                raise SystemExit(f"{n} chats failed: {r['error']}")
+            results.append(r)
+            print(f"{n} chats done", file=sys.stderr)
+
+    print(format_table(results))
+    if args.out:
+        args.out.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    if args.save_baseline:
+        base = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline.exists() else {}
+        base.update({str(r["chats"]): {k: r[k] for k in DIRECTIONS if k in r} for r in results})
+        args.baseline.write_text(json.dumps(base, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        return
+    if args.baseline.exists():
+        regressions = compare(results, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        if regressions:
+            print("\nRegressions vs baseline:\n" + "\n".join(regressions))
+            raise SystemExit(1)
+        print("\nNo regressions vs baseline.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import json
+import multiprocessing as mp
+import re
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+from . import fixtures
+
+# локальные заглушки для бенчмарка: api-web.nhle.com (записанные/синтетические JSON)
+# и Telegram Bot API (getMe/sendMessage/editMessageText/answerCallbackQuery).
+# Обе крутятся в отдельном процессе, чтобы не делить GIL с измеряемым ботом.
+NHL_ROUTES = (
+    (re.compile(r"^/v1/schedule/([\d-]+)$"), "schedule"),
+    (re.compile(r"^/v1/standings/([\w-]+)$"), "standings"),
+    (re.compile(r"^/v1/gamecenter/(\d+)/landing$"), "gamecenter"),
+)
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, как у настоящих API
+    disable_nagle_algorithm = True  # заголовки и тело уходят разными send(): без этого +40 мс на ответ
+
+    def _reply(self, status: int, body: bytes, headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt: str, *args: Any) -> None:
+        pass
+
+class NHLHandler(_Handler):
+    def do_GET(self) -> None:
+        self.server.counters["requests"] += 1
+        for rx, kind in NHL_ROUTES:
+            m = rx.match(self.path)
+            if m:
+                body = fixtures.payload(kind, m.group(1))
+                etag = '"%x"' % (hash(body) & 0xFFFFFFFF)
+                if self.headers.get("If-None-Match") == etag:
+                    self._reply(304, b"", {"ETag": etag})
+                else:
+                    self._reply(200, body, {"ETag": etag})
+                return
+        self._reply(404, b'{"error":"not found"}')
+
+class TelegramHandler(_Handler):
+    def do_POST(self) -> None:
+        m = re.match(r"^/bot[^/]+/(\w+)$", self.path)
+        if m is None:
+            self._reply(404, b'{"ok":false,"error_code":404,"description":"Not Found"}')
+            return
+        n = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(n) if n else b""
+        if "json" in (self.headers.get("Content-Type") or ""):
+            params = json.loads(raw or b"{}")
+        else:
+            params = {k: v[0] for k, v in parse_qs(raw.decode("utf-8")).items()}
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        result = self.server.dispatch(m.group(1), params)
+        self._reply(200, json.dumps({"ok": True, "result": result}).encode("utf-8"))
+
+    def do_GET(self) -> None:
+        if self.path == "/stats":
+            self._reply(200, json.dumps(self.server.counters).encode("utf-8"))
+        else:
+            self.do_POST()
+
+class TelegramServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr: Tuple[str, int], latency: float = 0.0):
+        super().__init__(addr, TelegramHandler)
+        self.latency = latency
+        self.counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._message_id = 0
+
+    def dispatch(self, method: str, params: Dict[str, Any]) -> Any:
+        with self._lock:
+            self.counters[method] = self.counters.get(method, 0) + 1
+            self._message_id += 1
+            message_id = self._message_id
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot",
+                    "can_join_groups": True, "can_read_all_group_messages": False, "supports_inline_queries": False}
+        if method in ("sendMessage", "editMessageText"):
+            chat_id = int(params.get("chat_id") or 0)
+            return {"message_id": message_id, "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"}, "text": params.get("text", "")}
+        return True
+
+class NHLServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr: Tuple[str, int]):
+        super().__init__(addr, NHLHandler)
+        self.counters = {"requests": 0}
+
+def _serve(nhl_port: int, tg_port: int, tg_latency: float, ready: Any) -> None:
+    servers = [NHLServer(("127.0.0.1", nhl_port)), TelegramServer(("127.0.0.1", tg_port), tg_latency)]
+    for s in servers:
+        threading.Thread(target=s.serve_forever, daemon=True).start()
+    ready.send(tuple(s.server_address[1] for s in servers))
+    threading.Event().wait()
+
+class Stubs:
+    # заглушки NHL и Telegram в дочернем процессе; порты выбираются свободные
+    def __init__(self, tg_latency_ms: float = 0.0):
+        self.tg_latency = tg_latency_ms / 1000.0
+        self.proc: Optional[mp.Process] = None
+        self.nhl_port = self.tg_port = 0
+
+    def __enter__(self) -> "Stubs":
+        parent, child = mp.Pipe()
+        self.proc = mp.get_context("spawn").Process(target=_serve, args=(0, 0, self.tg_latency, child), daemon=True)
+        self.proc.start()
+        self.nhl_port, self.tg_port = parent.recv()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        if self.proc is not None:
+            self.proc.terminate()
+            self.proc.join(5)
+
+    @property
+    def nhl_base(self) -> str:
+        return f"http://127.0.0.1:{self.nhl_port}"
+
+    @property
+    def telegram_base(self) -> str:
+        return f"http://127.0.0.1:{self.tg_port}/bot"
+
+    @property
+    def stats_url(self) -> str:
+        return f"http://127.0.0.1:{self.tg_port}/stats"
+
+    @staticmethod
+    def fetch_stats(url: str) -> Dict[str, int]:
+        # счётчики вызовов методов заглушки Telegram (за всё время её жизни)
+        with urllib.request.urlopen(url) as r:
+            return json.loads(r.read())
@@ -1,18 +1,51 @@
 #!/usr/bin/env python3
+from __future__ import annotations
+
+import time
+_T0 = time.perf_counter()
+
+import argparse
+import asyncio
 import logging
 import datetime as dt
+import os
+import signal
+import socket
+from dataclasses import replace
+from pathlib import Path
+from queue import Empty
+from types import SimpleNamespace
+from typing import TYPE_CHECKING
 from zoneinfo import ZoneInfo
 import re
 
-from telegram import Update
-from telegram.constants import ParseMode
-from telegram.ext import Application, CommandHandler, ContextTypes
-
 from app.config import get_config
-from app import db
-from app.signals import collect_signals, format_signal_message, to_db_payload
-from app.reports import summarize_last, week_stats
-from app.sources import nhl as nhl_source
+from app import db, maintenance, metrics, tracker
+from app.signals import (
+    SUPPORTED, build_snapshot, claim_for_send, degraded_for, filter_snapshot, refresh_due, refresh_snapshot,
+    render_for_chat,
+)
+from app.reports import ReportPage, report_page, week_stats
+from app.scheduler import DeliveryScheduler
+from app.users import UserCache
+from app.sources import http
+from app.webhook import WebhookFront
+
+# python-telegram-bot (и outbox поверх него) импортируется лениво, внутри функций:
+# разовые команды (settle, backfill, maintenance) стартуют без него
+if TYPE_CHECKING:
+    from telegram import Update
+    from telegram.ext import Application, ContextTypes
+
+IMPORT_SECONDS = time.perf_counter() - _T0
+PARSE_HTML = "HTML"  # telegram.constants.ParseMode.HTML
+ONESHOT_COMMANDS = ("settle", "send-daily", "backfill", "maintenance")
+# аренда фоновых задач шарда (рассылка, прогрев, расчёт): при нескольких
+# экземплярах их выполняет только держатель аренды, остальные лишь отвечают на апдейты
+LEASE_TTL = 60
+LEASE_RENEW = 20
+SHARD_POLL_SECONDS = 0.5  # воркер проверяет SIGTERM между ожиданиями очереди фронта
+HOLDER = f"{socket.gethostname()}:{os.getpid()}"
 
 def parse_leagues(text: str):
     items = [x.strip().upper() for x in text.split(",") if x.strip()]
@@ -31,25 +64,10 @@ def parse_hhmm(s: str):
         return None
     return f"{hh:02d}:{mm:02d}"
 
-def get_user_settings(chat_id: int, cfg):
-    u = db.get_user(chat_id)
-    minc = cfg.default_min_confidence
-    leagues = ["NHL"]
-    daily_time = cfg.default_daily_time
-    if u:
-        if u.get("min_confidence") is not None:
-            minc = int(u["min_confidence"])
-        if u.get("leagues"):
-            leagues = [x.strip().upper() for x in u["leagues"].split(",") if x.strip()]
-        if u.get("daily_time"):
-            daily_time = u["daily_time"]
-    return minc, leagues, daily_time
-
 async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
-    db.upsert_user(chat_id, dt.datetime.utcnow().isoformat())
-    cfg = context.application.bot_data["cfg"]
-    minc, leagues, daily_time = get_user_settings(chat_id, cfg)
+    u = await context.application.bot_data["users"].add(chat_id)
+    context.application.bot_data["scheduler"].set(chat_id, u.daily_time)
     await update.message.reply_text(
         "✅ Готово. Я запомнил этот чат.\n\n"
         "Команды:\n"
@@ -58,21 +76,19 @@ async def cmd_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "• /settime 10:30 — время ежедневного отчёта\n"
         "• /setleagues NHL,KHL,VHL — лиги\n"
         "• /report — журнал\n"
-        "• /week — сводка\n\n"
-        f"Текущие: порог {minc}%, лиги {','.join(leagues)}, время {daily_time}",
+        "• /week 7 — сводка за N дней\n\n"
+        f"Текущие: порог {u.min_confidence}%, лиги {','.join(u.leagues)}, время {u.daily_time}",
         disable_web_page_preview=True
     )
 
 async def cmd_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
     cfg = context.application.bot_data["cfg"]
-    chat_id = update.effective_chat.id
-    u = db.get_user(chat_id)
+    u = context.application.bot_data["users"].get(update.effective_chat.id)
     if not u:
         await update.message.reply_text("Сначала /start")
         return
-    minc, leagues, daily_time = get_user_settings(chat_id, cfg)
     await update.message.reply_text(
-        f"Настройки:\n• min: {minc}%\n• leagues: {','.join(leagues)}\n• daily: {daily_time} ({cfg.timezone})"
+        f"Настройки:\n• min: {u.min_confidence}%\n• leagues: {','.join(u.leagues)}\n• daily: {u.daily_time} ({cfg.timezone})"
     )
 
 async def cmd_setmin(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -87,7 +103,7 @@ async def cmd_setmin(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except ValueError:
         await update.message.reply_text("Порог 50..80. Пример: /setmin 65")
         return
-    db.set_min_confidence(chat_id, v)
+    await context.application.bot_data["users"].set_min_confidence(chat_id, v)
     await update.message.reply_text(f"Ок. Порог: {v}%")
 
 async def cmd_settime(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -99,8 +115,15 @@ async def cmd_settime(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not hhmm:
         await update.message.reply_text("Формат HH:MM, например /settime 10:30")
         return
-    db.set_daily_time(chat_id, hhmm)
-    await update.message.reply_text("Ок. Время сохранено.\n⚠️ Применится при следующем рестарте бота.")
+    # в корзину рассылки попадают только зарегистрированные чаты: иначе чат без /start
+    # получал бы рассылку с настройками по умолчанию до перезапуска
+    users = context.application.bot_data["users"]
+    if users.get(chat_id) is None:
+        await update.message.reply_text("Сначала /start")
+        return
+    await users.set_daily_time(chat_id, hhmm)
+    context.application.bot_data["scheduler"].set(chat_id, hhmm)
+    await update.message.reply_text(f"Ок. Ежедневный отчёт в {hhmm}.")
 
 async def cmd_setleagues(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
@@ -111,69 +134,250 @@ async def cmd_setleagues(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not leagues:
         await update.message.reply_text("Доступно: NHL,KHL,VHL. Пример: /setleagues NHL,KHL")
         return
-    db.set_leagues(chat_id, ",".join(leagues))
+    await context.application.bot_data["users"].set_leagues(chat_id, leagues)
     await update.message.reply_text(f"Ок. Лиги: {','.join(leagues)}")
 
-async def send_signals(app: Application, chat_id: int, cfg):
-    minc, leagues, _ = get_user_settings(chat_id, cfg)
-    today = dt.datetime.now(ZoneInfo(cfg.timezone)).date()
-    sigs = collect_signals(today, leagues)
-    sigs = [s for s in sigs if int(s.get("confidence", 0)) >= minc]
+def today_in(cfg) -> dt.date:
+    return dt.datetime.now(ZoneInfo(cfg.timezone)).date()
 
+@metrics.timed("send_signals_seconds")
+async def send_signals(app: Application, chat_id: int, cfg, snapshot=None, urgent: bool = False):
+    # urgent — ответ на команду: идёт в outbox раньше массовой рассылки
+    from app.outbox import OutMessage
+    u = app.bot_data["users"].settings(chat_id)
+    if snapshot is None:
+        snapshot = await build_snapshot(today_in(cfg), u.leagues)
+    sigs = filter_snapshot(snapshot, u.leagues, u.min_confidence)
+    degraded = degraded_for(snapshot, u.leagues)
+
+    outbox = app.bot_data["outbox"]
+    if degraded:
+        outbox.submit(chat_id, [OutMessage(f"⚠️ Источники {','.join(degraded)} сейчас недоступны, список неполный.")],
+                      urgent=urgent)
     if not sigs:
-        await app.bot.send_message(chat_id=chat_id, text="Сегодня сигналов нет (по текущим фильтрам).")
+        outbox.submit(chat_id, [OutMessage("Сегодня сигналов нет (по текущим фильтрам).")], urgent=urgent)
         return
 
-    for s in sigs[:5]:
-        sid = db.insert_signal(to_db_payload(s))
-        msg = format_signal_message(s) + f"\n\n<b>ID записи:</b> #{sid}"
-        await app.bot.send_message(chat_id=chat_id, text=msg, parse_mode=ParseMode.HTML, disable_web_page_preview=True)
+    # канонические сигналы уже записаны при сборке снимка; факт доставки
+    # фиксируется в deliveries после успешной отправки (record_deliveries),
+    # а до неё сигнал защищён от пересборки отметкой queued_at
+    outbox.submit(chat_id, [
+        OutMessage(text, parse_mode=PARSE_HTML, ref=s["id"])
+        for s in await claim_for_send(sigs[:5])
+        for text in render_for_chat(s)
+    ], urgent=urgent)
 
 async def cmd_now(update: Update, context: ContextTypes.DEFAULT_TYPE):
     cfg = context.application.bot_data["cfg"]
-    await send_signals(context.application, update.effective_chat.id, cfg)
+    await send_signals(context.application, update.effective_chat.id, cfg, urgent=True)
+
+def report_keyboard(page: ReportPage):
+    from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+    buttons = []
+    if page.newer is not None:
+        buttons.append(InlineKeyboardButton("◀️ Новее", callback_data=f"report:n:{page.newer}"))
+    if page.older is not None:
+        buttons.append(InlineKeyboardButton("Старее ▶️", callback_data=f"report:o:{page.older}"))
+    return InlineKeyboardMarkup([buttons]) if buttons else None
 
 async def cmd_report(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text(summarize_last(15), parse_mode=ParseMode.HTML, disable_web_page_preview=True)
+    page = await db.run(report_page, update.effective_chat.id)
+    await update.message.reply_text(page.text, parse_mode=PARSE_HTML, disable_web_page_preview=True,
+                                    reply_markup=report_keyboard(page))
+
+async def cb_report(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    # листание /report: callback_data = report:<n|o>:<курсор>, журнал всегда своего чата
+    query = update.callback_query
+    await query.answer()
+    try:
+        _, direction, cursor = query.data.split(":")
+        cursor = int(cursor)
+    except ValueError:
+        return
+    page = await db.run(report_page, query.message.chat_id, cursor, direction == "n")
+    await query.edit_message_text(page.text, parse_mode=PARSE_HTML, disable_web_page_preview=True,
+                                  reply_markup=report_keyboard(page))
 
 async def cmd_week(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text(week_stats(), parse_mode=ParseMode.HTML, disable_web_page_preview=True)
+    days = 7
+    if context.args:
+        try:
+            days = max(1, min(365, int(context.args[0])))
+        except ValueError:
+            await update.message.reply_text("Пример: /week или /week 30")
+            return
+    text = await db.run(week_stats, days, update.effective_chat.id)
+    await update.message.reply_text(text, parse_mode=PARSE_HTML, disable_web_page_preview=True)
+
+def is_leader(app: Application) -> bool:
+    return app.bot_data.get("leader", True)
 
 async def daily_job(context: ContextTypes.DEFAULT_TYPE):
+    # вызывается раз в сутки для каждой занятой корзины HH:MM (job.data)
+    if not is_leader(context.application):
+        return
     cfg = context.application.bot_data["cfg"]
-    for chat_id in db.get_all_chat_ids():
+    chat_ids = context.application.bot_data["scheduler"].chats(context.job.data)
+    if not chat_ids:
+        return
+    # снимок только по лигам, на которые подписаны чаты корзины (настройки — из кэша)
+    snapshot = await build_snapshot(today_in(cfg), context.application.bot_data["users"].leagues_of(chat_ids))
+    logging.info("Daily bucket %s: %s chats", context.job.data, len(chat_ids))
+    for chat_id in chat_ids:
         try:
-            await send_signals(context.application, chat_id, cfg)
+            await send_signals(context.application, chat_id, cfg, snapshot)
         except Exception:
             logging.exception("Failed daily send to %s", chat_id)
 
-async def settle_job(context: ContextTypes.DEFAULT_TYPE):
-    pending = db.list_pending_signals()
-    for r in pending:
-        if r["league"] != "NHL" or not r.get("game_id"):
-            continue
+async def warmup_job(context: ContextTypes.DEFAULT_TYPE):
+    # снимок дня собирается заранее: за PREFETCH_LEAD_MIN до первой корзины рассылки
+    # и дальше каждые PREFETCH_INTERVAL_MIN до начала первого матча лиги,
+    # так что рассылка и /now читают только готовые данные из памяти
+    if not is_leader(context.application):
+        return
+    cfg = context.application.bot_data["cfg"]
+    tz = ZoneInfo(cfg.timezone)
+    now = dt.datetime.now(tz)
+    today = now.date()
+    # холодный старт: поднимаем снимок из БД (или собираем) сразу
+    await build_snapshot(today, list(SUPPORTED))
+
+    hh, mm = [int(x) for x in (context.application.bot_data["scheduler"].earliest() or cfg.default_daily_time).split(":")]
+    window = dt.datetime.combine(today, dt.time(hh, mm), tz) - dt.timedelta(minutes=cfg.prefetch_lead_min)
+    if now < window:
+        return
+    leagues = [lg for lg in SUPPORTED if refresh_due(today, lg, now)]
+    if leagues:
+        snap = await refresh_snapshot(today, leagues)
+        logging.info("Warm-up %s: %s", today, {lg: len(sigs) for lg, sigs in snap.leagues.items()})
+
+async def track_job(context: ContextTypes.DEFAULT_TYPE):
+    # трекер матчей вместо опроса всех открытых игр раз в полчаса (app/tracker.py)
+    if not is_leader(context.application):
+        return
+    await tracker.run_once(*context.application.bot_data.get("shard", (0, 1)))
+
+async def maintenance_job(context: ContextTypes.DEFAULT_TYPE):
+    # ночью, вне рассылок и матчей: архив старых сигналов, vacuum, checkpoint WAL.
+    # База общая для всех шардов — выполняет только нулевой
+    app = context.application
+    if not is_leader(app) or app.bot_data.get("shard", (0, 1))[0] != 0:
+        return
+    cfg = app.bot_data["cfg"]
+    try:
+        await asyncio.to_thread(maintenance.run, cfg.archive_after_days, Path(cfg.archive_dir))
+    except Exception:
+        logging.exception("Maintenance failed")
+
+async def record_deliveries(rows):
+    await db.run(db.record_deliveries, rows)
+
+def lease_name(app: Application) -> str:
+    shard, shards = app.bot_data.get("shard", (0, 1))
+    return f"jobs:{shard}/{shards}"
+
+async def lease_job(context: ContextTypes.DEFAULT_TYPE):
+    app = context.application
+    leader = await db.run(db.acquire_lease, lease_name(app), HOLDER, LEASE_TTL)
+    if leader != app.bot_data.get("leader"):
+        logging.info("Lease %s: %s", lease_name(app), "acquired" if leader else "held by another instance")
+    app.bot_data["leader"] = leader
+
+async def on_startup(app: Application):
+    from app.outbox import Outbox
+    cfg = app.bot_data["cfg"]
+    shard, shards = app.bot_data.get("shard", (0, 1))
+    if app.bot_data.get("oneshot"):
+        # разовая команда запущена руками — аренду работающего бота не трогаем
+        app.bot_data["leader"] = True
+    else:
+        app.bot_data["leader"] = await db.run(db.acquire_lease, lease_name(app), HOLDER, LEASE_TTL)
+        logging.info("Shard %s/%s, lease %s: %s", shard, shards, lease_name(app), app.bot_data["leader"])
+    # лимит Telegram общий на бота — делим его между шардами
+    outbox = Outbox(app.bot, workers=cfg.tg_send_workers, global_rate=cfg.tg_global_rate / shards,
+                    per_chat_rate=cfg.tg_per_chat_rate, per_chat_burst=cfg.tg_per_chat_burst,
+                    on_sent=record_deliveries)
+    await outbox.start()
+    app.bot_data["outbox"] = outbox
+    metrics.add_collector(lambda: update_gauges(app))
+    if cfg.metrics_port and not app.bot_data.get("oneshot"):
+        # занятый порт (второй экземпляр, соседний шард) не должен валить запуск бота
         try:
-            fin = nhl_source.fetch_final_score(str(r["game_id"]))
-            if not fin:
-                continue
-            status = nhl_source.grade_pick(r["pick"], fin["away_score"], fin["home_score"])
-            db.close_signal(r["id"], status, fin["score"])
-        except Exception:
-            logging.exception("Failed settle signal #%s", r["id"])
+            app.bot_data["metrics_server"] = metrics.serve(cfg.metrics_port + shard)
+        except OSError as e:
+            logging.warning("Metrics port %s unavailable, /metrics disabled: %s", cfg.metrics_port + shard, e)
+    startup_done(app.bot_data.get("mode", "polling"), app.bot_data.get("setup_seconds", 0.0))
 
-def main():
-    cfg = get_config()
+def update_gauges(app: Application):
+    # состояние, которое дешевле снять раз в период, чем считать на каждом событии
+    outbox = app.bot_data.get("outbox")
+    if outbox is not None:
+        metrics.set_gauge("outbox_depth", outbox.depth())
+    for k, v in http.cache_stats().items():
+        metrics.set_gauge("http_cache", v, stat=k)
+    metrics.set_gauge("users", len(app.bot_data["users"]))
+    metrics.set_gauge("delivery_buckets", len(app.bot_data["scheduler"].buckets))
+
+async def metrics_job(context: ContextTypes.DEFAULT_TYPE):
+    st = context.application.bot_data["outbox"].stats()
+    if st["submitted"]:
+        logging.info("Outbox: %s", st)
+    logging.info("Metrics: %s", metrics.summary())
+
+async def on_shutdown(app: Application):
+    outbox = app.bot_data.get("outbox")
+    if outbox is not None:
+        await outbox.stop()
+        logging.info("Outbox: %s", outbox.stats())
+    logging.info("HTTP cache: %s", http.cache_stats())
+    logging.info("Metrics: %s", metrics.summary())
+    server = app.bot_data.pop("metrics_server", None)
+    if server is not None:
+        server.shutdown()
+        server.server_close()
+    if app.bot_data.get("leader") and not app.bot_data.get("oneshot"):
+        await db.run(db.release_lease, lease_name(app), HOLDER)
+    await http.aclose()
+    db.close()
+
+def setup(cfg, telegram: bool = True, signals: bool = True):
+    # telegram=False / signals=False — для разовых команд без бота и без расчёта сигналов
+    # (не нужны токен, numpy и модель скоринга)
     logging.basicConfig(
         level=getattr(logging, cfg.log_level, logging.INFO),
         format="%(asctime)s %(levelname)s %(message)s"
     )
-    db.init_db()
+    db.DB_PATH = Path(cfg.db_path)
+    t0 = time.perf_counter()
+    if db.init_db():
+        logging.info("DB schema v%s applied in %.3fs", db.SCHEMA_VERSION, time.perf_counter() - t0)
+    http.configure(cfg.http_timeout, cfg.http_per_host_limit, cfg.http_retries)
+    http.configure_cache(cfg.http_cache_size, cfg.http_cache_dir or None, cfg.http_cache_disk_size)
+    if signals:
+        from app import scoring
+        scoring.configure(scoring.load_model(cfg.scoring_model))
 
-    if not cfg.bot_token:
+    if telegram and not cfg.bot_token:
         raise SystemExit("BOT_TOKEN не задан. Впиши в .env")
 
-    app = Application.builder().token(cfg.bot_token).build()
+def startup_done(mode: str, t_setup: float) -> None:
+    # время холодного старта по фазам: импорт bot.py, setup (config/БД/http), до готовности
+    now = time.perf_counter()
+    phases = {"import": IMPORT_SECONDS, "setup": t_setup, "ready": now - _T0}
+    for phase, seconds in phases.items():
+        metrics.set_gauge("startup_seconds", round(seconds, 4), mode=mode, phase=phase)
+    logging.info("Startup %s: %s", mode, ", ".join(f"{k} {v:.3f}s" for k, v in phases.items()))
+
+def build_application(cfg, shard: int = 0, shards: int = 1, polling: bool = True) -> Application:
+    from telegram.ext import Application, CallbackQueryHandler, CommandHandler
+    builder = Application.builder().token(cfg.bot_token).post_init(on_startup).post_shutdown(on_shutdown)
+    if cfg.tg_base_url:
+        builder = builder.base_url(cfg.tg_base_url)
+    if not polling:
+        builder = builder.updater(None)
+    app = builder.build()
     app.bot_data["cfg"] = cfg
+    app.bot_data["shard"] = (shard, shards)
 
     app.add_handler(CommandHandler("start", cmd_start))
     app.add_handler(CommandHandler("status", cmd_status))
@@ -182,13 +386,156 @@ def main():
     app.add_handler(CommandHandler("setleagues", cmd_setleagues))
     app.add_handler(CommandHandler("now", cmd_now))
     app.add_handler(CommandHandler("report", cmd_report))
+    app.add_handler(CallbackQueryHandler(cb_report, pattern=r"^report:"))
     app.add_handler(CommandHandler("week", cmd_week))
 
-    tz = ZoneInfo(cfg.timezone)
-    hh, mm = [int(x) for x in cfg.default_daily_time.split(":")]
-    app.job_queue.run_daily(daily_job, time=dt.time(hh, mm, tzinfo=tz), name="daily_signals")
-    app.job_queue.run_repeating(settle_job, interval=30*60, first=60, name="settle_results")
+    users = UserCache(cfg.default_min_confidence, cfg.default_daily_time)
+    users.load(db.list_users(shard, shards))
+    app.bot_data["users"] = users
+    scheduler = DeliveryScheduler(app.job_queue, daily_job, cfg.timezone, cfg.default_daily_time)
+    scheduler.load((u.chat_id, u.daily_time) for u in users)
+    app.bot_data["scheduler"] = scheduler
+    app.job_queue.run_repeating(warmup_job, interval=cfg.prefetch_interval_min*60, first=10, name="warmup")
+    app.job_queue.run_repeating(track_job, interval=cfg.tracker_interval_sec, first=30, name="track_games")
+    interval = cfg.metrics_log_interval_min*60
+    app.job_queue.run_repeating(metrics_job, interval=interval, first=interval, name="metrics")
+    hh, mm = [int(x) for x in cfg.maintenance_time.split(":")]
+    app.job_queue.run_daily(maintenance_job, dt.time(hh, mm, tzinfo=ZoneInfo(cfg.timezone)), name="maintenance")
+    app.job_queue.run_repeating(lease_job, interval=LEASE_RENEW, first=LEASE_RENEW, name="lease")
+    return app
+
+async def serve_shard(app: Application, queue) -> None:
+    # воркер webhook-режима: апдейты своего шарда из очереди фронта -> update_queue
+    # SIGTERM (например, всей группе процессов от менеджера сервисов) — как маркер
+    # конца: приём прекращается, отправка дорабатывает в on_shutdown
+    from telegram import Update
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    loop.add_signal_handler(signal.SIGTERM, stop.set)
+    await app.initialize()
+    await on_startup(app)
+    await app.start()
+    try:
+        while not stop.is_set():
+            try:
+                data = await loop.run_in_executor(None, queue.get, True, SHARD_POLL_SECONDS)
+            except Empty:
+                continue
+            if data is None:
+                break
+            await app.update_queue.put(Update.de_json(data, app.bot))
+    finally:
+        await app.stop()
+        await on_shutdown(app)
+        await app.shutdown()
+
+def run_shard(shard: int, shards: int, queue) -> None:
+    # точка входа процесса-воркера; останавливается маркером от фронта или SIGTERM, не по Ctrl+C
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    t0 = time.perf_counter()
+    cfg = get_config()
+    setup(cfg)
+    app = build_application(cfg, shard, shards, polling=False)
+    app.bot_data.update(mode="webhook", setup_seconds=time.perf_counter() - t0)
+    asyncio.run(serve_shard(app, queue))
+
+def set_webhook(cfg) -> None:
+    from telegram import Bot, Update
+    url = cfg.webhook_url.rstrip("/") + cfg.webhook_path
+
+    async def _set():
+        # одному вызову API не нужны ни Application, ни кэш пользователей и планировщик
+        bot = Bot(cfg.bot_token, base_url=cfg.tg_base_url) if cfg.tg_base_url else Bot(cfg.bot_token)
+        async with bot:
+            await bot.set_webhook(url, secret_token=cfg.webhook_secret or None, allowed_updates=Update.ALL_TYPES)
+    asyncio.run(_set())
+    logging.info("Webhook set to %s", url)
+
+async def run_settle(cfg) -> int:
+    # один проход трекера по всем шардам: для cron, без Telegram
+    try:
+        return await tracker.run_once()
+    finally:
+        await http.aclose()
+
+async def run_send_daily(cfg, hhmm=None) -> int:
+    # рассылка корзины HH:MM (или всех корзин) и выход: без polling, jobs не запускаются
+    app = build_application(replace(cfg, metrics_port=0), polling=False)
+    app.bot_data["oneshot"] = True
+    app.bot_data["mode"] = "send-daily"
+    scheduler = app.bot_data["scheduler"]
+    buckets = [hhmm] if hhmm else sorted(scheduler.buckets)
+    await app.initialize()
+    await on_startup(app)
+    try:
+        for b in buckets:
+            await daily_job(SimpleNamespace(application=app, job=SimpleNamespace(data=b)))
+        await app.bot_data["outbox"].join()
+        return app.bot_data["outbox"].counters["sent"]
+    finally:
+        await on_shutdown(app)
+        await app.shutdown()
+
+def run_oneshot(args, cfg) -> None:
+    if args.mode == "settle":
+        due = asyncio.run(run_settle(cfg))
+        logging.info("Settle: %s games polled", due)
+    elif args.mode == "send-daily":
+        time_arg = parse_hhmm(args.time) if args.time else None
+        if args.time and not time_arg:
+            raise SystemExit("--time: формат HH:MM")
+        logging.info("Send-daily: %s messages sent", asyncio.run(run_send_daily(cfg, time_arg)))
+    elif args.mode == "backfill":
+        from app import history
+        n = asyncio.run(history.backfill(args.start, args.end, args.db))
+        logging.info("Backfill done: %s upstream requests", n)
+    elif args.mode == "maintenance":
+        maintenance.run(cfg.archive_after_days if args.days is None else args.days, Path(cfg.archive_dir))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Hockey signals bot")
+    sub = ap.add_subparsers(dest="mode", metavar="command")
+    sub.add_parser("polling", help="long polling (по умолчанию)")
+    p = sub.add_parser("webhook", help="webhook-фронт и процессы-шарды")
+    p.add_argument("--workers", type=int, help="число процессов-шардов (WEBHOOK_WORKERS)")
+    p.add_argument("--port", type=int, help="порт фронта (WEBHOOK_PORT)")
+    sub.add_parser("settle", help="один проход трекера матчей: расчёт завершённых игр")
+    p = sub.add_parser("send-daily", help="разослать ежедневные сигналы и выйти")
+    p.add_argument("--time", help="только корзина HH:MM (по умолчанию — все)")
+    p = sub.add_parser("backfill", help="загрузить историю NHL API в data/history.db")
+    p.add_argument("start", type=dt.date.fromisoformat)
+    p.add_argument("end", type=dt.date.fromisoformat)
+    p.add_argument("--db", type=Path, help="файл истории (по умолчанию data/history.db)")
+    p = sub.add_parser("maintenance", help="архивация старых сигналов и сжатие базы")
+    p.add_argument("--days", type=int, help="порог архивации (ARCHIVE_AFTER_DAYS)")
+    args = ap.parse_args(argv)
+    mode = args.mode or "polling"
+
+    t0 = time.perf_counter()
+    cfg = get_config()
+    # разовым командам кроме send-daily не нужен ни Telegram, ни расчёт сигналов
+    light = mode in ONESHOT_COMMANDS and mode != "send-daily"
+    setup(cfg, telegram=not light, signals=not light)
+    setup_seconds = time.perf_counter() - t0
+
+    if mode in ONESHOT_COMMANDS:
+        if light:
+            startup_done(mode, setup_seconds)
+        try:
+            run_oneshot(args, cfg)
+        finally:
+            db.close()
+        return
+
+    if mode == "webhook":
+        front = WebhookFront(run_shard, args.workers or cfg.webhook_workers, cfg.webhook_listen,
+                             args.port or cfg.webhook_port, cfg.webhook_path, cfg.webhook_secret)
+        db.close()  # воркеры открывают свои соединения
+        front.serve(on_ready=(lambda: set_webhook(cfg)) if cfg.webhook_url else None)
+        return
 
+    app = build_application(cfg)
+    app.bot_data["setup_seconds"] = setup_seconds
     logging.info("Bot started. TZ=%s daily=%s", cfg.timezone, cfg.default_daily_time)
     app.run_polling(close_loop=False)
 
@@ -0,0 +1,11 @@
+import pytest
+
+from app import db
+
+@pytest.fixture
+def tmp_db(tmp_path, monkeypatch):
+    # отдельный файл SQLite на тест; пул соединений сбрасывается до и после
+    db.close()
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "bot.db")
+    yield db
+    db.close()
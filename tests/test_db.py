@@ -0,0 +1,87 @@
+import sqlite3
+
+import pytest
+
+from app import db
+
+# схема signals до канонических сигналов: копия прогноза на каждого получателя
+# (chat_id есть не во всех старых базах — самые первые версии его не писали)
+OLD_SIGNALS = """
+CREATE TABLE signals (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    {chat_id}
+    league TEXT NOT NULL,
+    game_id TEXT,
+    match TEXT NOT NULL,
+    pick TEXT NOT NULL,
+    confidence INTEGER NOT NULL,
+    why_json TEXT NOT NULL,
+    risks_json TEXT NOT NULL,
+    sources_json TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'PENDING',
+    final_score TEXT,
+    closed_at TEXT
+)
+"""
+
+def _old_db(path, rows, with_chat_id):
+    conn = sqlite3.connect(path.as_posix())
+    conn.execute(OLD_SIGNALS.format(chat_id="chat_id INTEGER," if with_chat_id else ""))
+    for chat_id, created_at, game_id, pick in rows:
+        cols = "created_at, league, game_id, match, pick, confidence, why_json, risks_json, sources_json"
+        vals = [created_at, "NHL", game_id, "A — B", pick, 60, "[]", "[]", "[]"]
+        if with_chat_id:
+            cols, vals = "chat_id, " + cols, [chat_id] + vals
+        conn.execute(f"INSERT INTO signals ({cols}) VALUES ({', '.join('?' * len(vals))})", vals)
+    conn.commit()
+    conn.close()
+
+# (строки старой таблицы (chat_id, created_at, game_id, pick), была ли колонка chat_id,
+#  ожидаемые канонические (date, game_id, pick), ожидаемые доставки (chat_id, game_id))
+CASES = [
+    # один прогноз трём чатам — одна строка и три доставки
+    ([(1, "2026-01-10T09:00:00", "g1", "1X"), (2, "2026-01-10T09:00:01", "g1", "1X"),
+      (3, "2026-01-10T09:00:02", "g1", "1X")], True,
+     [("2026-01-10", "g1", "1X")], [(1, "g1"), (2, "g1"), (3, "g1")]),
+    # тот же матч в другой день и другой исход — разные канонические строки
+    ([(1, "2026-01-10T09:00:00", "g1", "1X"), (1, "2026-01-11T09:00:00", "g1", "1X"),
+      (2, "2026-01-10T09:00:00", "g1", "X2")], True,
+     [("2026-01-10", "g1", "1X"), ("2026-01-11", "g1", "1X"), ("2026-01-10", "g1", "X2")],
+     [(1, "g1"), (1, "g1"), (2, "g1")]),
+    # повтор одному и тому же чату схлопывается в одну доставку
+    ([(1, "2026-01-10T09:00:00", "g1", "1X"), (1, "2026-01-10T10:00:00", "g1", "1X")], True,
+     [("2026-01-10", "g1", "1X")], [(1, "g1")]),
+    # без chat_id доставок восстановить не из чего, но дубликаты всё равно убираются
+    ([(None, "2026-01-10T09:00:00", "g1", "1X"), (None, "2026-01-10T09:00:01", "g1", "1X")], False,
+     [("2026-01-10", "g1", "1X")], []),
+    ([], True, [], []),
+]
+
+@pytest.mark.parametrize("rows, with_chat_id, canon, delivered", CASES)
+def test_migrate_per_user_signals(tmp_db, rows, with_chat_id, canon, delivered):
+    _old_db(db.DB_PATH, rows, with_chat_id)
+    assert db.init_db() is True
+    assert db.schema_version() == db.SCHEMA_VERSION
+    with db.reader() as conn:
+        got = conn.execute("SELECT id, date, game_id, pick FROM signals ORDER BY id").fetchall()
+        cols = {r[1] for r in conn.execute("PRAGMA table_info(signals)")}
+        sent = conn.execute("""
+        SELECT d.chat_id, s.game_id FROM deliveries d JOIN signals s ON s.id = d.signal_id
+        ORDER BY d.chat_id, s.id
+        """).fetchall()
+    assert sorted((r["date"], r["game_id"], r["pick"]) for r in got) == sorted(canon)
+    assert [tuple(r) for r in sent] == delivered
+    if sqlite3.sqlite_version_info >= (3, 35, 0):
+        assert "chat_id" not in cols
+    # версия записана — повторный запуск DDL и миграции не гоняет
+    assert db.init_db() is False
+
+def test_migration_keeps_first_copy(tmp_db):
+    # каноническая строка — самая ранняя копия, её id остаётся у доставок
+    _old_db(db.DB_PATH, [(1, "2026-01-10T09:00:00", "g1", "1X"), (2, "2026-01-10T09:00:05", "g1", "1X")], True)
+    db.init_db()
+    with db.reader() as conn:
+        ids = [r[0] for r in conn.execute("SELECT id FROM signals")]
+        targets = {r[0] for r in conn.execute("SELECT signal_id FROM deliveries")}
+    assert ids == [1] and targets == {1}
@@ -0,0 +1,62 @@
+import datetime as dt
+
+import pytest
+
+from app import db, maintenance
+
+TODAY = dt.datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+ARCHIVE_DAYS = 20
+
+def _day(n):
+    return TODAY - dt.timedelta(days=n)
+
+# (дней назад, лига, уверенность, статус, получатели): половина строк старше порога архивации
+ROWS = [
+    (50, "NHL", 61, "WIN", (1, 2)),
+    (50, "NHL", 64, "LOSE", (1,)),
+    (40, "KHL", 72, "WIN", (2,)),
+    (40, "NHL", 55, "PUSH", ()),
+    (30, "NHL", 61, "LOSE", (1, 2, 3)),
+    (25, "KHL", 80, "WIN", (3,)),
+    (15, "NHL", 61, "WIN", (1,)),
+    (10, "KHL", 72, "LOSE", (2, 3)),
+    (5, "NHL", 66, "PENDING", (1,)),
+    (1, "NHL", 90, "WIN", ()),
+]
+
+def _fill():
+    db.init_db()
+    for i, (ago, league, conf, status, chats) in enumerate(ROWS):
+        created = (_day(ago) + dt.timedelta(hours=9)).isoformat()
+        [sid] = db.upsert_signals([{
+            "created_at": created, "date": created[:10], "league": league, "game_id": f"g{i}", "start_utc": None,
+            "match": "A — B", "pick": "1X", "confidence": conf, "why_json": "[]", "risks_json": "[]", "sources_json": "[]",
+        }])
+        if status != "PENDING":
+            with db.writer() as conn:
+                conn.execute("UPDATE signals SET status=?, closed_at=? WHERE id=?",
+                             (status, (_day(ago) + dt.timedelta(hours=23)).isoformat(), sid))
+        db.record_deliveries([(c, sid, None, created) for c in chats])
+
+# окна — по границам дней: архивная часть считается с точностью до дня
+WINDOWS = [(60, None), (45, None), (45, 12), (30, 25), (22, None), (3, None)]
+CUTS = [("total", None), ("league", None), ("bucket", None), ("chat", None), ("total", 1), ("bucket", 3)]
+
+@pytest.mark.parametrize("since, until", WINDOWS)
+@pytest.mark.parametrize("by, chat_id", CUTS)
+def test_signal_stats_survive_archiving(tmp_db, tmp_path, since, until, by, chat_id):
+    _fill()
+    since_iso = _day(since).isoformat()
+    until_iso = _day(until).isoformat() if until is not None else None
+    before = db.signal_stats(since_iso, until_iso, by=by, chat_id=chat_id)
+    moved = maintenance.archive_signals(ARCHIVE_DAYS, archive_dir=tmp_path / "archive")
+    assert moved["signals"] == sum(1 for ago, *_ in ROWS if ago > ARCHIVE_DAYS)
+    assert db.signal_stats(since_iso, until_iso, by=by, chat_id=chat_id) == before
+
+def test_archiving_twice_does_not_double_count(tmp_db, tmp_path):
+    _fill()
+    since_iso = _day(60).isoformat()
+    before = db.signal_stats(since_iso, by="league")
+    maintenance.archive_signals(ARCHIVE_DAYS, archive_dir=tmp_path / "archive")
+    assert maintenance.archive_signals(ARCHIVE_DAYS, archive_dir=tmp_path / "archive")["signals"] == 0
+    assert db.signal_stats(since_iso, by="league") == before
@@ -0,0 +1,25 @@
+import pytest
+
+from app.news import parse_message
+
+# (пост, ожидаемые (kind, player, team, status))
+CASES = [
+    ("Auston Matthews (upper body) is out vs Bruins", [("injury", "Auston Matthews", None, "out")]),
+    ("Maple Leafs' Auston Matthews is out vs Bruins", [("injury", "Auston Matthews", "Maple Leafs", "out")]),
+    ("Auston Matthews (Maple Leafs) is day-to-day", [("injury", "Auston Matthews", "Maple Leafs", "questionable")]),
+    ("Bruins: Jeremy Swayman will start vs Maple Leafs", [("goalie", "Jeremy Swayman", "Bruins", "confirmed")]),
+    ("Jeremy Swayman will start for the Bruins tonight", [("goalie", "Jeremy Swayman", "Bruins", "confirmed")]),
+    ("Maple Leafs injury update\nAuston Matthews is day-to-day",
+     [("injury", "Auston Matthews", "Maple Leafs", "questionable")]),
+    ("Bruins at Maple Leafs\nAuston Matthews is day-to-day", [("injury", "Auston Matthews", None, "questionable")]),
+    ("Swayman will start, Woll will start tonight: Bruins vs Maple Leafs",
+     [("goalie", "Swayman", None, "confirmed"), ("goalie", "Woll", None, "confirmed")]),
+    ("Rangers placed Filip Chytil on IR", [("injury", "Filip Chytil", "Rangers", "ir")]),
+    ("Ryan O'Reilly is out", [("injury", "Ryan O'Reilly", None, "out")]),
+    ("В воротах — Шестёркин, против Bruins", [("goalie", "Шестёркин", None, "confirmed")]),
+    ("Tonight: Bruins vs Maple Leafs, 19:00", []),
+]
+
+@pytest.mark.parametrize("text, expected", CASES)
+def test_parse_message(text, expected):
+    assert [(i.kind, i.player, i.team, i.status) for i in parse_message(text)] == expected
@@ -0,0 +1,55 @@
+import datetime as dt
+
+import pytest
+
+from app.sources.nhl import POLL_MAX, POLL_MIN, POLL_POSTPONED, POLL_PREGAME, Match, _news_notes, poll_delay
+
+NOW = dt.datetime(2026, 1, 10, 0, 0, tzinfo=dt.timezone.utc)
+
+# (состояние матча из parse_game_state, ожидаемая пауза до следующего опроса)
+CASES = [
+    ({"state": "FINAL"}, None),
+    ({"state": "OFF"}, None),
+    ({"state": "PPD"}, POLL_POSTPONED),
+    ({"state": "FUT", "start_utc": "2026-01-10T02:00:00Z"}, 7200.0),
+    ({"state": "FUT", "start_utc": "2026-01-10T00:00:10Z"}, POLL_MIN),
+    ({"state": "PRE", "start_utc": "2026-01-09T23:55:00Z"}, POLL_PREGAME),
+    ({"state": "FUT", "start_utc": None}, POLL_PREGAME),
+    ({"state": "LIVE", "period": 1, "remaining": 600}, POLL_MAX),
+    ({"state": "LIVE", "period": 3, "remaining": 300}, 300.0),
+    ({"state": "LIVE", "period": 3, "remaining": 10}, POLL_MIN),
+    ({"state": "LIVE", "period": 2, "remaining": None, "intermission": True}, POLL_MAX),
+    ({"state": "CRIT", "period": 3, "remaining": 600}, POLL_MIN),
+    ({"state": "LIVE", "period": 4, "remaining": 240}, POLL_MIN),
+]
+
+@pytest.mark.parametrize("game, expected", CASES)
+def test_poll_delay(game, expected):
+    assert poll_delay(game, NOW) == expected
+
+MATCH = Match(game_id="1", start_utc="2026-01-10T00:00:00Z", home="Boston Bruins", away="New York Rangers")
+
+def _injury(team):
+    return {"kind": "injury", "team": team, "player": "A. Player", "status": "out"}
+
+def _goalie(team):
+    return {"kind": "goalie", "team": team, "player": "G. Keeper", "status": "confirmed"}
+
+# (новость, прогноз на хозяев?, ожидаемая сторона: "why" — довод, "risks" — риск)
+NEWS_CASES = [
+    (_injury("Bruins"), True, "risks"),
+    (_goalie("Bruins"), True, "why"),
+    (_injury("Rangers"), True, "why"),
+    (_goalie("Rangers"), True, "risks"),
+    # прогноз на гостей: стороны меняются местами
+    (_injury("Bruins"), False, "why"),
+    (_goalie("Bruins"), False, "risks"),
+    (_injury("Rangers"), False, "risks"),
+    (_goalie("Rangers"), False, "why"),
+]
+
+@pytest.mark.parametrize("item, home, side", NEWS_CASES)
+def test_news_notes_side(item, home, side):
+    why, risks = _news_notes([item], MATCH, home)
+    assert len(why if side == "why" else risks) == 1
+    assert not (risks if side == "why" else why)
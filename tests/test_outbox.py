@@ -0,0 +1,100 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from telegram.error import BadRequest, Forbidden, RetryAfter
+
+from app import db
+from app.outbox import OutMessage, Outbox
+
+FLOOD_WAIT = 0.2
+
+class StubBot:
+    # send_message по сценарию: для каждого чата — исходы вызовов по порядку
+    # ("ok", "flood", "forbidden", "bad"), после конца сценария — "ok"
+    def __init__(self, script):
+        self.script = {chat_id: list(outcomes) for chat_id, outcomes in script.items()}
+        self.calls = []
+        self.message_id = 0
+
+    async def send_message(self, chat_id, text, **kwargs):
+        outcomes = self.script.get(chat_id) or []
+        outcome = outcomes.pop(0) if outcomes else "ok"
+        self.calls.append((time.monotonic(), chat_id, text, outcome))
+        if outcome == "flood":
+            raise RetryAfter(FLOOD_WAIT)
+        if outcome == "forbidden":
+            raise Forbidden("Forbidden: bot was blocked by the user")
+        if outcome == "bad":
+            raise BadRequest("Bad Request: can't parse entities")
+        self.message_id += 1
+        return SimpleNamespace(message_id=self.message_id)
+
+def _signals(n):
+    db.init_db()
+    return db.upsert_signals([{
+        "created_at": "2026-01-10T09:00:00", "date": "2026-01-10", "league": "NHL", "game_id": f"g{i}",
+        "start_utc": None, "match": "A — B", "pick": "1X", "confidence": 60,
+        "why_json": "[]", "risks_json": "[]", "sources_json": "[]",
+    } for i in range(n)])
+
+async def _run(bot, batches):
+    async def on_sent(rows):
+        await db.run(db.record_deliveries, rows)
+    outbox = Outbox(bot, workers=4, global_rate=1000, per_chat_rate=1000, per_chat_burst=10, on_sent=on_sent)
+    await outbox.start()
+    for chat_id, messages in batches:
+        outbox.submit(chat_id, messages)
+    await outbox.stop(timeout=5)
+    return outbox
+
+def _delivered():
+    with db.reader() as conn:
+        return sorted(tuple(r) for r in conn.execute("SELECT chat_id, signal_id FROM deliveries"))
+
+# (сценарий чата 1 на пачку из трёх сообщений, какие из них доставлены, sent, failed, flood_waits)
+CASES = [
+    ([], [0, 1, 2], 3, 0, 0),
+    # flood control: сообщение не теряется, порядок в чате сохраняется
+    (["flood"], [0, 1, 2], 3, 0, 1),
+    (["ok", "flood", "flood"], [0, 1, 2], 3, 0, 2),
+    # бот заблокирован: остаток пачки не отправляется и считается неудачным
+    (["forbidden"], [], 0, 3, 0),
+    (["ok", "forbidden"], [0], 1, 2, 0),
+    (["flood", "forbidden"], [], 0, 3, 1),
+    # битое сообщение пропускается, остальные уходят
+    (["ok", "bad"], [0, 2], 2, 1, 0),
+]
+
+@pytest.mark.parametrize("script, delivered, sent, failed, flood_waits", CASES)
+def test_outbox_errors(tmp_db, script, delivered, sent, failed, flood_waits):
+    ids = _signals(4)
+    bot = StubBot({1: script})
+    batches = [(1, [OutMessage(f"m{i}", ref=ids[i]) for i in range(3)]), (2, [OutMessage("other", ref=ids[3])])]
+    outbox = asyncio.run(_run(bot, batches))
+    texts = [text for _, chat_id, text, outcome in bot.calls if chat_id == 1 and outcome == "ok"]
+    assert texts == [f"m{i}" for i in delivered]
+    assert _delivered() == sorted([(1, ids[i]) for i in delivered] + [(2, ids[3])])
+    assert outbox.counters["sent"] == sent + 1
+    assert outbox.counters["failed"] == failed
+    assert outbox.counters["flood_waits"] == flood_waits
+    assert outbox.depth() == 0
+
+def test_flood_wait_pauses_every_chat(tmp_db):
+    # RetryAfter в одном чате притормаживает всю очередь, а не только этот чат
+    ids = _signals(2)
+    bot = StubBot({1: ["flood"]})
+
+    async def scenario():
+        outbox = Outbox(bot, workers=4, global_rate=1000, per_chat_rate=1000, per_chat_burst=10)
+        await outbox.start()
+        outbox.submit(1, [OutMessage("m0", ref=ids[0])])
+        await asyncio.sleep(FLOOD_WAIT / 4)
+        outbox.submit(2, [OutMessage("x", ref=ids[1])])
+        await outbox.stop(timeout=5)
+
+    asyncio.run(scenario())
+    flood_at = next(t for t, _, _, outcome in bot.calls if outcome == "flood")
+    other_at = next(t for t, chat_id, _, _ in bot.calls if chat_id == 2)
+    assert other_at - flood_at >= FLOOD_WAIT * 0.9
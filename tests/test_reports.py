@@ -0,0 +1,66 @@
+import re
+
+import pytest
+
+from app import db
+from app.reports import report_page
+
+CHAT = 1
+
+def _payload(i):
+    return {"created_at": "2026-01-10T09:00:00", "date": "2026-01-10", "league": "NHL", "game_id": f"g{i}",
+            "start_utc": None, "match": f"A{i} — B{i}", "pick": "1X", "confidence": 60,
+            "why_json": "[]", "risks_json": "[]", "sources_json": "[]"}
+
+def _journal(n):
+    # n доставок чату CHAT (от старых к новым) и столько же чужому чату вперемешку
+    db.init_db()
+    ids = db.upsert_signals([_payload(i) for i in range(n)])
+    for sid in ids:
+        db.record_deliveries([(CHAT, sid, None, None), (CHAT + 1, sid, None, None)])
+    return ids
+
+def _ids(page):
+    return [int(x) for x in re.findall(r"#(\d+)", page.text)]
+
+# (доставок в журнале, размер страницы) — края: пусто, ровно страница, страница и одна, две ровно
+CASES = [(0, 3), (1, 3), (3, 3), (4, 3), (6, 3), (7, 3), (5, 1)]
+
+@pytest.mark.parametrize("n, size", CASES)
+def test_report_pages_cover_journal(tmp_db, n, size):
+    ids = _journal(n)
+    pages = [report_page(CHAT, page_size=size)]
+    while pages[-1].older is not None:
+        pages.append(report_page(CHAT, pages[-1].older, page_size=size))
+    if not n:
+        assert pages[0].text == "Пока нет записей." and pages[0].newer is None
+        return
+    # от новых к старым без пропусков и повторов, каждая страница не длиннее size
+    assert [i for p in pages for i in _ids(p)] == ids[::-1]
+    assert all(0 < len(_ids(p)) <= size for p in pages)
+    assert len(pages) == -(-n // size)
+    assert pages[0].newer is None
+    assert all(p.newer is not None for p in pages[1:])
+    # и обратно «новее» от последней страницы — те же страницы
+    back = [pages[-1]]
+    while back[-1].newer is not None:
+        back.append(report_page(CHAT, back[-1].newer, newer=True, page_size=size))
+    assert [_ids(p) for p in back] == [_ids(p) for p in pages[::-1]]
+    assert back[-1].newer is None
+
+def test_report_page_past_the_end(tmp_db):
+    # курсор самой старой записи: дальше листать некуда
+    _journal(2)
+    with db.reader() as conn:
+        oldest = conn.execute("SELECT MIN(id) FROM deliveries WHERE chat_id=?", (CHAT,)).fetchone()[0]
+    page = report_page(CHAT, oldest, page_size=3)
+    assert page.text == "Больше записей нет." and page.older is None and page.newer is None
+
+def test_report_page_cut_by_length(tmp_db):
+    _journal(5)
+    first = report_page(CHAT, page_size=10)
+    line = len(first.text.split("\n")[1])
+    # места хватает на заголовок и две строки — остальное уходит на следующую страницу
+    short = report_page(CHAT, page_size=10, max_len=len(first.text.split("\n")[0]) + 2 * (line + 1))
+    assert len(_ids(short)) == 2 and short.older is not None
+    assert _ids(report_page(CHAT, short.older, page_size=10)) == _ids(first)[2:]